@@ -1,8 +1,14 @@
 import pytest
 import os
 import sys
+from contextlib import contextmanager
+from sqlalchemy import event
 from src.main import app
 from src.models.user import db
+from src.services.principal_cache import principal_cache
+from src.services.token_verifier import token_verifier
+from src.services.portfolio_summary import portfolio_summary
+from src.services.response_cache import portfolio_cache
 
 # Añadir el directorio src al path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
@@ -14,6 +20,11 @@ def client():
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
     app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'  # Usar la misma SECRET_KEY que main.py
     
+    principal_cache.clear()
+    token_verifier.clear()
+    portfolio_summary.clear()
+    portfolio_cache.clear()
+    
     with app.test_client() as client:
         with app.app_context():
             db.create_all()
@@ -52,3 +63,20 @@ def sample_project_data():
         'fecha_fin_estimada': '2024-12-31'
     }
 
+@pytest.fixture
+def count_queries(client):
+    """Fixture que cuenta las sentencias SQL ejecutadas dentro de un bloque"""
+    @contextmanager
+    def counter():
+        statements = []
+        
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    
+    return counter
@@ -3,6 +3,7 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+import click
 from flask import Flask, send_from_directory
 from flask_cors import CORS
 from src.models.user import db
@@ -15,6 +16,10 @@ from src.routes.recursos import recursos_bp
 from src.routes.portfolio import portfolio_bp
 from src.routes.subscription import subscription_bp
 from src.routes.ai import ai_bp
+from src.routes.metrics import metrics_bp
+from src.routes.documentos import documentos_bp
+from src.routes.exports import exports_bp
+from src.routes.search import search_bp
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
@@ -24,12 +29,16 @@ CORS(app)
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
 app.register_blueprint(projects_bp, url_prefix='/api')
-app.register_blueprint(kpis_bp, url_prefix='/api')
-app.register_blueprint(riesgos_bp, url_prefix='/api')
-app.register_blueprint(recursos_bp, url_prefix='/api')
+app.register_blueprint(kpis_bp)  # Las rutas ya incluyen /api
+app.register_blueprint(riesgos_bp)  # Las rutas ya incluyen /api
+app.register_blueprint(recursos_bp)  # Las rutas ya incluyen /api
 app.register_blueprint(portfolio_bp, url_prefix='/api')
 app.register_blueprint(subscription_bp, url_prefix='/api')
 app.register_blueprint(ai_bp, url_prefix='/api')
+app.register_blueprint(metrics_bp, url_prefix='/api')
+app.register_blueprint(documentos_bp, url_prefix='/api')
+app.register_blueprint(exports_bp, url_prefix='/api')
+app.register_blueprint(search_bp, url_prefix='/api')
 
 # Configurar base de datos
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
@@ -44,8 +53,70 @@ with app.app_context():
     from src.models.recurso import Recurso
     from src.models.subscription import Subscription
     from src.models.ai_prediction import AIPrediction
+    from src.models.revoked_token import RevokedToken
+    from src.models.documento import Documento, PlantillaDocumento
+    from src.models.liquidacion import Liquidacion, DetalleGasto, RegistroHoras
+    from src.models.portfolio_summary import PortfolioSummary
+    from src.models.export_job import ExportJob
+    from src.models.portfolio_snapshot import PortfolioSnapshot
+    from src.models.kpi_medicion import KPIMedicion
+    from src.models.purge_job import PurgeJob
     db.create_all()
 
+@app.cli.command('recompute-progress')
+def recompute_progress():
+    """Recalcula progreso_general de todos los proyectos a partir de sus fases"""
+    from src.services.progress_rollup import progress_rollup
+    updated = progress_rollup.recompute()
+    print(f'Progreso recalculado en {updated} proyectos')
+
+@app.cli.command('reconcile-portfolio')
+def reconcile_portfolio():
+    """Reconstruye portfolio_summary desde las tablas base (para ejecutar periódicamente)"""
+    from src.services.portfolio_summary import portfolio_summary
+    clientes = portfolio_summary.reconcile()
+    print(f'Resumen del portafolio reconciliado para {clientes} clientes')
+
+@app.cli.command('snapshot-portfolio')
+@click.option('--date', 'fecha', default=None, help='Fecha de la fotografía (YYYY-MM-DD), por defecto hoy')
+def snapshot_portfolio(fecha):
+    """Registra la fotografía diaria del portafolio (para ejecutar cada noche)"""
+    from datetime import date
+    from src.services.portfolio_snapshots import portfolio_snapshots
+    fecha = date.fromisoformat(fecha) if fecha else None
+    proyectos = portfolio_snapshots.take(fecha)
+    print(f'Fotografía registrada para {proyectos} proyectos')
+
+@app.cli.command('rebuild-search')
+def rebuild_search():
+    """Reconstruye el índice de búsqueda de texto completo desde las tablas base"""
+    from src.services.search_index import search_index
+    indexed = search_index.reindex()
+    db.session.commit()
+    print(f'{indexed} registros indexados')
+
+@app.cli.command('export-worker')
+@click.option('--once', is_flag=True, help='Procesa los trabajos pendientes y termina')
+def export_worker(once):
+    """Proceso worker de exportaciones: ejecutar aparte de gunicorn"""
+    from src.services.export_queue import export_jobs
+    if once:
+        processed = 0
+        while export_jobs.run_once():
+            processed += 1
+        print(f'{processed} exportaciones procesadas')
+    else:
+        export_jobs.run_forever()
+
+@app.cli.command('purge-worker')
+def purge_worker():
+    """Procesa las purgas de proyectos pendientes o abandonadas (p. ej. tras reiniciar los workers)"""
+    from src.services.project_purge import project_purge
+    processed = 0
+    while project_purge.run_once():
+        processed += 1
+    print(f'{processed} purgas procesadas')
+
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
@@ -1,7 +1,9 @@
 from functools import wraps
-from flask import request, jsonify, current_app
+from flask import request, jsonify, g
 import jwt
 from src.models.user import User
+from src.services.principal_cache import principal_cache
+from src.services.token_verifier import token_verifier, TokenRevocadoError
 
 def token_required(f):
     """Decorador para requerir autenticación JWT"""
@@ -21,15 +23,24 @@ def token_required(f):
             return jsonify({'error': 'Token requerido'}), 401
         
         try:
-            # Decodificar token
-            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user = User.query.filter_by(id=data['user_id']).first()
+            # Verificar token (claims memoizados y lista de revocación)
+            data = token_verifier.verify(token)
+            g.token = token
+            g.token_claims = data
             
-            if not current_user:
-                return jsonify({'error': 'Usuario no encontrado'}), 401
+            # Resolver el usuario desde la caché antes de ir a la base de datos
+            current_user = principal_cache.get(data['user_id'])
+            if current_user is None:
+                user = User.query.filter_by(id=data['user_id']).first()
+                if not user:
+                    return jsonify({'error': 'Usuario no encontrado'}), 401
+                current_user = principal_cache.snapshot(user)
+                principal_cache.put(current_user, token_exp=data.get('exp'))
                 
         except jwt.ExpiredSignatureError:
             return jsonify({'error': 'Token expirado'}), 401
+        except TokenRevocadoError:
+            return jsonify({'error': 'Token revocado'}), 401
         except jwt.InvalidTokenError:
             return jsonify({'error': 'Token inválido'}), 401
         
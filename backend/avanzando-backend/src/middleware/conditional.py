@@ -0,0 +1,32 @@
+import hashlib
+from flask import request, make_response
+from sqlalchemy import func
+
+def query_version(query, model, column=None):
+    """(max(fecha_actualizacion), count) de la consulta filtrada, sin serializar filas"""
+    column = column if column is not None else model.fecha_actualizacion
+    return query.with_entities(
+        func.max(column), func.count(model.id)
+    ).order_by(None).one()
+
+def weak_etag(*parts):
+    """Etiqueta débil a partir de los componentes de versión"""
+    raw = '|'.join(str(part) for part in parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+def request_etag(current_user, *parts):
+    """Etiqueta que además considera el alcance del usuario y los parámetros de la petición"""
+    scope = (current_user.rol.value, current_user.cliente_id) if current_user else ()
+    return weak_etag(request.path, request.query_string.decode('utf-8'), *scope, *parts)
+
+def not_modified(etag):
+    """Respuesta 304 si el cliente ya tiene la versión actual, o None"""
+    if request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+        response.set_etag(etag, weak=True)
+        return response
+    return None
+
+def with_etag(response, etag):
+    response.set_etag(etag, weak=True)
+    return response
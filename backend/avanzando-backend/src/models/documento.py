@@ -1,5 +1,6 @@
 from datetime import datetime
 from src.models.user import db
+from src.models.serialization import pick_fields
 import enum
 
 class TipoDocumento(enum.Enum):
@@ -18,12 +19,17 @@ class EstadoDocumento(enum.Enum):
 
 class Documento(db.Model):
     __tablename__ = 'documentos'
+    __table_args__ = (
+        # Paginación por cursor (fecha_actualizacion, id)
+        db.Index('ix_documentos_actualizacion_id', 'fecha_actualizacion', 'id'),
+        db.Index('ix_documentos_proyecto_actualizacion_id', 'proyecto_id', 'fecha_actualizacion', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(255), nullable=False)
     tipo = db.Column(db.Enum(TipoDocumento), nullable=False)
     estado = db.Column(db.Enum(EstadoDocumento), default=EstadoDocumento.BORRADOR)
-    proyecto_id = db.Column(db.Integer, db.ForeignKey('proyectos.id'), nullable=False)
+    proyecto_id = db.Column(db.Integer, db.ForeignKey('proyectos.id', ondelete='CASCADE'), nullable=False)
     plantilla_id = db.Column(db.Integer, db.ForeignKey('plantillas_documento.id'), nullable=True)
     contenido = db.Column(db.Text)
     archivo_url = db.Column(db.String(500))
@@ -33,25 +39,25 @@ class Documento(db.Model):
     fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relaciones
-    proyecto = db.relationship('Proyecto', backref='documentos')
+    proyecto = db.relationship('Proyecto', backref=db.backref('documentos', passive_deletes=True))
     plantilla = db.relationship('PlantillaDocumento', backref='documentos')
     creador = db.relationship('User', backref='documentos_creados')
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'nombre': self.nombre,
-            'tipo': self.tipo.value,
-            'estado': self.estado.value,
-            'proyecto_id': self.proyecto_id,
-            'plantilla_id': self.plantilla_id,
-            'contenido': self.contenido,
-            'archivo_url': self.archivo_url,
-            'version': self.version,
-            'creado_por': self.creado_por,
-            'fecha_creacion': self.fecha_creacion.isoformat() if self.fecha_creacion else None,
-            'fecha_actualizacion': self.fecha_actualizacion.isoformat() if self.fecha_actualizacion else None
-        }
+    def to_dict(self, fields=None):
+        return pick_fields({
+            'id': lambda: self.id,
+            'nombre': lambda: self.nombre,
+            'tipo': lambda: self.tipo.value,
+            'estado': lambda: self.estado.value,
+            'proyecto_id': lambda: self.proyecto_id,
+            'plantilla_id': lambda: self.plantilla_id,
+            'contenido': lambda: self.contenido,
+            'archivo_url': lambda: self.archivo_url,
+            'version': lambda: self.version,
+            'creado_por': lambda: self.creado_por,
+            'fecha_creacion': lambda: self.fecha_creacion.isoformat() if self.fecha_creacion else None,
+            'fecha_actualizacion': lambda: self.fecha_actualizacion.isoformat() if self.fecha_actualizacion else None
+        }, fields)
 
 class PlantillaDocumento(db.Model):
     __tablename__ = 'plantillas_documento'
@@ -0,0 +1,49 @@
+from src.models.user import db
+from datetime import datetime
+import enum
+
+class EstadoExportacion(enum.Enum):
+    PENDIENTE = 'pendiente'
+    PROCESANDO = 'procesando'
+    COMPLETADA = 'completada'
+    FALLIDA = 'fallida'
+
+class ExportJob(db.Model):
+    __tablename__ = 'export_jobs'
+    __table_args__ = (
+        # Reclamo del siguiente trabajo pendiente por orden de llegada
+        db.Index('ix_export_jobs_estado_creacion', 'estado', 'fecha_creacion'),
+    )
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    formato = db.Column(db.String(10), nullable=False)
+    entidades = db.Column(db.String(200), nullable=False)  # Separadas por comas
+    proyecto_id = db.Column(db.Integer, nullable=True)
+    estado = db.Column(db.Enum(EstadoExportacion), nullable=False, default=EstadoExportacion.PENDIENTE)
+    filas_procesadas = db.Column(db.Integer, nullable=False, default=0)
+    total_filas = db.Column(db.Integer, nullable=True)
+    archivo = db.Column(db.String(500), nullable=True)
+    tamano = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_inicio = db.Column(db.DateTime, nullable=True)
+    fecha_fin = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'formato': self.formato,
+            'entidades': self.entidades.split(','),
+            'proyecto_id': self.proyecto_id,
+            'estado': self.estado.value,
+            'filas_procesadas': self.filas_procesadas,
+            'total_filas': self.total_filas,
+            'archivo': self.archivo,
+            'tamano': self.tamano,
+            'error': self.error,
+            'fecha_creacion': self.fecha_creacion.isoformat() if self.fecha_creacion else None,
+            'fecha_inicio': self.fecha_inicio.isoformat() if self.fecha_inicio else None,
+            'fecha_fin': self.fecha_fin.isoformat() if self.fecha_fin else None
+        }
@@ -1,4 +1,5 @@
 from src.models.user import db
+from src.models.serialization import pick_fields
 from datetime import datetime
 import enum
 
@@ -16,9 +17,14 @@ class EstadoKPI(enum.Enum):
 
 class KPI(db.Model):
     __tablename__ = 'kpis'
+    __table_args__ = (
+        # Paginación por cursor (fecha_actualizacion, id)
+        db.Index('ix_kpis_activo_actualizacion_id', 'activo', 'fecha_actualizacion', 'id'),
+        db.Index('ix_kpis_proyecto_actualizacion_id', 'proyecto_id', 'fecha_actualizacion', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    proyecto_id = db.Column(db.Integer, db.ForeignKey('proyectos.id'), nullable=False)
+    proyecto_id = db.Column(db.Integer, db.ForeignKey('proyectos.id', ondelete='CASCADE'), nullable=False)
     nombre = db.Column(db.String(200), nullable=False)
     descripcion = db.Column(db.Text)
     tipo = db.Column(db.Enum(TipoKPI), nullable=False)
@@ -33,7 +39,12 @@ class KPI(db.Model):
     activo = db.Column(db.Boolean, default=True)
     
     # Relaciones
-    proyecto = db.relationship('Proyecto', backref='kpis')
+    proyecto = db.relationship('Proyecto', backref=db.backref('kpis', passive_deletes=True))
+    
+    # Columnas que usa to_dict (ver src/models/serialization.py)
+    serialize_dependencies = {
+        'porcentaje_cumplimiento': ('valor_actual', 'valor_objetivo')
+    }
     
     def calcular_estado(self):
         """Calcula el estado del KPI basado en los umbrales"""
@@ -52,22 +63,22 @@ class KPI(db.Model):
             return 0
         return min(100, (self.valor_actual / self.valor_objetivo) * 100)
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'proyecto_id': self.proyecto_id,
-            'nombre': self.nombre,
-            'descripcion': self.descripcion,
-            'tipo': self.tipo.value,
-            'valor_objetivo': self.valor_objetivo,
-            'valor_actual': self.valor_actual,
-            'unidad_medida': self.unidad_medida,
-            'estado': self.estado.value,
-            'umbral_amarillo': self.umbral_amarillo,
-            'umbral_rojo': self.umbral_rojo,
-            'porcentaje_cumplimiento': self.porcentaje_cumplimiento(),
-            'fecha_creacion': self.fecha_creacion.isoformat(),
-            'fecha_actualizacion': self.fecha_actualizacion.isoformat(),
-            'activo': self.activo
-        }
+    def to_dict(self, fields=None):
+        return pick_fields({
+            'id': lambda: self.id,
+            'proyecto_id': lambda: self.proyecto_id,
+            'nombre': lambda: self.nombre,
+            'descripcion': lambda: self.descripcion,
+            'tipo': lambda: self.tipo.value,
+            'valor_objetivo': lambda: self.valor_objetivo,
+            'valor_actual': lambda: self.valor_actual,
+            'unidad_medida': lambda: self.unidad_medida,
+            'estado': lambda: self.estado.value,
+            'umbral_amarillo': lambda: self.umbral_amarillo,
+            'umbral_rojo': lambda: self.umbral_rojo,
+            'porcentaje_cumplimiento': lambda: self.porcentaje_cumplimiento(),
+            'fecha_creacion': lambda: self.fecha_creacion.isoformat(),
+            'fecha_actualizacion': lambda: self.fecha_actualizacion.isoformat(),
+            'activo': lambda: self.activo
+        }, fields)
 
@@ -0,0 +1,22 @@
+from src.models.user import db
+
+class KPIMedicion(db.Model):
+    """Bloque mensual de mediciones de un KPI (solo inserción).
+
+    tiempos y valores son arreglos int64 codificados por diferencias y comprimidos
+    (ver src/services/kpi_history.py): segundos desde la medición anterior y valor
+    escalado menos el anterior.
+    """
+    __tablename__ = 'kpi_mediciones'
+    __table_args__ = (
+        db.UniqueConstraint('kpi_id', 'periodo', name='uq_kpi_mediciones_kpi_periodo'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kpi_id = db.Column(db.Integer, db.ForeignKey('kpis.id', ondelete='CASCADE'), nullable=False)
+    periodo = db.Column(db.Date, nullable=False)  # Primer día del mes
+    inicio = db.Column(db.DateTime, nullable=False)  # Primera medición del bloque (al segundo)
+    fin = db.Column(db.DateTime, nullable=False)  # Última medición del bloque
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
+    tiempos = db.Column(db.LargeBinary, nullable=False)
+    valores = db.Column(db.LargeBinary, nullable=False)
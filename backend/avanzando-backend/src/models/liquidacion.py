@@ -20,12 +20,12 @@ class Liquidacion(db.Model):
     __tablename__ = 'liquidaciones'
     
     id = db.Column(db.Integer, primary_key=True)
-    proyecto_id = db.Column(db.Integer, db.ForeignKey('proyectos.id'), nullable=False)
+    proyecto_id = db.Column(db.Integer, db.ForeignKey('proyectos.id', ondelete='CASCADE'), nullable=False)
     periodo_inicio = db.Column(db.Date, nullable=False)
     periodo_fin = db.Column(db.Date, nullable=False)
     estado = db.Column(db.Enum(EstadoLiquidacion), default=EstadoLiquidacion.BORRADOR)
-    total_gastos = db.Column(db.Decimal(10, 2), default=0)
-    total_horas = db.Column(db.Decimal(8, 2), default=0)
+    total_gastos = db.Column(db.Numeric(10, 2), default=0)
+    total_horas = db.Column(db.Numeric(8, 2), default=0)
     observaciones = db.Column(db.Text)
     creado_por = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     aprobado_por = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
@@ -33,7 +33,7 @@ class Liquidacion(db.Model):
     fecha_aprobacion = db.Column(db.DateTime, nullable=True)
     
     # Relaciones
-    proyecto = db.relationship('Proyecto', backref='liquidaciones')
+    proyecto = db.relationship('Proyecto', backref=db.backref('liquidaciones', passive_deletes=True))
     creador = db.relationship('User', foreign_keys=[creado_por], backref='liquidaciones_creadas')
     aprobador = db.relationship('User', foreign_keys=[aprobado_por], backref='liquidaciones_aprobadas')
     
@@ -57,17 +57,17 @@ class DetalleGasto(db.Model):
     __tablename__ = 'detalle_gastos'
     
     id = db.Column(db.Integer, primary_key=True)
-    liquidacion_id = db.Column(db.Integer, db.ForeignKey('liquidaciones.id'), nullable=False)
+    liquidacion_id = db.Column(db.Integer, db.ForeignKey('liquidaciones.id', ondelete='CASCADE'), nullable=False)
     tipo_gasto = db.Column(db.Enum(TipoGasto), nullable=False)
     descripcion = db.Column(db.String(500), nullable=False)
-    cantidad = db.Column(db.Decimal(8, 2), nullable=False)
-    precio_unitario = db.Column(db.Decimal(10, 2), nullable=False)
-    total = db.Column(db.Decimal(10, 2), nullable=False)
+    cantidad = db.Column(db.Numeric(8, 2), nullable=False)
+    precio_unitario = db.Column(db.Numeric(10, 2), nullable=False)
+    total = db.Column(db.Numeric(10, 2), nullable=False)
     fecha_gasto = db.Column(db.Date, nullable=False)
     comprobante_url = db.Column(db.String(500))
     
     # Relaciones
-    liquidacion = db.relationship('Liquidacion', backref='detalles_gastos')
+    liquidacion = db.relationship('Liquidacion', backref=db.backref('detalles_gastos', passive_deletes=True))
     
     def to_dict(self):
         return {
@@ -86,17 +86,17 @@ class RegistroHoras(db.Model):
     __tablename__ = 'registro_horas'
     
     id = db.Column(db.Integer, primary_key=True)
-    liquidacion_id = db.Column(db.Integer, db.ForeignKey('liquidaciones.id'), nullable=False)
-    recurso_id = db.Column(db.Integer, db.ForeignKey('recursos.id'), nullable=False)
+    liquidacion_id = db.Column(db.Integer, db.ForeignKey('liquidaciones.id', ondelete='CASCADE'), nullable=False)
+    recurso_id = db.Column(db.Integer, db.ForeignKey('recursos.id', ondelete='CASCADE'), nullable=False)
     fecha = db.Column(db.Date, nullable=False)
-    horas_trabajadas = db.Column(db.Decimal(4, 2), nullable=False)
-    tarifa_hora = db.Column(db.Decimal(8, 2), nullable=False)
-    total = db.Column(db.Decimal(10, 2), nullable=False)
+    horas_trabajadas = db.Column(db.Numeric(4, 2), nullable=False)
+    tarifa_hora = db.Column(db.Numeric(8, 2), nullable=False)
+    total = db.Column(db.Numeric(10, 2), nullable=False)
     descripcion_actividad = db.Column(db.Text)
     
     # Relaciones
-    liquidacion = db.relationship('Liquidacion', backref='registro_horas')
-    recurso = db.relationship('Recurso', backref='horas_registradas')
+    liquidacion = db.relationship('Liquidacion', backref=db.backref('registro_horas', passive_deletes=True))
+    recurso = db.relationship('Recurso', backref=db.backref('horas_registradas', passive_deletes=True))
     
     def to_dict(self):
         return {
@@ -0,0 +1,101 @@
+import base64
+import json
+import os
+from datetime import datetime
+from flask import request, jsonify
+from sqlalchemy import and_, or_
+from src.models.streaming import (NDJSON_MIMETYPE, STREAM_BATCH_SIZE, wants_ndjson, iter_ndjson,
+                                  iter_json_array, stream_response)
+
+DEFAULT_PAGE_SIZE = int(os.environ.get('DEFAULT_PAGE_SIZE', 50))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 500))
+
+class CursorInvalidoError(ValueError):
+    """El cursor recibido no se puede decodificar"""
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        raise CursorInvalidoError('Cursor inválido')
+
+def keyset_paginate(query, model, sort_column=None):
+    """Pagina por cursor (sort_column, id) descendente según los parámetros limit y cursor.
+
+    Sin limit ni cursor en la petición retorna todas las filas, como antes.
+    Retorna (filas, next_cursor); next_cursor es None en la última página.
+    """
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+    if limit is None and not cursor:
+        return query.all(), None
+
+    limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+
+    if cursor:
+        values = decode_cursor(cursor)
+        try:
+            if sort_column is None:
+                query = query.filter(model.id < int(values[0]))
+            else:
+                sort_value = datetime.fromisoformat(values[0])
+                query = query.filter(or_(
+                    sort_column < sort_value,
+                    and_(sort_column == sort_value, model.id < int(values[1]))
+                ))
+        except (IndexError, KeyError, TypeError, ValueError):
+            raise CursorInvalidoError('Cursor inválido')
+
+    if sort_column is None:
+        query = query.order_by(model.id.desc())
+    else:
+        query = query.order_by(sort_column.desc(), model.id.desc())
+
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    if sort_column is None:
+        return rows, encode_cursor([last.id])
+    return rows, encode_cursor([getattr(last, sort_column.key).isoformat(), last.id])
+
+def jsonify_page(items, next_cursor):
+    """Respuesta de arreglo JSON con el siguiente cursor en el header X-Next-Cursor"""
+    response = jsonify(items)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+def respond_page(query, model, serialize, sort_column=None, key=None):
+    """Responde una colección según limit/cursor y el header Accept.
+
+    Con limit o cursor retorna la página (JSON o NDJSON). Sin ellos transmite la colección
+    completa leída con yield_per, como arreglo JSON o NDJSON, sin materializar la lista.
+    key envuelve el arreglo en {key: [...], 'next_cursor': ...} como hacen algunos endpoints.
+    """
+    ndjson = wants_ndjson()
+    if request.args.get('limit') is not None or request.args.get('cursor'):
+        rows, next_cursor = keyset_paginate(query, model, sort_column)
+        if ndjson:
+            response = stream_response(iter_ndjson(serialize(row) for row in rows), NDJSON_MIMETYPE)
+        elif key:
+            response = jsonify({key: [serialize(row) for row in rows], 'next_cursor': next_cursor})
+        else:
+            response = jsonify([serialize(row) for row in rows])
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+
+    items = (serialize(row) for row in query.yield_per(STREAM_BATCH_SIZE))
+    if ndjson:
+        return stream_response(iter_ndjson(items), NDJSON_MIMETYPE)
+    if key:
+        return stream_response(iter_json_array(items, prefix=f'{{"{key}":[', suffix='],"next_cursor":null}'))
+    return stream_response(iter_json_array(items))
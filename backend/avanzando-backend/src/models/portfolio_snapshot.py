@@ -0,0 +1,30 @@
+from src.models.user import db
+
+class PortfolioSnapshot(db.Model):
+    """Hechos diarios del portafolio (solo inserción): una fila por proyecto y una global por día"""
+    __tablename__ = 'portfolio_snapshots'
+    __table_args__ = (
+        # Series por proyecto, por cliente y global (proyecto_id NULL) en un rango de fechas
+        db.Index('ix_portfolio_snapshots_proyecto_fecha', 'proyecto_id', 'fecha'),
+        db.Index('ix_portfolio_snapshots_cliente_fecha', 'cliente_id', 'fecha'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    fecha = db.Column(db.Date, nullable=False, index=True)
+    proyecto_id = db.Column(db.Integer, nullable=True)  # NULL = portafolio global
+    cliente_id = db.Column(db.Integer, nullable=True)
+    proyectos = db.Column(db.Integer, nullable=False, default=0)
+    proyectos_activos = db.Column(db.Integer, nullable=False, default=0)
+    presupuesto_estimado = db.Column(db.Float, nullable=False, default=0)
+    presupuesto_real = db.Column(db.Float, nullable=False, default=0)
+    progreso = db.Column(db.Float, nullable=False, default=0)
+    duracion_dias = db.Column(db.Float, nullable=False, default=0)
+    kpis_verde = db.Column(db.Integer, nullable=False, default=0)
+    kpis_amarillo = db.Column(db.Integer, nullable=False, default=0)
+    kpis_rojo = db.Column(db.Integer, nullable=False, default=0)
+    riesgos_abiertos = db.Column(db.Integer, nullable=False, default=0)
+    riesgos_altos = db.Column(db.Integer, nullable=False, default=0)
+    exposicion_riesgo = db.Column(db.Float, nullable=False, default=0)  # Suma de probabilidad x impacto
+    costo_riesgo = db.Column(db.Float, nullable=False, default=0)
+    recursos_requeridos = db.Column(db.Float, nullable=False, default=0)
+    recursos_asignados = db.Column(db.Float, nullable=False, default=0)
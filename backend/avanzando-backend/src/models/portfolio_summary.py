@@ -0,0 +1,29 @@
+from src.models.user import db
+from datetime import datetime
+
+class PortfolioSummary(db.Model):
+    __tablename__ = 'portfolio_summary'
+
+    id = db.Column(db.Integer, primary_key=True)
+    cliente_id = db.Column(db.Integer, nullable=True, unique=True, index=True)  # NULL = portafolio global
+    total_proyectos = db.Column(db.Integer, nullable=False, default=0)
+    proyectos_activos = db.Column(db.Integer, nullable=False, default=0)
+    proyectos_completados = db.Column(db.Integer, nullable=False, default=0)
+    presupuesto_total = db.Column(db.Float, nullable=False, default=0)
+    presupuesto_gastado = db.Column(db.Float, nullable=False, default=0)
+    total_kpis = db.Column(db.Integer, nullable=False, default=0)
+    riesgos_altos = db.Column(db.Integer, nullable=False, default=0)
+    total_recursos = db.Column(db.Integer, nullable=False, default=0)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'totalProjects': self.total_proyectos,
+            'activeProjects': self.proyectos_activos,
+            'completedProjects': self.proyectos_completados,
+            'totalBudget': self.presupuesto_total,
+            'totalSpent': self.presupuesto_gastado,
+            'totalKpis': self.total_kpis,
+            'highRisks': self.riesgos_altos,
+            'totalResources': self.total_recursos
+        }
@@ -1,4 +1,5 @@
 from src.models.user import db
+from src.models.serialization import pick_fields
 from datetime import datetime
 from decimal import Decimal
 import enum
@@ -18,6 +19,11 @@ class TipoFase(enum.Enum):
 
 class Proyecto(db.Model):
     __tablename__ = 'proyectos'
+    __table_args__ = (
+        # Paginación por cursor (fecha_actualizacion, id)
+        db.Index('ix_proyectos_actualizacion_id', 'fecha_actualizacion', 'id'),
+        db.Index('ix_proyectos_cliente_actualizacion_id', 'cliente_id', 'fecha_actualizacion', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(200), nullable=False)
@@ -28,34 +34,43 @@ class Proyecto(db.Model):
     fecha_fin = db.Column(db.Date, nullable=True)
     presupuesto_estimado = db.Column(db.Float, nullable=True)
     presupuesto_real = db.Column(db.Float, nullable=True, default=0)
+    # Promedio ponderado del avance de las fases (ver src/services/progress_rollup.py)
+    progreso_general = db.Column(db.Float, nullable=False, default=0)
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
     fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relaciones
     cliente = db.relationship('Cliente', backref='proyectos', lazy=True)
-    fases = db.relationship('Fase', backref='proyecto', lazy=True, cascade='all, delete-orphan')
+    fases = db.relationship('Fase', backref='proyecto', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'nombre': self.nombre,
-            'descripcion': self.descripcion,
-            'cliente_id': self.cliente_id,
-            'cliente_nombre': self.cliente.nombre if self.cliente else None,
-            'estado': self.estado.value,
-            'fecha_inicio': self.fecha_inicio.isoformat() if self.fecha_inicio else None,
-            'fecha_fin': self.fecha_fin.isoformat() if self.fecha_fin else None,
-            'presupuesto_estimado': self.presupuesto_estimado,
-            'presupuesto_real': self.presupuesto_real or 0,
-            'fecha_creacion': self.fecha_creacion.isoformat(),
-            'fecha_actualizacion': self.fecha_actualizacion.isoformat()
-        }
+    # Relaciones y columnas que usa to_dict (ver src/models/serialization.py)
+    serialize_relationships = ('cliente',)
+    serialize_dependencies = {
+        'cliente_nombre': ('cliente_id', 'cliente')
+    }
+    
+    def to_dict(self, fields=None):
+        return pick_fields({
+            'id': lambda: self.id,
+            'nombre': lambda: self.nombre,
+            'descripcion': lambda: self.descripcion,
+            'cliente_id': lambda: self.cliente_id,
+            'cliente_nombre': lambda: self.cliente.nombre if self.cliente else None,
+            'estado': lambda: self.estado.value,
+            'fecha_inicio': lambda: self.fecha_inicio.isoformat() if self.fecha_inicio else None,
+            'fecha_fin': lambda: self.fecha_fin.isoformat() if self.fecha_fin else None,
+            'presupuesto_estimado': lambda: self.presupuesto_estimado,
+            'presupuesto_real': lambda: self.presupuesto_real or 0,
+            'progreso_general': lambda: round(self.progreso_general or 0, 2),
+            'fecha_creacion': lambda: self.fecha_creacion.isoformat(),
+            'fecha_actualizacion': lambda: self.fecha_actualizacion.isoformat()
+        }, fields)
 
 class Fase(db.Model):
     __tablename__ = 'fases'
     
     id = db.Column(db.Integer, primary_key=True)
-    proyecto_id = db.Column(db.Integer, db.ForeignKey('proyectos.id'), nullable=False)
+    proyecto_id = db.Column(db.Integer, db.ForeignKey('proyectos.id', ondelete='CASCADE'), nullable=False)
     tipo = db.Column(db.Enum(TipoFase), nullable=False)
     nombre = db.Column(db.String(200), nullable=False)
     descripcion = db.Column(db.Text, nullable=True)
@@ -66,18 +81,18 @@ class Fase(db.Model):
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
     fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'proyecto_id': self.proyecto_id,
-            'tipo': self.tipo.value,
-            'nombre': self.nombre,
-            'descripcion': self.descripcion,
-            'avance': self.avance,
-            'fecha_inicio': self.fecha_inicio.isoformat() if self.fecha_inicio else None,
-            'fecha_fin': self.fecha_fin.isoformat() if self.fecha_fin else None,
-            'completada': self.completada,
-            'fecha_creacion': self.fecha_creacion.isoformat(),
-            'fecha_actualizacion': self.fecha_actualizacion.isoformat()
-        }
+    def to_dict(self, fields=None):
+        return pick_fields({
+            'id': lambda: self.id,
+            'proyecto_id': lambda: self.proyecto_id,
+            'tipo': lambda: self.tipo.value,
+            'nombre': lambda: self.nombre,
+            'descripcion': lambda: self.descripcion,
+            'avance': lambda: self.avance,
+            'fecha_inicio': lambda: self.fecha_inicio.isoformat() if self.fecha_inicio else None,
+            'fecha_fin': lambda: self.fecha_fin.isoformat() if self.fecha_fin else None,
+            'completada': lambda: self.completada,
+            'fecha_creacion': lambda: self.fecha_creacion.isoformat(),
+            'fecha_actualizacion': lambda: self.fecha_actualizacion.isoformat()
+        }, fields)
 
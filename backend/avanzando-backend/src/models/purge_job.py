@@ -0,0 +1,40 @@
+from src.models.user import db
+from datetime import datetime
+import enum
+
+class EstadoPurga(enum.Enum):
+    PENDIENTE = 'pending'
+    EJECUTANDO = 'running'
+    COMPLETADA = 'completed'
+    FALLIDA = 'failed'
+
+class PurgeJob(db.Model):
+    """Trabajo de eliminación asíncrona de proyectos (ver src/services/project_purge.py)"""
+    __tablename__ = 'purge_jobs'
+    __table_args__ = (
+        # Reclamo del siguiente trabajo disponible por orden de llegada
+        db.Index('ix_purge_jobs_estado_creacion', 'estado', 'fecha_creacion'),
+    )
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    solicitado_por = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    proyecto_ids = db.Column(db.Text, nullable=False)  # Separados por comas
+    estado = db.Column(db.Enum(EstadoPurga), nullable=False, default=EstadoPurga.PENDIENTE)
+    eliminados = db.Column(db.JSON, nullable=False, default=dict)  # Filas borradas por tabla
+    error = db.Column(db.Text, nullable=True)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_inicio = db.Column(db.DateTime, nullable=True)
+    fecha_fin = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'proyecto_ids': [int(proyecto_id) for proyecto_id in self.proyecto_ids.split(',')],
+            'solicitado_por': self.solicitado_por,
+            'status': self.estado.value,
+            'deleted': self.eliminados or {},
+            'error': self.error,
+            'created_at': self.fecha_creacion.isoformat() if self.fecha_creacion else None,
+            'started_at': self.fecha_inicio.isoformat() if self.fecha_inicio else None,
+            'finished_at': self.fecha_fin.isoformat() if self.fecha_fin else None
+        }
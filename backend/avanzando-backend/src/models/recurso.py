@@ -1,4 +1,5 @@
 from src.models.user import db
+from src.models.serialization import pick_fields
 from datetime import datetime
 import enum
 
@@ -16,9 +17,14 @@ class EstadoRecurso(enum.Enum):
 
 class Recurso(db.Model):
     __tablename__ = 'recursos'
+    __table_args__ = (
+        # Paginación por cursor (fecha_actualizacion, id)
+        db.Index('ix_recursos_activo_actualizacion_id', 'activo', 'fecha_actualizacion', 'id'),
+        db.Index('ix_recursos_proyecto_actualizacion_id', 'proyecto_id', 'fecha_actualizacion', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    proyecto_id = db.Column(db.Integer, db.ForeignKey('proyectos.id'), nullable=False)
+    proyecto_id = db.Column(db.Integer, db.ForeignKey('proyectos.id', ondelete='CASCADE'), nullable=False)
     nombre = db.Column(db.String(200), nullable=False)
     descripcion = db.Column(db.Text)
     tipo = db.Column(db.Enum(TipoRecurso), nullable=False)
@@ -37,9 +43,17 @@ class Recurso(db.Model):
     activo = db.Column(db.Boolean, default=True)
     
     # Relaciones
-    proyecto = db.relationship('Proyecto', backref='recursos')
+    proyecto = db.relationship('Proyecto', backref=db.backref('recursos', passive_deletes=True))
     usuario_asignado = db.relationship('User', foreign_keys=[usuario_asignado_id])
     
+    # Relaciones y columnas que usa to_dict (ver src/models/serialization.py)
+    serialize_relationships = ('usuario_asignado',)
+    serialize_dependencies = {
+        'usuario_asignado_nombre': ('usuario_asignado_id', 'usuario_asignado'),
+        'porcentaje_asignacion': ('cantidad_asignada', 'cantidad_requerida'),
+        'dias_utilizacion': ('fecha_inicio', 'fecha_fin')
+    }
+    
     def calcular_costo_total(self):
         """Calcula el costo total del recurso"""
         self.costo_total = self.cantidad_asignada * self.costo_unitario
@@ -70,28 +84,28 @@ class Recurso(db.Model):
         
         self.fecha_actualizacion = datetime.utcnow()
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'proyecto_id': self.proyecto_id,
-            'nombre': self.nombre,
-            'descripcion': self.descripcion,
-            'tipo': self.tipo.value,
-            'estado': self.estado.value,
-            'cantidad_requerida': self.cantidad_requerida,
-            'cantidad_asignada': self.cantidad_asignada,
-            'unidad_medida': self.unidad_medida,
-            'costo_unitario': self.costo_unitario,
-            'costo_total': self.costo_total,
-            'porcentaje_asignacion': self.porcentaje_asignacion(),
-            'dias_utilizacion': self.dias_utilizacion(),
-            'fecha_inicio': self.fecha_inicio.isoformat() if self.fecha_inicio else None,
-            'fecha_fin': self.fecha_fin.isoformat() if self.fecha_fin else None,
-            'usuario_asignado_id': self.usuario_asignado_id,
-            'usuario_asignado_nombre': self.usuario_asignado.nombre if self.usuario_asignado else None,
-            'observaciones': self.observaciones,
-            'fecha_creacion': self.fecha_creacion.isoformat(),
-            'fecha_actualizacion': self.fecha_actualizacion.isoformat(),
-            'activo': self.activo
-        }
+    def to_dict(self, fields=None):
+        return pick_fields({
+            'id': lambda: self.id,
+            'proyecto_id': lambda: self.proyecto_id,
+            'nombre': lambda: self.nombre,
+            'descripcion': lambda: self.descripcion,
+            'tipo': lambda: self.tipo.value,
+            'estado': lambda: self.estado.value,
+            'cantidad_requerida': lambda: self.cantidad_requerida,
+            'cantidad_asignada': lambda: self.cantidad_asignada,
+            'unidad_medida': lambda: self.unidad_medida,
+            'costo_unitario': lambda: self.costo_unitario,
+            'costo_total': lambda: self.costo_total,
+            'porcentaje_asignacion': lambda: self.porcentaje_asignacion(),
+            'dias_utilizacion': lambda: self.dias_utilizacion(),
+            'fecha_inicio': lambda: self.fecha_inicio.isoformat() if self.fecha_inicio else None,
+            'fecha_fin': lambda: self.fecha_fin.isoformat() if self.fecha_fin else None,
+            'usuario_asignado_id': lambda: self.usuario_asignado_id,
+            'usuario_asignado_nombre': lambda: self.usuario_asignado.nombre if self.usuario_asignado else None,
+            'observaciones': lambda: self.observaciones,
+            'fecha_creacion': lambda: self.fecha_creacion.isoformat(),
+            'fecha_actualizacion': lambda: self.fecha_actualizacion.isoformat(),
+            'activo': lambda: self.activo
+        }, fields)
 
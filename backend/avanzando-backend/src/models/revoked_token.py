@@ -0,0 +1,20 @@
+from src.models.user import db
+from datetime import datetime
+
+class RevokedToken(db.Model):
+    __tablename__ = 'revoked_tokens'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    token_digest = db.Column(db.String(64), unique=True, nullable=False, index=True)  # SHA-256 del JWT
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'token_digest': self.token_digest,
+            'user_id': self.user_id,
+            'expires_at': self.expires_at.isoformat(),
+            'revoked_at': self.revoked_at.isoformat() if self.revoked_at else None
+        }
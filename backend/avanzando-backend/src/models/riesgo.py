@@ -1,4 +1,5 @@
 from src.models.user import db
+from src.models.serialization import pick_fields
 from datetime import datetime
 import enum
 
@@ -32,9 +33,13 @@ class EstadoRiesgo(enum.Enum):
 
 class Riesgo(db.Model):
     __tablename__ = 'riesgos'
+    __table_args__ = (
+        # Paginación por cursor (id)
+        db.Index('ix_riesgos_proyecto_id_id', 'proyecto_id', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    proyecto_id = db.Column(db.Integer, db.ForeignKey('proyectos.id'), nullable=False)
+    proyecto_id = db.Column(db.Integer, db.ForeignKey('proyectos.id', ondelete='CASCADE'), nullable=False)
     codigo = db.Column(db.String(20), nullable=False)
     nombre = db.Column(db.String(200), nullable=False)
     descripcion = db.Column(db.Text, nullable=False)
@@ -50,11 +55,21 @@ class Riesgo(db.Model):
     fecha_cierre = db.Column(db.DateTime)
     costo_estimado = db.Column(db.Float, default=0)
     activo = db.Column(db.Boolean, default=True)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relaciones
-    proyecto = db.relationship('Proyecto', backref='riesgos')
+    proyecto = db.relationship('Proyecto', backref=db.backref('riesgos', passive_deletes=True))
     responsable = db.relationship('User', foreign_keys=[responsable_id])
     
+    # Relaciones y columnas que usa to_dict (ver src/models/serialization.py)
+    serialize_relationships = ('responsable',)
+    serialize_dependencies = {
+        'responsable_nombre': ('responsable_id', 'responsable'),
+        'exposicion': ('probabilidad', 'impacto'),
+        'nivel_riesgo': ('probabilidad', 'impacto'),
+        'color_riesgo': ('probabilidad', 'impacto')
+    }
+    
     def calcular_exposicion(self):
         """Calcula la exposición al riesgo (probabilidad * impacto)"""
         return self.probabilidad.value * self.impacto.value
@@ -85,34 +100,35 @@ class Riesgo(db.Model):
         }
         return colores.get(nivel, "#6B7280")
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'proyecto_id': self.proyecto_id,
-            'codigo': self.codigo,
-            'nombre': self.nombre,
-            'descripcion': self.descripcion,
-            'tipo': self.tipo.value,
-            'probabilidad': {
+    def to_dict(self, fields=None):
+        return pick_fields({
+            'id': lambda: self.id,
+            'proyecto_id': lambda: self.proyecto_id,
+            'codigo': lambda: self.codigo,
+            'nombre': lambda: self.nombre,
+            'descripcion': lambda: self.descripcion,
+            'tipo': lambda: self.tipo.value,
+            'probabilidad': lambda: {
                 'valor': self.probabilidad.value,
                 'texto': self.probabilidad.name
             },
-            'impacto': {
+            'impacto': lambda: {
                 'valor': self.impacto.value,
                 'texto': self.impacto.name
             },
-            'estado': self.estado.value,
-            'plan_mitigacion': self.plan_mitigacion,
-            'plan_contingencia': self.plan_contingencia,
-            'responsable_id': self.responsable_id,
-            'responsable_nombre': self.responsable.nombre if self.responsable else None,
-            'exposicion': self.calcular_exposicion(),
-            'nivel_riesgo': self.nivel_riesgo(),
-            'color_riesgo': self.color_riesgo(),
-            'fecha_identificacion': self.fecha_identificacion.isoformat(),
-            'fecha_revision': self.fecha_revision.isoformat() if self.fecha_revision else None,
-            'fecha_cierre': self.fecha_cierre.isoformat() if self.fecha_cierre else None,
-            'costo_estimado': self.costo_estimado,
-            'activo': self.activo
-        }
+            'estado': lambda: self.estado.value,
+            'plan_mitigacion': lambda: self.plan_mitigacion,
+            'plan_contingencia': lambda: self.plan_contingencia,
+            'responsable_id': lambda: self.responsable_id,
+            'responsable_nombre': lambda: self.responsable.nombre if self.responsable else None,
+            'exposicion': lambda: self.calcular_exposicion(),
+            'nivel_riesgo': lambda: self.nivel_riesgo(),
+            'color_riesgo': lambda: self.color_riesgo(),
+            'fecha_identificacion': lambda: self.fecha_identificacion.isoformat(),
+            'fecha_revision': lambda: self.fecha_revision.isoformat() if self.fecha_revision else None,
+            'fecha_cierre': lambda: self.fecha_cierre.isoformat() if self.fecha_cierre else None,
+            'costo_estimado': lambda: self.costo_estimado,
+            'activo': lambda: self.activo,
+            'fecha_actualizacion': lambda: self.fecha_actualizacion.isoformat() if self.fecha_actualizacion else None
+        }, fields)
 
@@ -0,0 +1,47 @@
+from flask import request
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, selectinload, load_only
+
+def requested_fields():
+    """Campos solicitados con ?fields=a,b,c o None si se piden todos"""
+    raw = request.args.get('fields')
+    if not raw:
+        return None
+    return {field.strip() for field in raw.split(',') if field.strip()}
+
+def pick_fields(values, fields=None):
+    """Evalúa solo los campos solicitados; values mapea nombre -> callable"""
+    if fields is None:
+        return {name: value() for name, value in values.items()}
+    return {name: value() for name, value in values.items() if name in fields}
+
+def _dependencies(model, fields):
+    """Atributos del modelo que se necesitan para serializar los campos"""
+    dependencies = getattr(model, 'serialize_dependencies', {})
+    names = set()
+    for field in fields:
+        names.update(dependencies.get(field, (field,)))
+    return names
+
+def eager_load(query, model, fields=None):
+    """Aplica la carga anticipada de las relaciones que usa model.to_dict.
+
+    Si se indican campos, además restringe las columnas con load_only para
+    que las columnas Text/JSON no solicitadas nunca se lean de la base de datos.
+    """
+    relationships = getattr(model, 'serialize_relationships', ())
+    if fields is not None:
+        mapper = inspect(model)
+        names = _dependencies(model, fields)
+        relationships = [name for name in relationships if name in names]
+        # La clave primaria y la columna de ordenamiento siempre se cargan
+        columns = {'id', 'fecha_actualizacion'} | names
+        query = query.options(load_only(*[
+            getattr(model, name) for name in columns if name in mapper.column_attrs
+        ]))
+    for name in relationships:
+        attr = getattr(model, name)
+        # Colecciones con selectinload, relaciones a uno con joinedload
+        loader = selectinload if attr.property.uselist else joinedload
+        query = query.options(loader(attr))
+    return query
@@ -0,0 +1,60 @@
+import os
+from flask import Response, current_app, request, stream_with_context
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_BATCH_SIZE = int(os.environ.get('STREAM_BATCH_SIZE', 500))
+
+def wants_ndjson():
+    """Negociación de contenido: NDJSON solo si el cliente lo prefiere en Accept"""
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+def iter_ndjson(items, batch_size=None):
+    """Codifica un objeto JSON por línea, emitiendo un fragmento cada batch_size objetos"""
+    batch_size = batch_size or STREAM_BATCH_SIZE
+    dumps = current_app.json.dumps
+    lines = []
+    for item in items:
+        lines.append(dumps(item))
+        if len(lines) >= batch_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+def iter_json_array(items, prefix='[', suffix=']', batch_size=None):
+    """Codifica un arreglo JSON incrementalmente; prefix/suffix permiten envolverlo en un objeto"""
+    batch_size = batch_size or STREAM_BATCH_SIZE
+    dumps = current_app.json.dumps
+    yield prefix
+    separator = ''
+    encoded = []
+    for item in items:
+        encoded.append(dumps(item))
+        if len(encoded) >= batch_size:
+            yield separator + ','.join(encoded)
+            separator = ','
+            encoded = []
+    if encoded:
+        yield separator + ','.join(encoded)
+    yield suffix
+
+def iter_json_object(pairs, prefix='{', suffix='}', batch_size=None):
+    """Codifica un objeto JSON incrementalmente a partir de pares (clave, valor)"""
+    batch_size = batch_size or STREAM_BATCH_SIZE
+    dumps = current_app.json.dumps
+    yield prefix
+    separator = ''
+    encoded = []
+    for key, value in pairs:
+        encoded.append(f'{dumps(str(key))}:{dumps(value)}')
+        if len(encoded) >= batch_size:
+            yield separator + ','.join(encoded)
+            separator = ','
+            encoded = []
+    if encoded:
+        yield separator + ','.join(encoded)
+    yield suffix
+
+def stream_response(chunks, mimetype='application/json'):
+    """Respuesta en streaming que conserva el contexto de la petición (sesión de base de datos)"""
+    return Response(stream_with_context(chunks), mimetype=mimetype)
@@ -107,6 +107,10 @@ class Subscription(db.Model):
         """Verifica si puede usar funcionalidades de IA"""
         return self.is_active() and self.get_limits()['ai_features']
     
+    def can_export(self, formato):
+        """Verifica si el plan incluye el formato de exportación (p. ej. 'Excel')"""
+        return self.is_active() and formato in self.get_limits()['export_formats']
+    
     def can_use_advanced_analytics(self):
         """Verifica si puede usar analytics avanzados"""
         return self.is_active() and self.get_limits()['advanced_analytics']
@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
+from src.models.serialization import pick_fields
 from datetime import datetime
 import enum
 
@@ -13,6 +14,10 @@ class UserRole(enum.Enum):
 
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Paginación por cursor (fecha_actualizacion, id)
+        db.Index('ix_users_actualizacion_id', 'fecha_actualizacion', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(100), nullable=False)
@@ -33,17 +38,17 @@ class User(db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'nombre': self.nombre,
-            'email': self.email,
-            'rol': self.rol.value,
-            'cliente_id': self.cliente_id,
-            'activo': self.activo,
-            'fecha_creacion': self.fecha_creacion.isoformat(),
-            'fecha_actualizacion': self.fecha_actualizacion.isoformat()
-        }
+    def to_dict(self, fields=None):
+        return pick_fields({
+            'id': lambda: self.id,
+            'nombre': lambda: self.nombre,
+            'email': lambda: self.email,
+            'rol': lambda: self.rol.value,
+            'cliente_id': lambda: self.cliente_id,
+            'activo': lambda: self.activo,
+            'fecha_creacion': lambda: self.fecha_creacion.isoformat(),
+            'fecha_actualizacion': lambda: self.fecha_actualizacion.isoformat()
+        }, fields)
 
 class Cliente(db.Model):
     __tablename__ = 'clientes'
@@ -1,32 +1,18 @@
 from flask import Blueprint, jsonify, request
 from src.models.user import db, User
 from src.models.subscription import Subscription
-from src.models.project import Proyecto
+from src.models.project import Proyecto, Fase
 from src.models.ai_prediction import AIPrediction, PredictionType, AIEngine
 from src.models.kpi import KPI
 from src.models.riesgo import Riesgo
+from src.middleware.auth import token_required
+from src.services.kpi_history import kpi_history
 from functools import wraps
-import jwt
-import os
 from datetime import datetime, timedelta
+from sqlalchemy import func, case
 
 ai_bp = Blueprint('ai', __name__)
 
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({'message': 'Token is missing!'}), 401
-        try:
-            token = token.split(' ')[1]
-            data = jwt.decode(token, os.environ.get('SECRET_KEY', 'dev-secret-key'), algorithms=['HS256'])
-            current_user = User.query.get(data['user_id'])
-        except:
-            return jsonify({'message': 'Token is invalid!'}), 401
-        return f(current_user, *args, **kwargs)
-    return decorated
-
 def ai_required(f):
     @wraps(f)
     def decorated(current_user, *args, **kwargs):
@@ -54,9 +40,10 @@ def predict_project_completion(current_user, project_id):
         
         # Calcular datos de entrada
         days_elapsed = (datetime.utcnow() - project.fecha_inicio).days if project.fecha_inicio else 30
-        completed_phases = len([f for f in project.fases if f.estado.value == 'completada'])
-        total_phases = len(project.fases)
-        progress = (completed_phases / total_phases * 100) if total_phases > 0 else 0
+        total_phases, completed_phases = db.session.query(
+            func.count(Fase.id), func.coalesce(func.sum(case((Fase.completada == True, 1), else_=0)), 0)
+        ).filter(Fase.proyecto_id == project_id).one()
+        progress = project.progreso_general or 0
         
         input_data = {
             'project_id': project_id,
@@ -102,10 +89,8 @@ def predict_budget_overrun(current_user, project_id):
         if project.pm_id != current_user.id and current_user.rol.value != 'administrador':
             return jsonify({'error': 'No tienes permisos para este proyecto'}), 403
         
-        # Calcular progreso
-        completed_phases = len([f for f in project.fases if f.estado.value == 'completada'])
-        total_phases = len(project.fases)
-        progress_percentage = (completed_phases / total_phases * 100) if total_phases > 0 else 0
+        # Progreso mantenido en el proyecto
+        progress_percentage = project.progreso_general or 0
         
         budget_used_percentage = 0
         if project.presupuesto_estimado and project.presupuesto_estimado > 0:
@@ -155,13 +140,8 @@ def forecast_kpi_trend(current_user, kpi_id):
         if project.pm_id != current_user.id and current_user.rol.value != 'administrador':
             return jsonify({'error': 'No tienes permisos para este KPI'}), 403
         
-        # Simular datos históricos (en producción, obtener de base de datos)
-        historical_values = [
-            kpi.valor_actual * 0.7,
-            kpi.valor_actual * 0.8,
-            kpi.valor_actual * 0.9,
-            kpi.valor_actual
-        ]
+        # Últimas mediciones registradas (kpi_mediciones)
+        historical_values = kpi_history.recent(kpi_id) or [kpi.valor_actual]
         
         input_data = {
             'kpi_id': kpi_id,
@@ -1,8 +1,13 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from src.models.user import db, User, UserRole
+from src.middleware.auth import token_required, admin_required
+from src.services.principal_cache import principal_cache
+from src.services.token_verifier import token_verifier, TokenRevocadoError
+from src.services.password_hasher import password_hasher, HashingOverloadedError
 import jwt
 from datetime import datetime, timedelta
 import os
+import uuid
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -45,16 +50,20 @@ def register():
             rol=rol,
             cliente_id=data.get('cliente_id')
         )
-        new_user.set_password(data['password'])
+        password_hasher.set_password(new_user, data['password'])
         
         db.session.add(new_user)
         db.session.commit()
+        principal_cache.invalidate(new_user.id)
         
         return jsonify({
             'message': 'Usuario creado exitosamente',
             'user': new_user.to_dict()
         }), 201
         
+    except HashingOverloadedError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -70,14 +79,20 @@ def login():
         # Buscar usuario
         user = User.query.filter_by(email=data['email'], activo=True).first()
         
-        if not user or not user.check_password(data['password']):
+        if not user or not password_hasher.check_password(user, data['password']):
             return jsonify({'error': 'Credenciales inválidas'}), 401
         
+        # Rehash perezoso al método/costo configurado
+        if password_hasher.needs_rehash(user.password_hash):
+            password_hasher.set_password(user, data['password'])
+            db.session.commit()
+        
         # Generar token JWT
         token_payload = {
             'user_id': user.id,
             'email': user.email,
             'rol': user.rol.value,
+            'jti': uuid.uuid4().hex,  # Identificador único para revocación
             'exp': datetime.utcnow() + timedelta(hours=24)
         }
         
@@ -89,7 +104,10 @@ def login():
             'user': user.to_dict()
         }), 200
         
+    except HashingOverloadedError as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/profile', methods=['GET'])
@@ -102,8 +120,8 @@ def get_profile():
         
         token = auth_header.split(' ')[1]
         
-        # Decodificar token
-        payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+        # Verificar token
+        payload = token_verifier.verify(token)
         user_id = payload['user_id']
         
         # Buscar usuario
@@ -115,8 +133,43 @@ def get_profile():
         
     except jwt.ExpiredSignatureError:
         return jsonify({'error': 'Token expirado'}), 401
+    except TokenRevocadoError:
+        return jsonify({'error': 'Token revocado'}), 401
     except jwt.InvalidTokenError:
         return jsonify({'error': 'Token inválido'}), 401
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+
+@auth_bp.route('/logout', methods=['POST'])
+@token_required
+def logout(current_user):
+    """Revoca el token usado en la petición"""
+    try:
+        token_verifier.revoke(g.token, g.token_claims)
+        return jsonify({'message': 'Sesión cerrada exitosamente'}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@auth_bp.route('/revoke', methods=['POST'])
+@token_required
+@admin_required
+def revoke_token(current_user):
+    """Revocación forzada de un token por parte de un administrador"""
+    try:
+        data = request.get_json()
+        if not data or not data.get('token'):
+            return jsonify({'error': 'Token es requerido'}), 400
+        
+        try:
+            claims = token_verifier.verify(data['token'])
+        except jwt.InvalidTokenError:
+            # Tokens expirados o ya revocados no requieren acción
+            return jsonify({'message': 'El token ya no es válido'}), 200
+        
+        token_verifier.revoke(data['token'], claims)
+        return jsonify({'message': 'Token revocado exitosamente'}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
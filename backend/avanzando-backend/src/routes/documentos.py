@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify, send_file
 from src.middleware.auth import token_required
 from src.models.documento import Documento, PlantillaDocumento, TipoDocumento, EstadoDocumento, db
 from src.models.project import Proyecto
+from src.models.serialization import eager_load, requested_fields
+from src.models.pagination import respond_page, CursorInvalidoError
 import os
 from werkzeug.utils import secure_filename
 import uuid
@@ -17,14 +19,17 @@ def get_documentos(current_user):
         proyecto_id = request.args.get('proyecto_id')
         tipo = request.args.get('tipo')
         
-        query = Documento.query
+        fields = requested_fields()
+        
+        query = eager_load(Documento.query, Documento, fields)
         if proyecto_id:
             query = query.filter_by(proyecto_id=proyecto_id)
         if tipo:
             query = query.filter_by(tipo=TipoDocumento(tipo))
             
-        documentos = query.all()
-        return jsonify({'documentos': [d.to_dict() for d in documentos]}), 200
+        return respond_page(query, Documento, lambda d: d.to_dict(fields), Documento.fecha_actualizacion, key='documentos'), 200
+    except CursorInvalidoError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
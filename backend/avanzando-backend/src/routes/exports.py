@@ -0,0 +1,91 @@
+import os
+from flask import Blueprint, jsonify, request, send_file, url_for
+from src.middleware.auth import token_required
+from src.models.subscription import Subscription
+from src.services.export_streams import EXPORT_FORMATS, XLSX_DEFAULT_SHEETS, streaming_exporter
+from src.services.export_queue import export_jobs
+
+exports_bp = Blueprint('exports', __name__)
+
+def _public(job):
+    """Estado del trabajo para el cliente: sin la ruta interna del archivo"""
+    data = {key: value for key, value in job.items() if key != 'archivo'}
+    total = job.get('total_filas')
+    data['progreso'] = round(job['filas_procesadas'] * 100 / total, 2) if total else (100.0 if job['estado'] == 'completada' else 0.0)
+    if job['estado'] == 'completada':
+        data['download_url'] = url_for('exports.download_export', job_id=job['id'])
+    return data
+
+def _owned_job(current_user, job_id):
+    job = export_jobs.get(job_id)
+    if not job or (job['user_id'] != current_user.id and current_user.rol.value != 'administrador'):
+        return None
+    return job
+
+@exports_bp.route('/exports', methods=['POST'])
+@token_required
+def create_export(current_user):
+    """Encola una exportación para el worker; responde 202 con la URL de estado"""
+    try:
+        data = request.get_json() or {}
+        format_type = data.get('format', 'csv')
+        entities = data.get('entities') or ([name for name in XLSX_DEFAULT_SHEETS if streaming_exporter.allowed(current_user, name)]
+                                            if format_type == 'xlsx' else ['proyectos'])
+        proyecto_id = data.get('proyecto_id')
+
+        if format_type not in EXPORT_FORMATS:
+            return jsonify({'error': f"Formato no soportado. Opciones: {', '.join(EXPORT_FORMATS)}"}), 400
+
+        if format_type == 'xlsx':
+            subscription = Subscription.query.filter_by(user_id=current_user.id).first()
+            if not subscription or not subscription.can_export('Excel'):
+                return jsonify({
+                    'error': 'La exportación a Excel requiere un plan Pro o Enterprise',
+                    'upgrade_required': True
+                }), 403
+
+        try:
+            # El worker vuelve a resolver el alcance del usuario al procesar el trabajo
+            streaming_exporter.scope(current_user, entities)
+            job = export_jobs.submit(current_user.id, format_type, entities, proyecto_id)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except PermissionError as e:
+            return jsonify({'error': str(e)}), 403
+
+        response = jsonify({'message': 'Exportación encolada', 'job': _public(job)})
+        response.headers['Location'] = url_for('exports.get_export', job_id=job['id'])
+        return response, 202
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@exports_bp.route('/exports/<job_id>', methods=['GET'])
+@token_required
+def get_export(current_user, job_id):
+    """Estado y progreso de una exportación"""
+    job = _owned_job(current_user, job_id)
+    if not job:
+        return jsonify({'error': 'Exportación no encontrada'}), 404
+    return jsonify({'job': _public(job)}), 200
+
+@exports_bp.route('/exports/<job_id>/download', methods=['GET'])
+@token_required
+def download_export(current_user, job_id):
+    """Descarga del archivo generado; admite Range para reanudar descargas interrumpidas"""
+    job = _owned_job(current_user, job_id)
+    if not job:
+        return jsonify({'error': 'Exportación no encontrada'}), 404
+    if job['estado'] != 'completada':
+        return jsonify({'error': 'La exportación aún no está lista', 'estado': job['estado']}), 409
+    if not job['archivo'] or not os.path.exists(job['archivo']):
+        return jsonify({'error': 'El archivo de la exportación ya no está disponible'}), 410
+
+    entity = job['entidades'][0] if len(job['entidades']) == 1 else 'portfolio'
+    return send_file(
+        job['archivo'],
+        mimetype=EXPORT_FORMATS[job['formato']],
+        as_attachment=True,
+        download_name=f"{entity}-report.{job['formato']}",
+        conditional=True
+    )
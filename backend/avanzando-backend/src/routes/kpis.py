@@ -2,21 +2,55 @@ from flask import Blueprint, request, jsonify
 from src.models.user import db
 from src.models.kpi import KPI, TipoKPI, EstadoKPI
 from src.models.project import Proyecto
+from src.models.serialization import eager_load, requested_fields
+from src.middleware.conditional import query_version, request_etag, not_modified, with_etag
+from src.models.streaming import NDJSON_MIMETYPE, wants_ndjson, iter_ndjson, iter_json_object, stream_response
+from src.models.pagination import respond_page, CursorInvalidoError
+from src.services.kpi_history import kpi_history
+from src.services.kpi_ingestion import kpi_ingestion
+from src.services.kpi_dashboard import kpi_dashboard
+from src.middleware.auth import token_required, pm_required
 from datetime import datetime
+import math
+import os
 
 kpis_bp = Blueprint('kpis', __name__)
 
+KPI_BATCH_MAX = int(os.environ.get('KPI_BATCH_MAX', 20000))
+# Proyectos por petición del dashboard por lotes, y a partir de cuántos se responde en streaming
+KPI_DASHBOARD_MAX_IDS = int(os.environ.get('KPI_DASHBOARD_MAX_IDS', 5000))
+KPI_DASHBOARD_STREAM_MIN = int(os.environ.get('KPI_DASHBOARD_STREAM_MIN', 200))
+
+def parse_value_row(data):
+    """Valida una medición {kpi_id, valor, timestamp} o [kpi_id, valor, timestamp] y retorna la tupla"""
+    if isinstance(data, dict):
+        kpi_id, valor, timestamp = data.get('kpi_id'), data.get('valor'), data.get('timestamp')
+    elif isinstance(data, list) and len(data) in (2, 3):
+        kpi_id, valor, timestamp = (data + [None])[:3]
+    else:
+        raise ValueError('Cada medición debe ser {kpi_id, valor, timestamp} o [kpi_id, valor, timestamp]')
+    if kpi_id is None or valor is None:
+        raise ValueError('kpi_id y valor son requeridos')
+    valor = float(valor)
+    if not math.isfinite(valor):
+        raise ValueError('valor debe ser un número finito')
+    momento = datetime.fromisoformat(timestamp.replace('Z', '+00:00')).replace(tzinfo=None) if timestamp else datetime.utcnow()
+    return int(kpi_id), valor, momento
+
 @kpis_bp.route('/api/kpis', methods=['GET'])
 def get_kpis():
     try:
         proyecto_id = request.args.get('proyecto_id')
         
-        query = KPI.query.filter_by(activo=True)
+        fields = requested_fields()
+        
+        query = eager_load(KPI.query, KPI, fields).filter_by(activo=True)
         if proyecto_id:
             query = query.filter_by(proyecto_id=proyecto_id)
         
-        kpis = query.all()
-        return jsonify([kpi.to_dict() for kpi in kpis])
+        return respond_page(query, KPI, lambda kpi: kpi.to_dict(fields), KPI.fecha_actualizacion)
+    except CursorInvalidoError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -45,6 +79,8 @@ def create_kpi():
         kpi.calcular_estado()
         
         db.session.add(kpi)
+        db.session.flush()
+        kpi_history.record(kpi.id, kpi.valor_actual)
         db.session.commit()
         
         return jsonify({
@@ -58,8 +94,57 @@ def create_kpi():
 @kpis_bp.route('/api/kpis/<int:kpi_id>', methods=['GET'])
 def get_kpi(kpi_id):
     try:
-        kpi = KPI.query.get_or_404(kpi_id)
-        return jsonify(kpi.to_dict())
+        fields = requested_fields()
+        kpi = eager_load(KPI.query, KPI, fields).filter_by(id=kpi_id).first_or_404()
+        return jsonify(kpi.to_dict(fields))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _measurement_range():
+    """Rango ?from=&to= (fechas u horas ISO); por defecto el último año"""
+    desde, hasta = kpi_history.default_range()
+    if request.args.get('from'):
+        desde = datetime.fromisoformat(request.args['from'])
+    if request.args.get('to'):
+        hasta = datetime.fromisoformat(request.args['to'])
+        if len(request.args['to']) == 10:  # Solo fecha: incluye el día completo
+            hasta = hasta.replace(hour=23, minute=59, second=59)
+    return desde, hasta
+
+@kpis_bp.route('/api/kpis/mediciones', methods=['GET'])
+def get_kpis_mediciones():
+    """Series de mediciones de varios KPIs (?kpi_ids=1,2,3) en columnas t (epoch) y v"""
+    try:
+        try:
+            kpi_ids = [int(kpi_id) for kpi_id in request.args.get('kpi_ids', '').split(',') if kpi_id]
+            desde, hasta = _measurement_range()
+        except ValueError:
+            return jsonify({'error': 'Parámetros inválidos: kpi_ids son enteros y las fechas usan formato ISO'}), 400
+        if not kpi_ids:
+            return jsonify({'error': 'El parámetro kpi_ids es requerido'}), 400
+        
+        series = kpi_history.series(kpi_ids, desde, hasta)
+        return jsonify({
+            'from': desde.isoformat(),
+            'to': hasta.isoformat(),
+            'series': [{'kpi_id': kpi_id, **values} for kpi_id, values in series.items()]
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@kpis_bp.route('/api/kpis/<int:kpi_id>/mediciones', methods=['GET'])
+def get_kpi_mediciones(kpi_id):
+    """Mediciones de un KPI en un rango de fechas"""
+    try:
+        KPI.query.get_or_404(kpi_id)
+        try:
+            desde, hasta = _measurement_range()
+        except ValueError:
+            return jsonify({'error': 'Fechas inválidas, use formato ISO'}), 400
+        
+        values = kpi_history.series([kpi_id], desde, hasta)[kpi_id]
+        return jsonify({'kpi_id': kpi_id, 'from': desde.isoformat(), 'to': hasta.isoformat(),
+                        'total': len(values['t']), **values})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -90,6 +175,10 @@ def update_kpi(kpi_id):
         kpi.calcular_estado()
         kpi.fecha_actualizacion = datetime.utcnow()
         
+        # Serie histórica: cada nuevo valor se agrega al bloque mensual del KPI
+        if 'valor_actual' in data:
+            kpi_history.record(kpi.id, kpi.valor_actual, kpi.fecha_actualizacion)
+        
         db.session.commit()
         
         return jsonify({
@@ -100,6 +189,52 @@ def update_kpi(kpi_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@kpis_bp.route('/api/kpis/values:batch', methods=['POST'])
+@token_required
+@pm_required
+def batch_update_kpi_values(current_user):
+    """Registra miles de mediciones en una transacción; el valor más reciente de cada KPI pasa a valor_actual"""
+    try:
+        data = request.get_json(silent=True)
+        rows = data.get('values') if isinstance(data, dict) else data
+        if not isinstance(rows, list) or not rows:
+            return jsonify({'error': 'Se requiere un arreglo de mediciones'}), 400
+        if len(rows) > KPI_BATCH_MAX:
+            return jsonify({'error': f'El lote admite como máximo {KPI_BATCH_MAX} mediciones'}), 413
+        
+        # Validar filas
+        samples = []
+        indexes = []
+        errors = []
+        for index, row in enumerate(rows):
+            try:
+                samples.append(parse_value_row(row))
+                indexes.append(index)
+            except (ValueError, TypeError, AttributeError) as e:
+                errors.append({'row': index, 'error': str(e)})
+        
+        # Umbrales de todos los KPIs en una sola lectura
+        thresholds = kpi_ingestion.thresholds({kpi_id for kpi_id, _, _ in samples})
+        for index, (kpi_id, _, _) in zip(indexes, samples):
+            if kpi_id not in thresholds:
+                errors.append({'row': index, 'error': f'KPI {kpi_id} no existe'})
+        
+        if errors:
+            return jsonify({'error': 'Lote inválido', 'errors': errors}), 400
+        
+        estados = kpi_ingestion.ingest(samples, thresholds)
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Mediciones registradas exitosamente',
+            'mediciones': len(samples),
+            'updated': sum(estados.values()),
+            'estados': estados
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @kpis_bp.route('/api/kpis/<int:kpi_id>', methods=['DELETE'])
 def delete_kpi(kpi_id):
     try:
@@ -114,37 +249,59 @@ def delete_kpi(kpi_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@kpis_bp.route('/api/kpis/dashboard', methods=['GET'])
+def get_kpis_dashboards():
+    """Resumen de KPIs de varios proyectos (?proyecto_ids=1,2,3) con una consulta agrupada, por proyecto"""
+    try:
+        try:
+            proyecto_ids = sorted({int(proyecto_id) for proyecto_id in request.args.get('proyecto_ids', '').split(',') if proyecto_id})
+        except ValueError:
+            return jsonify({'error': 'proyecto_ids debe contener enteros'}), 400
+        if not proyecto_ids:
+            return jsonify({'error': 'El parámetro proyecto_ids es requerido'}), 400
+        if len(proyecto_ids) > KPI_DASHBOARD_MAX_IDS:
+            return jsonify({'error': f'Se admiten como máximo {KPI_DASHBOARD_MAX_IDS} proyectos'}), 400
+        
+        # GET condicional
+        query = KPI.query.filter(KPI.proyecto_id.in_(proyecto_ids), KPI.activo == True)
+        ndjson = wants_ndjson()
+        etag = request_etag(None, ndjson, *query_version(query, KPI))
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
+        dashboards = kpi_dashboard.dashboards(proyecto_ids)
+        if ndjson:
+            # Un proyecto por línea a medida que se leen los grupos
+            response = stream_response(iter_ndjson(
+                {'proyecto_id': proyecto_id, **summary} for proyecto_id, summary in dashboards
+            ), NDJSON_MIMETYPE)
+        elif len(proyecto_ids) >= KPI_DASHBOARD_STREAM_MIN:
+            # Listas grandes: el mismo objeto JSON, codificado por lotes
+            response = stream_response(iter_json_object(dashboards, prefix='{"dashboards":{', suffix='}}'))
+        else:
+            response = jsonify({'dashboards': dict(dashboards)})
+        return with_etag(response, etag)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @kpis_bp.route('/api/kpis/dashboard/<int:proyecto_id>', methods=['GET'])
 def get_kpis_dashboard(proyecto_id):
     try:
-        kpis = KPI.query.filter_by(proyecto_id=proyecto_id, activo=True).all()
-        
-        # Estadísticas generales
-        total_kpis = len(kpis)
-        kpis_verdes = len([k for k in kpis if k.estado == EstadoKPI.VERDE])
-        kpis_amarillos = len([k for k in kpis if k.estado == EstadoKPI.AMARILLO])
-        kpis_rojos = len([k for k in kpis if k.estado == EstadoKPI.ROJO])
-        
-        # KPIs por tipo
-        kpis_por_tipo = {}
-        for tipo in TipoKPI:
-            kpis_tipo = [k for k in kpis if k.tipo == tipo]
-            kpis_por_tipo[tipo.value] = {
-                'total': len(kpis_tipo),
-                'promedio_cumplimiento': sum([k.porcentaje_cumplimiento() for k in kpis_tipo]) / len(kpis_tipo) if kpis_tipo else 0
-            }
+        query = KPI.query.filter_by(proyecto_id=proyecto_id, activo=True)
         
-        return jsonify({
-            'resumen': {
-                'total_kpis': total_kpis,
-                'kpis_verdes': kpis_verdes,
-                'kpis_amarillos': kpis_amarillos,
-                'kpis_rojos': kpis_rojos,
-                'porcentaje_verde': (kpis_verdes / total_kpis * 100) if total_kpis > 0 else 0
-            },
-            'kpis_por_tipo': kpis_por_tipo,
-            'kpis': [kpi.to_dict() for kpi in kpis]
-        })
+        # GET condicional
+        etag = request_etag(None, *query_version(query, KPI))
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
+        # Resumen con una consulta agrupada; la lista de KPIs solo con ?include=kpis
+        dashboard = kpi_dashboard.summary(proyecto_id)
+        if 'kpis' in request.args.get('include', '').split(','):
+            dashboard['kpis'] = [kpi.to_dict() for kpi in query.all()]
+        
+        return with_etag(jsonify(dashboard), etag)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
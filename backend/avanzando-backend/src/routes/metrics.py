@@ -0,0 +1,25 @@
+from flask import Blueprint, jsonify
+from src.middleware.auth import token_required, admin_required
+from src.services.principal_cache import principal_cache
+from src.services.token_verifier import token_verifier
+from src.services.password_hasher import password_hasher
+from src.services.portfolio_summary import portfolio_summary
+from src.services.response_cache import portfolio_cache
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+@token_required
+@admin_required
+def get_metrics(current_user):
+    """Obtiene contadores internos de rendimiento del worker"""
+    try:
+        return jsonify({
+            'principal_cache': principal_cache.stats(),
+            'token_verifier': token_verifier.stats(),
+            'password_hasher': password_hasher.stats(),
+            'portfolio_summary': portfolio_summary.stats(),
+            'portfolio_cache': portfolio_cache.stats()
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,17 +1,29 @@
-from flask import Blueprint, jsonify, request, make_response
+from flask import Blueprint, current_app, jsonify, request
 from src.middleware.auth import token_required
-from src.models.project import Proyecto
-from src.models.user import User
+from src.models.project import Proyecto, EstadoProyecto
+from src.models.user import db, User, UserRole
 from src.models.kpi import KPI
 from src.models.riesgo import Riesgo
 from src.models.recurso import Recurso
-from datetime import datetime, timedelta
-import json
-import csv
-import io
+from src.models.serialization import eager_load, requested_fields
+from src.middleware.conditional import query_version, request_etag, not_modified, with_etag
+from src.models.pagination import keyset_paginate, CursorInvalidoError
+from src.models.streaming import NDJSON_MIMETYPE, wants_ndjson, stream_response
+from src.services.portfolio_aggregates import portfolio_aggregates
+from src.services.portfolio_summary import portfolio_summary
+from src.services.search_index import search_index
+from src.services.portfolio_snapshots import portfolio_snapshots, derived_metrics
+from src.services.response_cache import portfolio_cache
+from src.services.export_streams import streaming_exporter, XLSX_DEFAULT_SHEETS, XLSX_MIMETYPE
+from src.models.subscription import Subscription
+from sqlalchemy import case, func, or_
+from datetime import date, datetime, timedelta
 
 portfolio_bp = Blueprint('portfolio', __name__)
 
+# Parámetros que determinan la respuesta de /portfolio (forman parte de la clave de caché)
+PORTFOLIO_CACHE_PARAMS = ('status', 'client', 'search', 'budget', 'limit', 'cursor', 'fields')
+
 @portfolio_bp.route('/portfolio', methods=['GET'])
 @token_required
 def get_portfolio_data(current_user):
@@ -20,21 +32,34 @@ def get_portfolio_data(current_user):
         # Obtener parámetros de filtro
         status_filter = request.args.get('status', 'all')
         client_filter = request.args.get('client', 'all')
-        search_term = request.args.get('search', '')
+        search_term = ' '.join(request.args.get('search', '').split())
         budget_filter = request.args.get('budget', 'all')
         
+        # Caché de respuestas: versión de datos + alcance del usuario + filtros normalizados
+        scope = (current_user.rol.value, current_user.cliente_id)
+        cache_key, hit = portfolio_cache.lookup(scope, {name: request.args.get(name, '') for name in PORTFOLIO_CACHE_PARAMS})
+        if hit:
+            body, etag = hit
+            return not_modified(etag) or with_etag(current_app.response_class(body, mimetype='application/json'), etag)
+        
         # Query base de proyectos
         query = Proyecto.query
         
         # Aplicar filtros
         if status_filter != 'all':
-            query = query.filter(Proyecto.estado == status_filter)
+            try:
+                query = query.filter(Proyecto.estado == EstadoProyecto(status_filter))
+            except ValueError:
+                return jsonify({'error': 'Estado inválido'}), 400
         
         if client_filter != 'all':
-            query = query.filter(Proyecto.cliente_id == int(client_filter))
+            try:
+                query = query.filter(Proyecto.cliente_id == int(client_filter))
+            except ValueError:
+                return jsonify({'error': 'Cliente inválido'}), 400
         
         if search_term:
-            query = query.filter(Proyecto.nombre.ilike(f'%{search_term}%'))
+            query = query.filter(search_index.project_filter(search_term))
         
         if budget_filter != 'all':
             if budget_filter == 'low':
@@ -44,69 +69,49 @@ def get_portfolio_data(current_user):
             elif budget_filter == 'high':
                 query = query.filter(Proyecto.presupuesto_estimado > 200000)
         
-        # Obtener proyectos filtrados
-        proyectos = query.all()
-        
-        # Calcular métricas
-        total_projects = len(proyectos)
-        active_projects = len([p for p in proyectos if p.estado == 'activo'])
-        completed_projects = len([p for p in proyectos if p.estado == 'completado'])
-        total_budget = sum([p.presupuesto_estimado or 0 for p in proyectos])
-        total_spent = sum([p.presupuesto_gastado or 0 for p in proyectos])
-        
-        # KPIs resumidos
-        kpi_summary = []
-        for proyecto in proyectos[:5]:  # Top 5 proyectos
-            kpis = KPI.query.filter_by(proyecto_id=proyecto.id).all()
-            if kpis:
-                avg_performance = sum([kpi.valor_actual for kpi in kpis]) / len(kpis)
-                kpi_summary.append({
-                    'project_name': proyecto.nombre,
-                    'performance': round(avg_performance, 2),
-                    'kpi_count': len(kpis)
-                })
-        
-        # Resumen de riesgos
-        risk_summary = []
-        for proyecto in proyectos:
-            riesgos = Riesgo.query.filter_by(proyecto_id=proyecto.id).all()
-            high_risks = len([r for r in riesgos if r.nivel_impacto == 'alto'])
-            if high_risks > 0:
-                risk_summary.append({
-                    'project_name': proyecto.nombre,
-                    'high_risks': high_risks,
-                    'total_risks': len(riesgos)
-                })
-        
-        # Utilización de recursos
-        resource_utilization = []
-        recursos = Recurso.query.all()
-        for recurso in recursos[:10]:  # Top 10 recursos
-            proyectos_asignados = len([p for p in proyectos if recurso.id in [r.id for r in p.recursos]])
-            resource_utilization.append({
-                'name': recurso.nombre,
-                'projects_assigned': proyectos_asignados,
-                'utilization': min(100, (proyectos_asignados / 5) * 100)  # Máximo 5 proyectos por recurso
-            })
+        # GET condicional: versión de los proyectos filtrados y de sus KPIs, riesgos y recursos
+        etag = request_etag(
+            current_user,
+            *query_version(query, Proyecto),
+            *query_version(KPI.query, KPI),
+            *query_version(Riesgo.query, Riesgo),
+            *query_version(Recurso.query, Recurso)
+        )
+        cached = not_modified(etag)
+        if cached:
+            return cached
         
-        return jsonify({
-            'totalProjects': total_projects,
-            'activeProjects': active_projects,
-            'completedProjects': completed_projects,
-            'totalBudget': total_budget,
-            'totalSpent': total_spent,
-            'projects': [p.to_dict() for p in proyectos],
-            'kpiSummary': kpi_summary,
-            'riskSummary': risk_summary,
-            'resourceUtilization': resource_utilization,
+        # Página de proyectos filtrados (paginada por cursor)
+        fields = requested_fields()
+        pagina, next_cursor = keyset_paginate(eager_load(query, Proyecto, fields), Proyecto, Proyecto.fecha_actualizacion)
+        
+        # Totales: lectura de una fila de portfolio_summary si solo se filtra por cliente,
+        # agregación GROUP BY sobre los proyectos filtrados en otro caso
+        if status_filter == 'all' and not search_term and budget_filter == 'all':
+            summary = portfolio_summary.get(None if client_filter == 'all' else int(client_filter))
+            totals = {key: summary[key] for key in ('totalProjects', 'activeProjects', 'completedProjects', 'totalBudget', 'totalSpent')}
+        else:
+            totals = portfolio_aggregates.totals(query)
+        
+        response = jsonify({
+            **totals,
+            'projects': [p.to_dict(fields) for p in pagina],
+            'next_cursor': next_cursor,
+            'kpiSummary': portfolio_aggregates.kpi_summary(query),
+            'riskSummary': portfolio_aggregates.risk_summary(query),
+            'resourceUtilization': portfolio_aggregates.resource_utilization(query),
             'filters_applied': {
                 'status': status_filter,
                 'client': client_filter,
                 'search': search_term,
                 'budget': budget_filter
             }
-        }), 200
+        })
+        portfolio_cache.store(cache_key, response.get_data(as_text=True), etag)
+        return with_etag(response, etag), 200
         
+    except CursorInvalidoError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -116,47 +121,58 @@ def export_portfolio_data(current_user):
     """Exporta datos del portafolio en diferentes formatos"""
     try:
         format_type = request.args.get('format', 'csv')
+        entity = request.args.get('entity', 'proyectos')
+        proyecto_id = request.args.get('proyecto_id', type=int)
         
-        # Obtener todos los proyectos
-        proyectos = Proyecto.query.all()
+        if format_type == 'xlsx':
+            # Excel: una hoja por entidad (entity admite una lista separada por comas)
+            subscription = Subscription.query.filter_by(user_id=current_user.id).first()
+            if not subscription or not subscription.can_export('Excel'):
+                return jsonify({
+                    'error': 'La exportación a Excel requiere un plan Pro o Enterprise',
+                    'upgrade_required': True
+                }), 403
+            if 'entity' in request.args:
+                names = request.args['entity'].split(',')
+            else:
+                # Hojas por defecto que el rol puede exportar
+                names = [name for name in XLSX_DEFAULT_SHEETS if streaming_exporter.allowed(current_user, name)]
+            try:
+                cliente_id = streaming_exporter.scope(current_user, names)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            except PermissionError as e:
+                return jsonify({'error': str(e)}), 403
+            response = stream_response(streaming_exporter.iter_xlsx(names, proyecto_id, cliente_id=cliente_id), XLSX_MIMETYPE)
+            response.headers['Content-Disposition'] = 'attachment; filename=portfolio-report.xlsx'
+            return response
+        
+        try:
+            # Clientes: solo filas de sus proyectos; recursos y horas requieren rol de PM o superior
+            cliente_id = streaming_exporter.scope(current_user, [entity])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except PermissionError as e:
+            return jsonify({'error': str(e)}), 403
         
         if format_type == 'csv':
-            output = io.StringIO()
-            writer = csv.writer(output)
-            
-            # Headers
-            writer.writerow(['ID', 'Nombre', 'Estado', 'Cliente', 'Presupuesto', 'Gastado', 'Progreso', 'Fecha Inicio', 'Fecha Fin'])
-            
-            # Data
-            for proyecto in proyectos:
-                writer.writerow([
-                    proyecto.id,
-                    proyecto.nombre,
-                    proyecto.estado,
-                    proyecto.cliente.nombre if proyecto.cliente else 'N/A',
-                    proyecto.presupuesto_estimado or 0,
-                    proyecto.presupuesto_gastado or 0,
-                    f"{proyecto.progreso_general}%",
-                    proyecto.fecha_inicio.strftime('%Y-%m-%d') if proyecto.fecha_inicio else 'N/A',
-                    proyecto.fecha_fin.strftime('%Y-%m-%d') if proyecto.fecha_fin else 'N/A'
-                ])
+            # Streaming: el primer byte sale con el primer lote y la memoria no crece con el portafolio
+            filename = 'portfolio-report.csv' if entity == 'proyectos' else f'{entity}-report.csv'
+            response = stream_response(streaming_exporter.iter_csv(entity, proyecto_id, cliente_id=cliente_id), 'text/csv')
+            response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+            return response
             
-            output.seek(0)
-            response = make_response(output.getvalue())
-            response.headers['Content-Type'] = 'text/csv'
-            response.headers['Content-Disposition'] = 'attachment; filename=portfolio-report.csv'
+        elif format_type == 'ndjson' or (format_type == 'json' and wants_ndjson()):
+            # Un objeto JSON por línea, negociado con Accept: application/x-ndjson
+            response = stream_response(streaming_exporter.iter_ndjson(entity, proyecto_id, cliente_id=cliente_id), NDJSON_MIMETYPE)
+            response.headers['Content-Disposition'] = f'attachment; filename={entity}-report.ndjson'
             return response
             
         elif format_type == 'json':
-            data = {
-                'export_date': datetime.now().isoformat(),
-                'total_projects': len(proyectos),
-                'projects': [p.to_dict() for p in proyectos]
-            }
-            
-            response = make_response(json.dumps(data, indent=2))
-            response.headers['Content-Type'] = 'application/json'
-            response.headers['Content-Disposition'] = 'attachment; filename=portfolio-report.json'
+            # Arreglo JSON codificado por lotes desde el cursor
+            filename = 'portfolio-report.json' if entity == 'proyectos' else f'{entity}-report.json'
+            response = stream_response(streaming_exporter.iter_json(entity, proyecto_id, cliente_id=cliente_id))
+            response.headers['Content-Disposition'] = f'attachment; filename={filename}'
             return response
             
         else:
@@ -186,35 +202,74 @@ def get_portfolio_metrics(current_user):
         now = datetime.now()
         last_month = now - timedelta(days=30)
         
-        proyectos_nuevos = Proyecto.query.filter(Proyecto.fecha_creacion >= last_month).count()
-        proyectos_completados_mes = Proyecto.query.filter(
-            Proyecto.estado == 'completado',
-            Proyecto.fecha_actualizacion >= last_month
-        ).count()
-        
-        # Métricas de presupuesto
-        total_presupuesto = Proyecto.query.with_entities(
-            Proyecto.presupuesto_estimado
-        ).filter(Proyecto.presupuesto_estimado.isnot(None)).all()
+        # Métricas de tiempo: solo proyectos creados o actualizados en la ventana
+        proyectos_nuevos, proyectos_completados_mes = db.session.query(
+            func.coalesce(func.sum(case((Proyecto.fecha_creacion >= last_month, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((
+                (Proyecto.estado == EstadoProyecto.COMPLETADO) & (Proyecto.fecha_actualizacion >= last_month), 1
+            ), else_=0)), 0)
+        ).filter(or_(Proyecto.fecha_creacion >= last_month, Proyecto.fecha_actualizacion >= last_month)).one()
         
-        total_gastado = Proyecto.query.with_entities(
-            Proyecto.presupuesto_gastado
-        ).filter(Proyecto.presupuesto_gastado.isnot(None)).all()
+        # Métricas de presupuesto desde la fila global de portfolio_summary
+        summary = portfolio_summary.get()
+        budget_efficiency = (summary['totalSpent'] / summary['totalBudget']) * 100 if summary['totalBudget'] > 0 else 0
         
-        budget_efficiency = 0
-        if total_presupuesto and total_gastado:
-            total_budget_sum = sum([p[0] for p in total_presupuesto])
-            total_spent_sum = sum([p[0] for p in total_gastado])
-            budget_efficiency = (total_spent_sum / total_budget_sum) * 100 if total_budget_sum > 0 else 0
+        # Duración y utilización desde la última fotografía diaria del portafolio
+        snapshot = portfolio_snapshots.latest()
         
         return jsonify({
             'new_projects_this_month': proyectos_nuevos,
             'completed_projects_this_month': proyectos_completados_mes,
             'budget_efficiency': round(budget_efficiency, 2),
-            'average_project_duration': 45,  # Placeholder - calcular real
-            'resource_utilization_avg': 75   # Placeholder - calcular real
+            'average_project_duration': round(snapshot['duracion_dias'], 1),
+            'resource_utilization_avg': derived_metrics(snapshot)['utilizacion_recursos'],
+            'snapshot_date': snapshot['fecha'].isoformat()
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+
+@portfolio_bp.route('/portfolio/trends', methods=['GET'])
+@token_required
+def get_portfolio_trends(current_user):
+    """Series de tendencia desde las fotografías diarias, reducidas a día, semana o mes"""
+    try:
+        desde, hasta = portfolio_snapshots.default_range()
+        try:
+            if request.args.get('from'):
+                desde = date.fromisoformat(request.args['from'])
+            if request.args.get('to'):
+                hasta = date.fromisoformat(request.args['to'])
+        except ValueError:
+            return jsonify({'error': 'Fechas inválidas, use el formato YYYY-MM-DD'}), 400
+        
+        interval = request.args.get('interval', 'day')
+        proyecto_id = request.args.get('proyecto_id', type=int)
+        cliente_id = request.args.get('client', type=int)
+        if current_user.rol == UserRole.CLIENTE:
+            # Los clientes solo ven la serie de sus propios proyectos
+            cliente_id = current_user.cliente_id
+            if cliente_id is None:
+                # Sin cliente asociado, None caería en la serie global de todo el portafolio
+                return jsonify({'error': 'El usuario no tiene un cliente asociado'}), 403
+            if proyecto_id is not None and db.session.query(Proyecto.cliente_id).filter_by(id=proyecto_id).scalar() != cliente_id:
+                return jsonify({'error': 'Proyecto no encontrado'}), 404
+        elif current_user.rol not in (UserRole.ADMINISTRADOR, UserRole.PM):
+            # Recursos: sin alcance de portafolio, igual que en el listado de proyectos y las exportaciones
+            return jsonify({'error': 'Acceso denegado. Se requiere rol de PM o superior'}), 403
+        
+        try:
+            series = portfolio_snapshots.trend(desde, hasta, interval, proyecto_id, cliente_id)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'from': desde.isoformat(),
+            'to': hasta.isoformat(),
+            'interval': interval,
+            'series': series
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,46 +1,89 @@
-from flask import Blueprint, request, jsonify
-from src.models.user import db, User, UserRole
+from flask import Blueprint, request, jsonify, current_app
+from src.models.user import db, User, UserRole, Cliente
 from src.models.project import Proyecto, Fase, TipoFase, EstadoProyecto
+from src.models.kpi import KPI
+from src.models.riesgo import Riesgo
+from src.models.recurso import Recurso
+from src.models.ai_prediction import AIPrediction
+from src.models.subscription import Subscription
+from src.models.serialization import eager_load, requested_fields
+from src.models.pagination import respond_page, CursorInvalidoError
+from src.services.progress_rollup import progress_rollup
+from src.services.project_purge import project_purge
+from src.services.portfolio_summary import portfolio_summary
+from src.services.search_index import search_index
 from src.middleware.auth import token_required, pm_required
+from src.middleware.conditional import query_version, request_etag, not_modified, with_etag
+from sqlalchemy import false, insert
+from sqlalchemy.orm import selectinload
 from datetime import datetime
+import os
 
 projects_bp = Blueprint('projects', __name__)
 
+BULK_INSERT_CHUNK = int(os.environ.get('BULK_INSERT_CHUNK', 500))
+
+# Fases por defecto de todo proyecto (tipo, nombre)
+FASES_DEFAULT = (
+    (TipoFase.INICIO, 'Inicio'),
+    (TipoFase.PLANEACION, 'Planeación'),
+    (TipoFase.EJECUCION, 'Ejecución'),
+    (TipoFase.SEGUIMIENTO_CONTROL, 'Seguimiento y Control'),
+    (TipoFase.CIERRE, 'Cierre')
+)
+
+# Colecciones que se pueden expandir en GET /projects/<id>?include=
+PROJECT_INCLUDES = ('fases', 'kpis', 'riesgos', 'recursos', 'predicciones')
+
 def create_default_phases(proyecto_id):
     """Crear las fases por defecto para un proyecto"""
-    fases_default = [
-        {'tipo': TipoFase.INICIO, 'nombre': 'Inicio'},
-        {'tipo': TipoFase.PLANEACION, 'nombre': 'Planeación'},
-        {'tipo': TipoFase.EJECUCION, 'nombre': 'Ejecución'},
-        {'tipo': TipoFase.SEGUIMIENTO_CONTROL, 'nombre': 'Seguimiento y Control'},
-        {'tipo': TipoFase.CIERRE, 'nombre': 'Cierre'}
-    ]
-    
-    for fase_data in fases_default:
+    for tipo, nombre in FASES_DEFAULT:
         fase = Fase(
             proyecto_id=proyecto_id,
-            tipo=fase_data['tipo'],
-            nombre=fase_data['nombre']
+            tipo=tipo,
+            nombre=nombre
         )
         db.session.add(fase)
 
+def parse_project_row(data):
+    """Valida una fila de proyecto y retorna los valores a insertar"""
+    if not isinstance(data, dict) or not data.get('nombre') or not data.get('cliente_id'):
+        raise ValueError('Nombre y cliente_id son requeridos')
+    return {
+        'nombre': data['nombre'],
+        'descripcion': data.get('descripcion'),
+        'cliente_id': int(data['cliente_id']),
+        'fecha_inicio': datetime.strptime(data['fecha_inicio'], '%Y-%m-%d').date() if data.get('fecha_inicio') else datetime.utcnow().date(),
+        'fecha_fin': datetime.strptime(data['fecha_fin'], '%Y-%m-%d').date() if data.get('fecha_fin') else None,
+        'presupuesto_estimado': data.get('presupuesto_estimado')
+    }
+
 @projects_bp.route('/projects', methods=['GET'])
 @token_required
 def get_projects(current_user):
     try:
         # Filtrar proyectos según el rol del usuario
-        if current_user.rol == UserRole.ADMINISTRADOR or current_user.rol == UserRole.PM:
-            proyectos = Proyecto.query.all()
-        elif current_user.rol == UserRole.CLIENTE:
-            proyectos = Proyecto.query.filter_by(cliente_id=current_user.cliente_id).all()
-        else:
+        query = Proyecto.query
+        if current_user.rol == UserRole.CLIENTE:
+            query = query.filter_by(cliente_id=current_user.cliente_id)
+        elif current_user.rol != UserRole.ADMINISTRADOR and current_user.rol != UserRole.PM:
             # Para recursos, mostrar proyectos donde están asignados (implementar lógica más adelante)
-            proyectos = []
+            query = query.filter(false())
         
-        return jsonify({
-            'projects': [proyecto.to_dict() for proyecto in proyectos]
-        }), 200
+        # GET condicional: la versión se calcula sin serializar los proyectos
+        etag = request_etag(current_user, *query_version(query, Proyecto))
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
+        fields = requested_fields()
+        response = respond_page(eager_load(query, Proyecto, fields), Proyecto, lambda proyecto: proyecto.to_dict(fields),
+                                Proyecto.fecha_actualizacion, key='projects')
         
+        return with_etag(response, etag), 200
+        
+    except CursorInvalidoError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -81,23 +124,147 @@ def create_project(current_user):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@projects_bp.route('/projects/bulk', methods=['POST'])
+@token_required
+@pm_required
+def bulk_create_projects(current_user):
+    """Crea proyectos y sus fases por defecto en una sola transacción"""
+    try:
+        data = request.get_json(silent=True)
+        rows = data.get('projects') if isinstance(data, dict) else data
+        if not isinstance(rows, list) or not rows:
+            return jsonify({'error': 'Se requiere un arreglo de proyectos'}), 400
+        
+        # Validar filas
+        proyectos = []
+        indexes = []
+        errors = []
+        for index, row in enumerate(rows):
+            try:
+                proyectos.append(parse_project_row(row))
+                indexes.append(index)
+            except (ValueError, TypeError) as e:
+                errors.append({'row': index, 'error': str(e)})
+        
+        # Validar clientes en una sola consulta
+        cliente_ids = {p['cliente_id'] for p in proyectos}
+        existentes = {cid for (cid,) in db.session.query(Cliente.id).filter(Cliente.id.in_(cliente_ids))}
+        for index, proyecto in zip(indexes, proyectos):
+            if proyecto['cliente_id'] not in existentes:
+                errors.append({'row': index, 'error': f"Cliente {proyecto['cliente_id']} no existe"})
+        
+        if errors:
+            return jsonify({'error': 'Lote inválido', 'errors': errors}), 400
+        
+        # Inserción por lotes: proyectos con RETURNING y luego todas sus fases
+        created_ids = []
+        for start in range(0, len(proyectos), BULK_INSERT_CHUNK):
+            chunk = proyectos[start:start + BULK_INSERT_CHUNK]
+            result = db.session.execute(
+                insert(Proyecto).returning(Proyecto.id, sort_by_parameter_order=True),
+                chunk
+            )
+            ids = [row.id for row in result]
+            db.session.execute(insert(Fase), [
+                {'proyecto_id': proyecto_id, 'tipo': tipo, 'nombre': nombre}
+                for proyecto_id in ids
+                for tipo, nombre in FASES_DEFAULT
+            ])
+            created_ids.extend(ids)
+        
+        # Los INSERT masivos no pasan por los eventos de flush
+        portfolio_summary.refresh({proyecto['cliente_id'] for proyecto in proyectos})
+        search_index.reindex('proyectos', created_ids)
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Proyectos creados exitosamente',
+            'created': len(created_ids),
+            'ids': created_ids
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @projects_bp.route('/projects/<int:project_id>', methods=['GET'])
 @token_required
 def get_project(current_user, project_id):
     try:
-        proyecto = Proyecto.query.get(project_id)
-        if not proyecto:
+        version = db.session.query(Proyecto.cliente_id, Proyecto.fecha_actualizacion).filter_by(id=project_id).first()
+        if not version:
             return jsonify({'error': 'Proyecto no encontrado'}), 404
         
         # Verificar permisos
-        if current_user.rol == UserRole.CLIENTE and proyecto.cliente_id != current_user.cliente_id:
+        if current_user.rol == UserRole.CLIENTE and version.cliente_id != current_user.cliente_id:
             return jsonify({'error': 'No tiene permisos para ver este proyecto'}), 403
         
+        # Colecciones relacionadas a expandir (?include=kpis,riesgos,...)
+        include = {name.strip() for name in request.args.get('include', '').split(',') if name.strip()}
+        invalid = include - set(PROJECT_INCLUDES)
+        if invalid:
+            return jsonify({'error': f"include inválido: {', '.join(sorted(invalid))}"}), 400
+        
+        warnings = []
+        if 'predicciones' in include:
+            subscription = Subscription.query.filter_by(user_id=current_user.id).first()
+            if not subscription or not subscription.can_use_ai_features():
+                include.discard('predicciones')
+                warnings.append('Las predicciones requieren un plan Pro o Enterprise')
+        
+        # GET condicional: versión del proyecto, sus fases y las colecciones incluidas
+        kpis_query = KPI.query.filter_by(proyecto_id=project_id, activo=True)
+        riesgos_query = Riesgo.query.filter_by(proyecto_id=project_id, activo=True)
+        recursos_query = Recurso.query.filter_by(proyecto_id=project_id, activo=True)
+        predicciones_query = AIPrediction.query.filter_by(project_id=project_id)
+        version_parts = [version.fecha_actualizacion, *query_version(Fase.query.filter_by(proyecto_id=project_id), Fase)]
+        if 'kpis' in include:
+            version_parts.extend(query_version(kpis_query, KPI))
+        if 'riesgos' in include:
+            version_parts.extend(query_version(riesgos_query, Riesgo))
+        if 'recursos' in include:
+            version_parts.extend(query_version(recursos_query, Recurso))
+        if 'predicciones' in include:
+            version_parts.extend(query_version(predicciones_query, AIPrediction, AIPrediction.created_at))
+        etag = request_etag(current_user, *version_parts)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
+        # Una consulta selectinload por colección incluida
+        fields = requested_fields()
+        query = eager_load(Proyecto.query, Proyecto, fields)
+        include_fases = fields is None or 'fases' in fields or 'fases' in include
+        if include_fases:
+            query = query.options(selectinload(Proyecto.fases))
+        if 'kpis' in include:
+            query = query.options(selectinload(Proyecto.kpis.and_(KPI.activo == True)))
+        if 'riesgos' in include:
+            query = query.options(selectinload(Proyecto.riesgos.and_(Riesgo.activo == True)).joinedload(Riesgo.responsable))
+        if 'recursos' in include:
+            query = query.options(selectinload(Proyecto.recursos.and_(Recurso.activo == True)).joinedload(Recurso.usuario_asignado))
+        if 'predicciones' in include:
+            query = query.options(selectinload(Proyecto.ai_predictions))
+        proyecto = query.filter_by(id=project_id).first()
+        
         # Incluir fases del proyecto
-        proyecto_dict = proyecto.to_dict()
-        proyecto_dict['fases'] = [fase.to_dict() for fase in proyecto.fases]
+        proyecto_dict = proyecto.to_dict(fields)
+        if include_fases:
+            proyecto_dict['fases'] = [fase.to_dict() for fase in proyecto.fases]
+        if 'kpis' in include:
+            proyecto_dict['kpis'] = [kpi.to_dict() for kpi in proyecto.kpis]
+        if 'riesgos' in include:
+            proyecto_dict['riesgos'] = [riesgo.to_dict() for riesgo in proyecto.riesgos]
+        if 'recursos' in include:
+            proyecto_dict['recursos'] = [recurso.to_dict() for recurso in proyecto.recursos]
+        if 'predicciones' in include:
+            predicciones = sorted(proyecto.ai_predictions, key=lambda p: p.created_at, reverse=True)
+            proyecto_dict['predicciones'] = [p.to_dict() for p in predicciones]
         
-        return jsonify({'project': proyecto_dict}), 200
+        payload = {'project': proyecto_dict}
+        if warnings:
+            payload['warnings'] = warnings
+        return with_etag(jsonify(payload), etag), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -153,7 +320,9 @@ def advance_phase(current_user, project_id, phase_id):
         if avance < 0 or avance > 100:
             return jsonify({'error': 'El avance debe estar entre 0 y 100'}), 400
         
+        avance_anterior = fase.avance
         fase.avance = avance
+        progress_rollup.apply_delta(fase, avance_anterior)
         if avance == 100:
             fase.completada = True
             fase.fecha_fin = datetime.utcnow().date()
@@ -177,16 +346,72 @@ def advance_phase(current_user, project_id, phase_id):
 @pm_required
 def delete_project(current_user, project_id):
     try:
-        proyecto = Proyecto.query.get(project_id)
-        if not proyecto:
+        # Solo se consulta la existencia; el proyecto y sus dependientes se borran con DELETE por conjuntos
+        if not db.session.query(Proyecto.id).filter_by(id=project_id).first():
             return jsonify({'error': 'Proyecto no encontrado'}), 404
         
-        db.session.delete(proyecto)
-        db.session.commit()
+        if request.args.get('mode') == 'async':
+            job_id = project_purge.submit(current_app._get_current_object(), [project_id], current_user.id)
+            return jsonify({
+                'message': 'Eliminación del proyecto en curso',
+                'job': project_purge.get_job(job_id)
+            }), 202
+        
+        deleted = project_purge.purge([project_id])
+        
+        return jsonify({'message': 'Proyecto eliminado exitosamente', 'deleted': deleted}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@projects_bp.route('/projects/bulk', methods=['DELETE'])
+@token_required
+@pm_required
+def bulk_delete_projects(current_user):
+    """Elimina varios proyectos con DELETE ... WHERE proyecto_id IN (...)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        ids = data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return jsonify({'error': 'Se requiere una lista ids'}), 400
+        try:
+            ids = {int(project_id) for project_id in ids}
+        except (TypeError, ValueError):
+            return jsonify({'error': 'ids debe contener enteros'}), 400
+        
+        existing = {project_id for (project_id,) in db.session.query(Proyecto.id).filter(Proyecto.id.in_(ids))}
+        not_found = sorted(ids - existing)
+        if not existing:
+            return jsonify({'error': 'Proyectos no encontrados', 'not_found': not_found}), 404
+        
+        if request.args.get('mode') == 'async':
+            job_id = project_purge.submit(current_app._get_current_object(), sorted(existing), current_user.id)
+            return jsonify({
+                'message': 'Eliminación de proyectos en curso',
+                'job': project_purge.get_job(job_id),
+                'not_found': not_found
+            }), 202
         
-        return jsonify({'message': 'Proyecto eliminado exitosamente'}), 200
+        deleted = project_purge.purge(sorted(existing))
+        
+        return jsonify({
+            'message': 'Proyectos eliminados exitosamente',
+            'deleted': deleted,
+            'not_found': not_found
+        }), 200
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@projects_bp.route('/projects/purges/<job_id>', methods=['GET'])
+@token_required
+@pm_required
+def get_purge_job(current_user, job_id):
+    """Obtiene el estado de una eliminación asíncrona"""
+    job = project_purge.get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return jsonify({'job': job}), 200
+
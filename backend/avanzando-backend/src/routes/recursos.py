@@ -2,6 +2,9 @@ from flask import Blueprint, request, jsonify
 from src.models.user import db
 from src.models.recurso import Recurso, TipoRecurso, EstadoRecurso
 from src.models.project import Proyecto
+from src.models.serialization import eager_load, requested_fields
+from src.middleware.conditional import query_version, request_etag, not_modified, with_etag
+from src.models.pagination import respond_page, CursorInvalidoError
 from datetime import datetime
 
 recursos_bp = Blueprint('recursos', __name__)
@@ -12,14 +15,17 @@ def get_recursos():
         proyecto_id = request.args.get('proyecto_id')
         tipo = request.args.get('tipo')
         
-        query = Recurso.query.filter_by(activo=True)
+        fields = requested_fields()
+        
+        query = eager_load(Recurso.query, Recurso, fields).filter_by(activo=True)
         if proyecto_id:
             query = query.filter_by(proyecto_id=proyecto_id)
         if tipo:
             query = query.filter_by(tipo=TipoRecurso(tipo))
         
-        recursos = query.all()
-        return jsonify([recurso.to_dict() for recurso in recursos])
+        return respond_page(query, Recurso, lambda recurso: recurso.to_dict(fields), Recurso.fecha_actualizacion)
+    except CursorInvalidoError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -65,8 +71,9 @@ def create_recurso():
 @recursos_bp.route('/api/recursos/<int:recurso_id>', methods=['GET'])
 def get_recurso(recurso_id):
     try:
-        recurso = Recurso.query.get_or_404(recurso_id)
-        return jsonify(recurso.to_dict())
+        fields = requested_fields()
+        recurso = eager_load(Recurso.query, Recurso, fields).filter_by(id=recurso_id).first_or_404()
+        return jsonify(recurso.to_dict(fields))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -133,7 +140,15 @@ def delete_recurso(recurso_id):
 @recursos_bp.route('/api/recursos/dashboard/<int:proyecto_id>', methods=['GET'])
 def get_recursos_dashboard(proyecto_id):
     try:
-        recursos = Recurso.query.filter_by(proyecto_id=proyecto_id, activo=True).all()
+        query = Recurso.query.filter_by(proyecto_id=proyecto_id, activo=True)
+        
+        # GET condicional
+        etag = request_etag(None, *query_version(query, Recurso))
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
+        recursos = eager_load(query, Recurso).all()
         
         # Estadísticas generales
         total_recursos = len(recursos)
@@ -159,7 +174,7 @@ def get_recursos_dashboard(proyecto_id):
         # Recursos críticos (baja asignación)
         recursos_criticos = [r for r in recursos if r.porcentaje_asignacion() < 50]
         
-        return jsonify({
+        return with_etag(jsonify({
             'resumen': {
                 'total_recursos': total_recursos,
                 'costo_total': costo_total,
@@ -170,7 +185,7 @@ def get_recursos_dashboard(proyecto_id):
             'costo_por_tipo': costo_por_tipo,
             'recursos_por_estado': recursos_por_estado,
             'recursos_criticos': [r.to_dict() for r in recursos_criticos[:5]]  # Top 5
-        })
+        }), etag)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -2,6 +2,9 @@ from flask import Blueprint, request, jsonify
 from src.models.user import db
 from src.models.riesgo import Riesgo, TipoRiesgo, NivelProbabilidad, NivelImpacto, EstadoRiesgo
 from src.models.project import Proyecto
+from src.models.serialization import eager_load, requested_fields
+from src.middleware.conditional import query_version, request_etag, not_modified, with_etag
+from src.models.pagination import respond_page, CursorInvalidoError
 from datetime import datetime
 
 riesgos_bp = Blueprint('riesgos', __name__)
@@ -11,12 +14,15 @@ def get_riesgos():
     try:
         proyecto_id = request.args.get('proyecto_id')
         
-        query = Riesgo.query.filter_by(activo=True)
+        fields = requested_fields()
+        
+        query = eager_load(Riesgo.query, Riesgo, fields).filter_by(activo=True)
         if proyecto_id:
             query = query.filter_by(proyecto_id=proyecto_id)
         
-        riesgos = query.all()
-        return jsonify([riesgo.to_dict() for riesgo in riesgos])
+        return respond_page(query, Riesgo, lambda riesgo: riesgo.to_dict(fields))
+    except CursorInvalidoError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -62,8 +68,9 @@ def create_riesgo():
 @riesgos_bp.route('/api/riesgos/<int:riesgo_id>', methods=['GET'])
 def get_riesgo(riesgo_id):
     try:
-        riesgo = Riesgo.query.get_or_404(riesgo_id)
-        return jsonify(riesgo.to_dict())
+        fields = requested_fields()
+        riesgo = eager_load(Riesgo.query, Riesgo, fields).filter_by(id=riesgo_id).first_or_404()
+        return jsonify(riesgo.to_dict(fields))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -128,7 +135,15 @@ def delete_riesgo(riesgo_id):
 @riesgos_bp.route('/api/riesgos/matriz/<int:proyecto_id>', methods=['GET'])
 def get_matriz_riesgos(proyecto_id):
     try:
-        riesgos = Riesgo.query.filter_by(proyecto_id=proyecto_id, activo=True).all()
+        query = Riesgo.query.filter_by(proyecto_id=proyecto_id, activo=True)
+        
+        # GET condicional
+        etag = request_etag(None, *query_version(query, Riesgo))
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
+        riesgos = eager_load(query, Riesgo).all()
         
         # Crear matriz 5x5
         matriz = {}
@@ -155,7 +170,7 @@ def get_matriz_riesgos(proyecto_id):
             riesgos_por_nivel[nivel] = riesgos_por_nivel.get(nivel, 0) + 1
             riesgos_por_estado[estado] = riesgos_por_estado.get(estado, 0) + 1
         
-        return jsonify({
+        return with_etag(jsonify({
             'matriz': matriz,
             'estadisticas': {
                 'total_riesgos': total_riesgos,
@@ -163,14 +178,22 @@ def get_matriz_riesgos(proyecto_id):
                 'riesgos_por_estado': riesgos_por_estado
             },
             'riesgos': [riesgo.to_dict() for riesgo in riesgos]
-        })
+        }), etag)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @riesgos_bp.route('/api/riesgos/dashboard/<int:proyecto_id>', methods=['GET'])
 def get_riesgos_dashboard(proyecto_id):
     try:
-        riesgos = Riesgo.query.filter_by(proyecto_id=proyecto_id, activo=True).all()
+        query = Riesgo.query.filter_by(proyecto_id=proyecto_id, activo=True)
+        
+        # GET condicional
+        etag = request_etag(None, *query_version(query, Riesgo))
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
+        riesgos = eager_load(query, Riesgo).all()
         
         # Riesgos críticos (exposición >= 20)
         riesgos_criticos = [r for r in riesgos if r.calcular_exposicion() >= 20]
@@ -184,7 +207,7 @@ def get_riesgos_dashboard(proyecto_id):
         # Costo total estimado de riesgos
         costo_total = sum([r.costo_estimado for r in riesgos])
         
-        return jsonify({
+        return with_etag(jsonify({
             'resumen': {
                 'total_riesgos': len(riesgos),
                 'riesgos_criticos': len(riesgos_criticos),
@@ -192,7 +215,7 @@ def get_riesgos_dashboard(proyecto_id):
             },
             'riesgos_por_tipo': riesgos_por_tipo,
             'riesgos_criticos': [r.to_dict() for r in riesgos_criticos[:5]]  # Top 5
-        })
+        }), etag)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -0,0 +1,48 @@
+from flask import Blueprint, jsonify, request
+from src.middleware.auth import token_required
+from src.models.user import UserRole
+from src.services.search_index import search_index, ENTIDADES
+
+search_bp = Blueprint('search', __name__)
+
+MAX_SEARCH_LIMIT = 100
+
+@search_bp.route('/search', methods=['GET'])
+@token_required
+def search(current_user):
+    """Búsqueda de texto completo en proyectos, riesgos y documentos, ordenada por relevancia"""
+    try:
+        term = request.args.get('q', '').strip()
+        if not term:
+            return jsonify({'error': 'El parámetro q es requerido'}), 400
+
+        entidades = [name for name in request.args.get('type', '').split(',') if name]
+        invalid = [name for name in entidades if name not in ENTIDADES]
+        if invalid:
+            return jsonify({'error': f"Tipo inválido: {', '.join(invalid)}. Opciones: {', '.join(ENTIDADES)}"}), 400
+
+        # Entre 1 y MAX_SEARCH_LIMIT: LIMIT -1 en SQLite no tiene tope
+        limit = max(1, min(request.args.get('limit', 20, type=int), MAX_SEARCH_LIMIT))
+        proyecto_id = request.args.get('proyecto_id', type=int)
+
+        # Mismo alcance que el listado de proyectos: clientes solo ven los suyos
+        cliente_id = None
+        if current_user.rol == UserRole.CLIENTE:
+            cliente_id = current_user.cliente_id
+            if cliente_id is None:
+                # Sin cliente asociado no hay alcance: None significaría todos los clientes
+                return jsonify({'error': 'El usuario no tiene un cliente asociado'}), 403
+        elif current_user.rol != UserRole.ADMINISTRADOR and current_user.rol != UserRole.PM:
+            return jsonify({'query': term, 'results': [], 'total': 0}), 200
+
+        try:
+            results = search_index.search(term, entidades, proyecto_id, cliente_id, limit)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except RuntimeError as e:
+            return jsonify({'error': str(e)}), 503
+
+        return jsonify({'query': term, 'results': results, 'total': len(results)}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
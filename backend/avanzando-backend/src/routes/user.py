@@ -1,14 +1,24 @@
 from flask import Blueprint, jsonify, request
 from src.models.user import User, db, UserRole
 from src.middleware.auth import token_required, admin_required
+from src.services.principal_cache import principal_cache
+from src.services.user_provisioning import user_provisioning
+from src.services.password_hasher import HashingOverloadedError
+from src.models.serialization import eager_load, requested_fields
+from src.models.pagination import respond_page, CursorInvalidoError
+import csv
+import io
 
 user_bp = Blueprint("user", __name__)
 
 @user_bp.route("/users", methods=["GET"])
 @token_required
 def get_users(current_user):
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    fields = requested_fields()
+    try:
+        return respond_page(eager_load(User.query, User, fields), User, lambda user: user.to_dict(fields), User.fecha_actualizacion)
+    except CursorInvalidoError as e:
+        return jsonify({"error": str(e)}), 400
 
 @user_bp.route("/users", methods=["POST"])
 @token_required
@@ -27,11 +37,40 @@ def create_user(current_user):
     db.session.commit()
     return jsonify({"user": user.to_dict()}), 201
 
+@user_bp.route("/users/bulk", methods=["POST"])
+@token_required
+@admin_required
+def bulk_create_users(current_user):
+    """Alta masiva de usuarios desde CSV o arreglo JSON"""
+    if "file" in request.files:
+        content = request.files["file"].read().decode("utf-8-sig")
+        rows = list(csv.DictReader(io.StringIO(content)))
+    elif request.mimetype == "text/csv":
+        rows = list(csv.DictReader(io.StringIO(request.get_data(as_text=True))))
+    else:
+        data = request.get_json(silent=True)
+        rows = data.get("users") if isinstance(data, dict) else data
+    
+    if not isinstance(rows, list) or not rows:
+        return jsonify({"error": "Se requiere un arreglo JSON o un CSV con usuarios"}), 400
+    
+    try:
+        report = user_provisioning.provision(rows)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except HashingOverloadedError as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    
+    return jsonify(report), 201 if report["created"] else 400
+
 @user_bp.route("/users/<int:user_id>", methods=["GET"])
 @token_required
 def get_user(current_user, user_id):
-    user = User.query.get_or_404(user_id)
-    return jsonify(user.to_dict())
+    fields = requested_fields()
+    user = eager_load(User.query, User, fields).filter_by(id=user_id).first_or_404()
+    return jsonify(user.to_dict(fields))
 
 @user_bp.route("/users/<int:user_id>", methods=["PUT"])
 @token_required
@@ -42,6 +81,7 @@ def update_user(current_user, user_id):
     user.nombre = data.get("nombre", user.nombre)
     user.email = data.get("email", user.email)
     db.session.commit()
+    principal_cache.invalidate(user_id)
     return jsonify(user.to_dict())
 
 @user_bp.route("/users/<int:user_id>", methods=["DELETE"])
@@ -51,4 +91,5 @@ def delete_user(current_user, user_id):
     user = User.query.get_or_404(user_id)
     db.session.delete(user)
     db.session.commit()
+    principal_cache.invalidate(user_id)
     return "", 204
@@ -0,0 +1,276 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_, select, update
+from src.models.user import db, User
+from src.models.export_job import ExportJob, EstadoExportacion
+from src.services.export_streams import streaming_exporter
+
+try:
+    import redis
+except ImportError:  # Dependencia opcional: solo necesaria con EXPORT_QUEUE_BACKEND=redis
+    redis = None
+
+# Segundos tras los cuales un trabajo en procesamiento se considera abandonado (worker caído) y se reclama
+EXPORT_JOB_TIMEOUT = int(os.environ.get('EXPORT_JOB_TIMEOUT', 3600))
+
+ESTADOS_FINALES = (EstadoExportacion.COMPLETADA.value, EstadoExportacion.FALLIDA.value)
+
+def _serialize(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def new_job(user_id, formato, entidades, proyecto_id=None):
+    """Diccionario de un trabajo recién encolado (misma forma que ExportJob.to_dict)"""
+    return {
+        'id': uuid.uuid4().hex,
+        'user_id': user_id,
+        'formato': formato,
+        'entidades': list(entidades),
+        'proyecto_id': proyecto_id,
+        'estado': EstadoExportacion.PENDIENTE.value,
+        'filas_procesadas': 0,
+        'total_filas': None,
+        'archivo': None,
+        'tamano': None,
+        'error': None,
+        'fecha_creacion': datetime.utcnow().isoformat(),
+        'fecha_inicio': None,
+        'fecha_fin': None
+    }
+
+class SQLExportQueue:
+    """Cola sobre la tabla export_jobs (SQLite/PostgreSQL).
+
+    Las actualizaciones de estado usan su propia transacción corta; el worker no tiene
+    cursores abiertos cuando las escribe (ver StreamingExporter.iter_batches).
+    """
+
+    name = 'sql'
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout or EXPORT_JOB_TIMEOUT
+
+    def enqueue(self, job):
+        db.session.add(ExportJob(
+            id=job['id'], user_id=job['user_id'], formato=job['formato'], entidades=','.join(job['entidades']),
+            proyecto_id=job['proyecto_id'], estado=EstadoExportacion.PENDIENTE
+        ))
+        db.session.commit()
+
+    def _claimable(self):
+        """Pendientes, o en procesamiento desde hace más de timeout segundos (worker caído)"""
+        stale = datetime.utcnow() - timedelta(seconds=self.timeout)
+        return or_(
+            ExportJob.estado == EstadoExportacion.PENDIENTE,
+            and_(ExportJob.estado == EstadoExportacion.PROCESANDO, ExportJob.fecha_inicio < stale)
+        )
+
+    def claim(self):
+        """Reclama el trabajo disponible más antiguo; el UPDATE condicional evita que dos workers lo tomen"""
+        while True:
+            job_id = db.session.execute(
+                select(ExportJob.id).where(self._claimable())
+                .order_by(ExportJob.fecha_creacion).limit(1)
+            ).scalar()
+            if job_id is None:
+                db.session.commit()
+                return None
+            claimed = db.session.execute(
+                update(ExportJob)
+                .where(ExportJob.id == job_id, self._claimable())
+                .values(estado=EstadoExportacion.PROCESANDO, filas_procesadas=0, fecha_inicio=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                return self.get(job_id)
+
+    def update(self, job_id, **fields):
+        if 'estado' in fields:
+            fields['estado'] = EstadoExportacion(fields['estado'])
+        with db.engine.begin() as connection:
+            connection.execute(update(ExportJob).where(ExportJob.id == job_id).values(**fields))
+
+    def get(self, job_id):
+        job = db.session.execute(
+            select(ExportJob).where(ExportJob.id == job_id).execution_options(populate_existing=True)
+        ).scalar_one_or_none()
+        return job.to_dict() if job else None
+
+class MemoryExportQueue:
+    """Cola en el proceso, para pruebas y desarrollo"""
+
+    name = 'memory'
+
+    def __init__(self):
+        self._jobs = {}
+        self._pending = deque()
+        self._lock = threading.Lock()
+
+    def enqueue(self, job):
+        with self._lock:
+            self._jobs[job['id']] = dict(job)
+            self._pending.append(job['id'])
+
+    def claim(self):
+        with self._lock:
+            if not self._pending:
+                return None
+            job = self._jobs[self._pending.popleft()]
+            job.update(estado=EstadoExportacion.PROCESANDO.value, fecha_inicio=datetime.utcnow().isoformat())
+            return dict(job)
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update({key: _serialize(value) for key, value in fields.items()})
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+class RedisExportQueue:
+    """Cola sobre Redis: lista de pendientes, lista en procesamiento y un hash por trabajo con expiración"""
+
+    name = 'redis'
+
+    def __init__(self, client=None, url=None, prefix='exports', ttl=None):
+        if client is None:
+            if redis is None:
+                raise RuntimeError('EXPORT_QUEUE_BACKEND=redis requiere el paquete redis')
+            client = redis.Redis.from_url(url or os.environ.get('REDIS_URL', 'redis://localhost:6379/0'), decode_responses=True)
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl or int(os.environ.get('EXPORT_JOB_TTL', 86400))
+        self.timeout = EXPORT_JOB_TIMEOUT
+
+    def _key(self, job_id):
+        return f'{self.prefix}:job:{job_id}'
+
+    def _write(self, job_id, fields):
+        key = self._key(job_id)
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping={name: json.dumps(_serialize(value)) for name, value in fields.items()})
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def enqueue(self, job):
+        self._write(job['id'], job)
+        self.client.lpush(f'{self.prefix}:pending', job['id'])
+
+    def _lease(self, job_id):
+        """Reserva el trabajo por timeout segundos; False si otro worker lo tiene reservado"""
+        return bool(self.client.set(f'{self.prefix}:lease:{job_id}', 1, nx=True, ex=self.timeout))
+
+    def claim(self):
+        """Reclama un trabajo abandonado (su reserva expiró) o el siguiente pendiente"""
+        processing = f'{self.prefix}:processing'
+        job_id = next((job_id for job_id in self.client.lrange(processing, 0, -1) if self._lease(job_id)), None)
+        if job_id is None:
+            job_id = self.client.rpoplpush(f'{self.prefix}:pending', processing)
+            if job_id is None or not self._lease(job_id):
+                return None  # Cola vacía, u otro worker lo reservó al recorrer la lista en procesamiento
+        self._write(job_id, {'estado': EstadoExportacion.PROCESANDO.value, 'filas_procesadas': 0,
+                             'fecha_inicio': datetime.utcnow()})
+        return self.get(job_id)
+
+    def update(self, job_id, **fields):
+        self._write(job_id, fields)
+        if fields.get('estado') in ESTADOS_FINALES:
+            self.client.lrem(f'{self.prefix}:processing', 0, job_id)
+            self.client.delete(f'{self.prefix}:lease:{job_id}')
+
+    def get(self, job_id):
+        raw = self.client.hgetall(self._key(job_id))
+        return {name: json.loads(value) for name, value in raw.items()} if raw else None
+
+def create_export_queue(backend=None):
+    """Crea la cola según EXPORT_QUEUE_BACKEND: sql (por defecto), redis o memory"""
+    backend = backend or os.environ.get('EXPORT_QUEUE_BACKEND', 'sql')
+    if backend == 'sql':
+        return SQLExportQueue()
+    if backend == 'redis':
+        return RedisExportQueue()
+    if backend == 'memory':
+        return MemoryExportQueue()
+    raise ValueError(f'Backend de cola de exportación desconocido: {backend}')
+
+class ExportJobService:
+    """Encola exportaciones y las procesa en un worker que escribe a un archivo temporal"""
+
+    def __init__(self, queue=None, export_dir=None):
+        self.queue = queue or create_export_queue()
+        self.export_dir = export_dir or os.environ.get('EXPORT_DIR', os.path.join(tempfile.gettempdir(), 'avanzando-exports'))
+
+    def submit(self, user_id, formato, entidades, proyecto_id=None):
+        """Valida y encola un trabajo; retorna su diccionario"""
+        streaming_exporter.validate(formato, entidades)
+        job = new_job(user_id, formato, entidades, proyecto_id)
+        self.queue.enqueue(job)
+        return job
+
+    def get(self, job_id):
+        return self.queue.get(job_id)
+
+    def process(self, job):
+        """Renderiza el trabajo a un archivo .part y lo publica con un rename atómico"""
+        os.makedirs(self.export_dir, exist_ok=True)
+        path = os.path.join(self.export_dir, f"{job['id']}.{job['formato']}")
+        # Sufijo por intento: un trabajo reclamado no comparte el archivo parcial con el worker anterior
+        partial = f'{path}.{uuid.uuid4().hex[:8]}.part'
+        processed = 0
+        chunks = None
+
+        def on_batch(rows):
+            nonlocal processed
+            processed += rows
+            self.queue.update(job['id'], filas_procesadas=processed)
+
+        try:
+            # Alcance del solicitante al momento de procesar (rol y cliente actuales)
+            user = db.session.get(User, job['user_id'])
+            if user is None:
+                raise PermissionError('El usuario de la exportación ya no existe')
+            cliente_id = streaming_exporter.scope(user, job['entidades'])
+            total = sum(streaming_exporter.count(name, job['proyecto_id'], cliente_id) for name in job['entidades'])
+            self.queue.update(job['id'], total_filas=total)
+            chunks = streaming_exporter.render(job['formato'], job['entidades'], job['proyecto_id'], on_batch, cliente_id)
+            with open(partial, 'wb') as output:
+                for chunk in chunks:
+                    output.write(chunk if isinstance(chunk, bytes) else chunk.encode('utf-8'))
+            os.replace(partial, path)
+            self.queue.update(job['id'], estado=EstadoExportacion.COMPLETADA.value, filas_procesadas=processed,
+                              archivo=path, tamano=os.path.getsize(path), fecha_fin=datetime.utcnow())
+        except Exception as e:
+            # Cerrar el generador y la transacción antes de registrar el fallo: ningún cursor debe bloquear la escritura
+            if hasattr(chunks, 'close'):
+                chunks.close()
+            db.session.rollback()
+            if os.path.exists(partial):
+                os.remove(partial)
+            self.queue.update(job['id'], estado=EstadoExportacion.FALLIDA.value, error=str(e), fecha_fin=datetime.utcnow())
+        finally:
+            db.session.rollback()
+
+    def run_once(self):
+        """Procesa el siguiente trabajo pendiente; retorna False si la cola está vacía"""
+        job = self.queue.claim()
+        if job is None:
+            return False
+        self.process(job)
+        return True
+
+    def run_forever(self, poll_seconds=None):
+        """Bucle del proceso worker (flask export-worker)"""
+        poll_seconds = poll_seconds or float(os.environ.get('EXPORT_POLL_SECONDS', 2))
+        while True:
+            if not self.run_once():
+                time.sleep(poll_seconds)
+
+# Instancia global del servicio
+export_jobs = ExportJobService()
@@ -0,0 +1,287 @@
+import csv
+import enum
+import io
+import json
+import os
+from collections import namedtuple
+from datetime import date, datetime
+from sqlalchemy import func, select
+from src.models.user import db, User, UserRole, Cliente
+from src.models.project import Proyecto
+from src.models.kpi import KPI
+from src.models.riesgo import Riesgo
+from src.models.recurso import Recurso
+from src.models.liquidacion import Liquidacion, RegistroHoras
+from src.models.streaming import NDJSON_MIMETYPE, iter_json_array, iter_ndjson
+from src.services.xlsx_writer import iter_xlsx
+
+# key: nombre en JSON; header: encabezado en CSV/XLSX (None: solo JSON/NDJSON); csv_format: formato opcional para CSV
+ExportColumn = namedtuple('ExportColumn', ['key', 'header', 'expression', 'csv_format'], defaults=[None])
+
+# statement: select de columnas (nunca entidades ORM) ordenado por la primera columna, la llave (id);
+# proyecto_column: filtro ?proyecto_id= y alcance por cliente; pm_only: solo PM o administrador
+ExportDataset = namedtuple('ExportDataset', ['name', 'title', 'columns', 'statement', 'proyecto_column', 'pm_only'],
+                           defaults=[False])
+
+# Roles que exportan cualquier entidad de todos los clientes
+PM_ROLES = (UserRole.ADMINISTRADOR, UserRole.PM)
+
+def _percent(value):
+    return f'{round(value or 0, 2)}%'
+
+def _date_or_na(value):
+    return value[:10] if value else 'N/A'
+
+def _dataset(name, title, columns, from_clause, where=None, proyecto_column=None, order_by=None, pm_only=False):
+    statement = select(*[column.expression for column in columns]).select_from(from_clause)
+    if where is not None:
+        statement = statement.where(where)
+    return ExportDataset(name, title, columns, statement.order_by(order_by), proyecto_column, pm_only)
+
+DATASETS = {
+    # En JSON/NDJSON cada proyecto conserva las claves y valores de Proyecto.to_dict()
+    'proyectos': _dataset('proyectos', 'Proyectos', [
+        ExportColumn('id', 'ID', Proyecto.id),
+        ExportColumn('nombre', 'Nombre', Proyecto.nombre),
+        ExportColumn('descripcion', None, Proyecto.descripcion),
+        ExportColumn('estado', 'Estado', Proyecto.estado),
+        ExportColumn('cliente_id', None, Proyecto.cliente_id),
+        ExportColumn('cliente_nombre', 'Cliente', Cliente.nombre, lambda value: value or 'N/A'),
+        ExportColumn('presupuesto_estimado', 'Presupuesto', Proyecto.presupuesto_estimado, lambda value: value or 0),
+        ExportColumn('presupuesto_real', 'Gastado', func.coalesce(Proyecto.presupuesto_real, 0).label('presupuesto_real')),
+        ExportColumn('progreso_general', 'Progreso',
+                     func.round(func.coalesce(Proyecto.progreso_general, 0), 2).label('progreso_general'), _percent),
+        ExportColumn('fecha_inicio', 'Fecha Inicio', Proyecto.fecha_inicio, _date_or_na),
+        ExportColumn('fecha_fin', 'Fecha Fin', Proyecto.fecha_fin, _date_or_na),
+        ExportColumn('fecha_creacion', None, Proyecto.fecha_creacion),
+        ExportColumn('fecha_actualizacion', None, Proyecto.fecha_actualizacion),
+    ], Proyecto.__table__.outerjoin(Cliente.__table__, Proyecto.cliente_id == Cliente.id),
+        proyecto_column=Proyecto.id, order_by=Proyecto.id),
+    'kpis': _dataset('kpis', 'KPIs', [
+        ExportColumn('id', 'ID', KPI.id),
+        ExportColumn('proyecto_id', 'Proyecto ID', KPI.proyecto_id),
+        ExportColumn('proyecto_nombre', 'Proyecto', Proyecto.nombre),
+        ExportColumn('nombre', 'Nombre', KPI.nombre),
+        ExportColumn('tipo', 'Tipo', KPI.tipo),
+        ExportColumn('valor_objetivo', 'Valor Objetivo', KPI.valor_objetivo),
+        ExportColumn('valor_actual', 'Valor Actual', KPI.valor_actual),
+        ExportColumn('unidad_medida', 'Unidad', KPI.unidad_medida),
+        ExportColumn('estado', 'Estado', KPI.estado),
+        ExportColumn('fecha_actualizacion', 'Fecha Actualización', KPI.fecha_actualizacion),
+    ], KPI.__table__.join(Proyecto.__table__, KPI.proyecto_id == Proyecto.id),
+        where=KPI.activo == True, proyecto_column=KPI.proyecto_id, order_by=KPI.id),
+    'riesgos': _dataset('riesgos', 'Riesgos', [
+        ExportColumn('id', 'ID', Riesgo.id),
+        ExportColumn('proyecto_id', 'Proyecto ID', Riesgo.proyecto_id),
+        ExportColumn('codigo', 'Código', Riesgo.codigo),
+        ExportColumn('nombre', 'Nombre', Riesgo.nombre),
+        ExportColumn('tipo', 'Tipo', Riesgo.tipo),
+        ExportColumn('probabilidad', 'Probabilidad', Riesgo.probabilidad),
+        ExportColumn('impacto', 'Impacto', Riesgo.impacto),
+        ExportColumn('estado', 'Estado', Riesgo.estado),
+        ExportColumn('costo_estimado', 'Costo Estimado', Riesgo.costo_estimado),
+        ExportColumn('responsable_nombre', 'Responsable', User.nombre),
+    ], Riesgo.__table__.outerjoin(User.__table__, Riesgo.responsable_id == User.id),
+        where=Riesgo.activo == True, proyecto_column=Riesgo.proyecto_id, order_by=Riesgo.id),
+    'recursos': _dataset('recursos', 'Recursos', [
+        ExportColumn('id', 'ID', Recurso.id),
+        ExportColumn('proyecto_id', 'Proyecto ID', Recurso.proyecto_id),
+        ExportColumn('nombre', 'Nombre', Recurso.nombre),
+        ExportColumn('tipo', 'Tipo', Recurso.tipo),
+        ExportColumn('estado', 'Estado', Recurso.estado),
+        ExportColumn('cantidad_requerida', 'Cantidad Requerida', Recurso.cantidad_requerida),
+        ExportColumn('cantidad_asignada', 'Cantidad Asignada', Recurso.cantidad_asignada),
+        ExportColumn('unidad_medida', 'Unidad', Recurso.unidad_medida),
+        ExportColumn('costo_total', 'Costo Total', Recurso.costo_total),
+        ExportColumn('usuario_asignado_nombre', 'Usuario Asignado', User.nombre),
+    ], Recurso.__table__.outerjoin(User.__table__, Recurso.usuario_asignado_id == User.id),
+        where=Recurso.activo == True, proyecto_column=Recurso.proyecto_id, order_by=Recurso.id, pm_only=True),
+    'horas': _dataset('horas', 'Registro de Horas', [
+        ExportColumn('id', 'ID', RegistroHoras.id),
+        ExportColumn('proyecto_id', 'Proyecto ID', Liquidacion.proyecto_id),
+        ExportColumn('liquidacion_id', 'Liquidación', RegistroHoras.liquidacion_id),
+        ExportColumn('recurso_nombre', 'Recurso', Recurso.nombre),
+        ExportColumn('fecha', 'Fecha', RegistroHoras.fecha),
+        ExportColumn('horas_trabajadas', 'Horas', RegistroHoras.horas_trabajadas),
+        ExportColumn('tarifa_hora', 'Tarifa Hora', RegistroHoras.tarifa_hora),
+        ExportColumn('total', 'Total', RegistroHoras.total),
+        ExportColumn('descripcion_actividad', 'Actividad', RegistroHoras.descripcion_actividad),
+    ], RegistroHoras.__table__
+        .join(Liquidacion.__table__, RegistroHoras.liquidacion_id == Liquidacion.id)
+        .join(Recurso.__table__, RegistroHoras.recurso_id == Recurso.id),
+        proyecto_column=Liquidacion.proyecto_id, order_by=RegistroHoras.id, pm_only=True),
+}
+
+# Hojas del libro XLSX cuando no se indica entity
+XLSX_DEFAULT_SHEETS = ('proyectos', 'kpis', 'riesgos', 'recursos')
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Formato -> tipo MIME
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'json': 'application/json',
+    'ndjson': NDJSON_MIMETYPE,
+    'xlsx': XLSX_MIMETYPE
+}
+
+def export_value(value):
+    """Convierte un valor de columna a un tipo nativo de JSON"""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, 'is_finite'):  # Decimal de columnas Numeric
+        return float(value)
+    return value
+
+class StreamingExporter:
+    """Exportaciones en streaming con memoria constante: cursor con yield_per y salida por lotes"""
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+
+    def dataset(self, name):
+        dataset = DATASETS.get(name)
+        if dataset is None:
+            raise ValueError(f"Entidad de exportación no soportada: {name}. Opciones: {', '.join(DATASETS)}")
+        return dataset
+
+    def allowed(self, user, name):
+        """Si el rol del usuario puede exportar la entidad"""
+        return not self.dataset(name).pm_only or user.rol in PM_ROLES
+
+    def scope(self, user, names):
+        """cliente_id al que se limita la exportación (None: todos los clientes).
+
+        Lanza PermissionError si el usuario no puede exportar alguna de las entidades.
+        """
+        for name in names:
+            if not self.allowed(user, name):
+                raise PermissionError(f'La exportación de {name} requiere rol de PM o superior')
+        if user.rol in PM_ROLES:
+            return None
+        if user.rol == UserRole.CLIENTE and user.cliente_id is not None:
+            return user.cliente_id
+        raise PermissionError('El usuario no tiene proyectos para exportar')
+
+    def _statement(self, name, proyecto_id=None, cliente_id=None):
+        dataset = self.dataset(name)
+        statement = dataset.statement
+        if proyecto_id is not None:
+            statement = statement.where(dataset.proyecto_column == proyecto_id)
+        if cliente_id is not None:
+            statement = statement.where(dataset.proyecto_column.in_(select(Proyecto.id).where(Proyecto.cliente_id == cliente_id)))
+        return statement
+
+    def count(self, name, proyecto_id=None, cliente_id=None):
+        """Total de filas de la exportación sin leerlas"""
+        statement = self._statement(name, proyecto_id, cliente_id).order_by(None)
+        return db.session.execute(select(func.count()).select_from(statement.subquery())).scalar()
+
+    def iter_batches(self, name, proyecto_id=None, on_batch=None, cliente_id=None):
+        """Lotes de filas (tuplas con valores nativos de JSON) leídos con yield_per.
+
+        on_batch(filas) se invoca tras cada lote para reportar progreso. En ese caso cada
+        lote es una consulta paginada por id que se lee completa, así ningún cursor queda
+        abierto mientras el progreso se escribe en otra transacción (en SQLite un cursor
+        abierto bloquea la escritura de las demás conexiones).
+        """
+        statement = self._statement(name, proyecto_id, cliente_id)
+        if on_batch is None:
+            result = db.session.execute(statement.execution_options(yield_per=self.batch_size))
+            for partition in result.partitions():
+                yield [tuple(export_value(value) for value in row) for row in partition]
+            return
+
+        key_column = self.dataset(name).columns[0].expression
+        last_key = None
+        while True:
+            page = statement if last_key is None else statement.where(key_column > last_key)
+            rows = db.session.execute(page.limit(self.batch_size)).all()
+            if rows:
+                yield [tuple(export_value(value) for value in row) for row in rows]
+                on_batch(len(rows))
+            if len(rows) < self.batch_size:
+                return
+            last_key = rows[-1][0]
+
+    @staticmethod
+    def _tabular(dataset):
+        """Índices de las columnas de CSV/XLSX (las que tienen encabezado)"""
+        return [index for index, column in enumerate(dataset.columns) if column.header is not None]
+
+    def _tabular_batches(self, dataset, proyecto_id=None, on_batch=None, cliente_id=None):
+        """Lotes de iter_batches con solo las columnas de CSV/XLSX"""
+        indexes = self._tabular(dataset)
+        for batch in self.iter_batches(dataset.name, proyecto_id, on_batch, cliente_id):
+            yield [tuple(row[index] for index in indexes) for row in batch]
+
+    def iter_csv(self, name, proyecto_id=None, on_batch=None, cliente_id=None):
+        """Genera el CSV por fragmentos: encabezados y luego un fragmento por lote de filas"""
+        dataset = self.dataset(name)
+        columns = [dataset.columns[index] for index in self._tabular(dataset)]
+        formats = [column.csv_format for column in columns]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow([column.header for column in columns])
+        for batch in self._tabular_batches(dataset, proyecto_id, on_batch, cliente_id):
+            for row in batch:
+                writer.writerow([fmt(value) if fmt else value for fmt, value in zip(formats, row)])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    def iter_records(self, name, proyecto_id=None, on_batch=None, cliente_id=None):
+        """Filas como diccionarios con las claves de las columnas"""
+        keys = [column.key for column in self.dataset(name).columns]
+        for batch in self.iter_batches(name, proyecto_id, on_batch, cliente_id):
+            for row in batch:
+                yield dict(zip(keys, row))
+
+    def iter_ndjson(self, name, proyecto_id=None, on_batch=None, cliente_id=None):
+        return iter_ndjson(self.iter_records(name, proyecto_id, on_batch, cliente_id), self.batch_size)
+
+    def iter_json(self, name, proyecto_id=None, export_date=None, on_batch=None, cliente_id=None):
+        """Documento JSON {export_date, total_<entidad>, <entidad>: [...]} codificado por lotes"""
+        key = 'projects' if name == 'proyectos' else name
+        header = json.dumps({'export_date': export_date or datetime.now().isoformat(),
+                             f'total_{key}': self.count(name, proyecto_id, cliente_id)})
+        prefix = header[:-1] + f', "{key}": ['
+        return iter_json_array(self.iter_records(name, proyecto_id, on_batch, cliente_id), prefix=prefix, suffix=']}', batch_size=self.batch_size)
+
+    def iter_xlsx(self, names, proyecto_id=None, on_batch=None, cliente_id=None):
+        """Libro XLSX con una hoja por entidad, escrito en streaming desde los cursores"""
+        datasets = [self.dataset(name) for name in names]
+        return iter_xlsx([
+            (dataset.title, [dataset.columns[index].header for index in self._tabular(dataset)],
+             self._tabular_batches(dataset, proyecto_id, on_batch, cliente_id))
+            for dataset in datasets
+        ])
+
+    def validate(self, format_type, names):
+        """xlsx admite varias entidades (una hoja por entidad); el resto de formatos, exactamente una"""
+        if format_type not in EXPORT_FORMATS:
+            raise ValueError('Formato no soportado')
+        if not names:
+            raise ValueError('Debe indicar al menos una entidad')
+        for name in names:
+            self.dataset(name)
+        if format_type != 'xlsx' and len(names) != 1:
+            raise ValueError(f'El formato {format_type} admite una sola entidad')
+
+    def render(self, format_type, names, proyecto_id=None, on_batch=None, cliente_id=None):
+        """Fragmentos del archivo en el formato pedido"""
+        self.validate(format_type, names)
+        if format_type == 'xlsx':
+            return self.iter_xlsx(names, proyecto_id, on_batch, cliente_id)
+        if format_type == 'csv':
+            return self.iter_csv(names[0], proyecto_id, on_batch, cliente_id)
+        if format_type == 'ndjson':
+            return self.iter_ndjson(names[0], proyecto_id, on_batch, cliente_id)
+        return self.iter_json(names[0], proyecto_id, on_batch=on_batch, cliente_id=cliente_id)
+
+# Instancia global del servicio
+streaming_exporter = StreamingExporter()
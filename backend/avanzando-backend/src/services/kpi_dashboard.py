@@ -0,0 +1,95 @@
+from sqlalchemy import case, func, select
+from src.models.user import db
+from src.models.kpi import KPI, TipoKPI, EstadoKPI
+
+def _cumplimiento():
+    """KPI.porcentaje_cumplimiento en SQL: valor_actual / valor_objetivo * 100, con tope 100"""
+    ratio = func.coalesce(KPI.valor_actual, 0) / KPI.valor_objetivo * 100
+    return case((KPI.valor_objetivo == 0, 0), (ratio > 100, 100), else_=ratio)
+
+# Filas del GROUP BY leídas por lote (cursor de servidor en PostgreSQL)
+SUMMARY_BATCH = 1000
+
+class KPIDashboardService:
+    """Resumen de KPIs por proyecto calculado con un GROUP BY (proyecto, tipo, estado).
+
+    Cada grupo trae la cantidad de KPIs y la suma de sus porcentajes de
+    cumplimiento, así que el resumen se arma sin cargar ni serializar los KPIs.
+    """
+
+    @staticmethod
+    def empty_summary():
+        return {
+            'resumen': {
+                'total_kpis': 0,
+                'kpis_verdes': 0,
+                'kpis_amarillos': 0,
+                'kpis_rojos': 0,
+                'porcentaje_verde': 0
+            },
+            'kpis_por_tipo': {tipo.value: {'total': 0, 'promedio_cumplimiento': 0} for tipo in TipoKPI}
+        }
+
+    @staticmethod
+    def _finish(summary, cumplimiento):
+        """Convierte las sumas acumuladas en porcentajes"""
+        resumen = summary['resumen']
+        if resumen['total_kpis']:
+            resumen['porcentaje_verde'] = resumen['kpis_verdes'] / resumen['total_kpis'] * 100
+        for tipo, values in summary['kpis_por_tipo'].items():
+            if values['total']:
+                values['promedio_cumplimiento'] = cumplimiento[tipo] / values['total']
+        return summary
+
+    def summaries(self, proyecto_ids):
+        """Genera (proyecto_id, resumen) en orden de proyecto a medida que se leen los grupos.
+
+        Los proyectos sin KPIs activos no aparecen en el resultado.
+        """
+        rows = db.session.execute(
+            select(KPI.proyecto_id, KPI.tipo, KPI.estado, func.count(KPI.id), func.sum(_cumplimiento()))
+            .where(KPI.proyecto_id.in_(list(proyecto_ids)), KPI.activo == True)
+            .group_by(KPI.proyecto_id, KPI.tipo, KPI.estado)
+            .order_by(KPI.proyecto_id)
+            .execution_options(yield_per=SUMMARY_BATCH)
+        )
+        current, summary, cumplimiento = None, None, None
+        for proyecto_id, tipo, estado, count, total_cumplimiento in rows:
+            if proyecto_id != current:
+                if current is not None:
+                    yield current, self._finish(summary, cumplimiento)
+                current, summary = proyecto_id, self.empty_summary()
+                cumplimiento = dict.fromkeys(summary['kpis_por_tipo'], 0)
+            summary['resumen']['total_kpis'] += count
+            if estado == EstadoKPI.VERDE:
+                summary['resumen']['kpis_verdes'] += count
+            elif estado == EstadoKPI.AMARILLO:
+                summary['resumen']['kpis_amarillos'] += count
+            elif estado == EstadoKPI.ROJO:
+                summary['resumen']['kpis_rojos'] += count
+            if tipo is not None:
+                summary['kpis_por_tipo'][tipo.value]['total'] += count
+                cumplimiento[tipo.value] += total_cumplimiento or 0
+        if current is not None:
+            yield current, self._finish(summary, cumplimiento)
+
+    def dashboards(self, proyecto_ids):
+        """(proyecto_id, resumen) de cada proyecto solicitado, en orden y con resumen vacío si no tiene KPIs"""
+        proyecto_ids = sorted(set(proyecto_ids))
+        position = 0
+        for proyecto_id, summary in self.summaries(proyecto_ids):
+            while proyecto_ids[position] < proyecto_id:
+                yield proyecto_ids[position], self.empty_summary()
+                position += 1
+            yield proyecto_id, summary
+            position += 1
+        for proyecto_id in proyecto_ids[position:]:
+            yield proyecto_id, self.empty_summary()
+
+    def summary(self, proyecto_id):
+        """Resumen de un proyecto (vacío si no tiene KPIs activos)"""
+        found = dict(self.summaries([proyecto_id]))
+        return found.get(proyecto_id) or self.empty_summary()
+
+# Instancia global del servicio
+kpi_dashboard = KPIDashboardService()
@@ -0,0 +1,228 @@
+import os
+import zlib
+from array import array
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from heapq import merge
+from itertools import accumulate
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from src.models.user import db
+from src.models.kpi_medicion import KPIMedicion
+
+try:
+    import numpy as np
+except ImportError:  # NumPy está en requirements.txt; sin él (solo en desarrollo) se decodifica con array e itertools
+    np = None
+
+EPOCH = datetime(1970, 1, 1)
+
+# Los valores se guardan como enteros: valor * ESCALA_VALORES (4 decimales)
+ESCALA_VALORES = 10000
+
+# KPIs por consulta IN al cargar bloques en record_many
+RECORD_CHUNK = 500
+
+def _encode(values):
+    return zlib.compress(array('q', values).tobytes())
+
+def _decode(data):
+    values = array('q')
+    values.frombytes(zlib.decompress(data))
+    return values
+
+def _month(momento):
+    return date(momento.year, momento.month, 1)
+
+def _epoch(momento):
+    return int((momento - EPOCH).total_seconds())
+
+def _merge(inicio, tiempos, valores, points):
+    """Intercala mediciones [(momento, escalado)] ordenadas en un bloque decodificado y lo recodifica.
+
+    Se usa cuando llega una medición anterior al fin del bloque (carga retroactiva),
+    para que el bloque siga en orden de tiempo. Retorna (inicio, fin, tiempos, valores).
+    """
+    base = _epoch(inicio)
+    existing = zip((base + offset for offset in accumulate(tiempos)), accumulate(valores))
+    merged = list(merge(existing, ((_epoch(momento), escalado) for momento, escalado in points), key=lambda point: point[0]))
+    new_tiempos, new_valores = array('q'), array('q')
+    previous_time, previous_value = merged[0][0], 0
+    for second, escalado in merged:
+        new_tiempos.append(second - previous_time)
+        new_valores.append(escalado - previous_value)
+        previous_time, previous_value = second, escalado
+    return (EPOCH + timedelta(seconds=merged[0][0]), EPOCH + timedelta(seconds=merged[-1][0]),
+            new_tiempos, new_valores)
+
+class KPIHistoryService:
+    """Serie histórica de mediciones de KPIs en bloques mensuales compactos.
+
+    Cada bloque guarda las diferencias entre mediciones consecutivas (tiempo en
+    segundos y valor escalado a entero) comprimidas con zlib, de modo que un año de
+    mediciones diarias de un KPI ocupa doce filas pequeñas y se decodifica con una
+    suma acumulada.
+    """
+
+    def __init__(self, max_retries=None):
+        self.max_retries = max_retries or int(os.environ.get('KPI_HISTORY_RETRIES', 5))
+
+    @staticmethod
+    def _insert_ignore(connection):
+        """INSERT ... ON CONFLICT DO NOTHING del motor en uso"""
+        dialect = postgresql if connection.dialect.name == 'postgresql' else sqlite
+        return dialect.insert(KPIMedicion).on_conflict_do_nothing(index_elements=['kpi_id', 'periodo'])
+
+    def record(self, kpi_id, valor, momento=None):
+        """Agrega una medición al bloque del mes; no hace commit (participa de la transacción en curso)"""
+        momento = (momento or datetime.utcnow()).replace(microsecond=0)
+        periodo = _month(momento)
+        escalado = round((valor or 0) * ESCALA_VALORES)
+        connection = db.session.connection()
+        for _ in range(self.max_retries):
+            chunk = connection.execute(
+                select(KPIMedicion.id, KPIMedicion.inicio, KPIMedicion.fin, KPIMedicion.cantidad,
+                       KPIMedicion.tiempos, KPIMedicion.valores)
+                .where(KPIMedicion.kpi_id == kpi_id, KPIMedicion.periodo == periodo)
+            ).first()
+            if chunk is None:
+                created = connection.execute(self._insert_ignore(connection).values(
+                    kpi_id=kpi_id, periodo=periodo, inicio=momento, fin=momento, cantidad=1,
+                    tiempos=_encode([0]), valores=_encode([escalado])
+                )).rowcount
+                if created:
+                    return
+                continue  # Otro proceso creó el bloque: se agrega a ese
+
+            tiempos, valores = _decode(chunk.tiempos), _decode(chunk.valores)
+            if momento >= chunk.fin:
+                inicio, fin = chunk.inicio, momento
+                tiempos.append(_epoch(momento) - _epoch(chunk.fin))
+                valores.append(escalado - sum(valores))
+            else:
+                inicio, fin, tiempos, valores = _merge(chunk.inicio, tiempos, valores, [(momento, escalado)])
+            # Control optimista: si otro proceso agregó una medición entre la lectura y la escritura, se reintenta
+            updated = connection.execute(
+                update(KPIMedicion)
+                .where(KPIMedicion.id == chunk.id, KPIMedicion.cantidad == chunk.cantidad)
+                .values(cantidad=chunk.cantidad + 1, inicio=inicio, fin=fin, tiempos=_encode(tiempos), valores=_encode(valores))
+            ).rowcount
+            if updated:
+                return
+        raise RuntimeError(f'No se pudo registrar la medición del KPI {kpi_id} por escrituras concurrentes')
+
+    def record_many(self, samples):
+        """Agrega muchas mediciones [(kpi_id, valor, momento)] con una lectura y un executemany por tipo de escritura.
+
+        Todo el lote es atómico: si otro proceso modificó un bloque a la vez, se lanza
+        RuntimeError y la transacción debe deshacerse.
+        """
+        groups = defaultdict(list)
+        for kpi_id, valor, momento in samples:
+            momento = momento.replace(microsecond=0)
+            groups[(kpi_id, _month(momento))].append((momento, round((valor or 0) * ESCALA_VALORES)))
+        if not groups:
+            return 0
+
+        connection = db.session.connection()
+        kpi_ids = sorted({kpi_id for kpi_id, _ in groups})
+        periodos = sorted({periodo for _, periodo in groups})
+        existing = {}
+        for start in range(0, len(kpi_ids), RECORD_CHUNK):
+            for chunk in connection.execute(
+                select(KPIMedicion.id, KPIMedicion.kpi_id, KPIMedicion.periodo, KPIMedicion.inicio, KPIMedicion.fin,
+                       KPIMedicion.cantidad, KPIMedicion.tiempos, KPIMedicion.valores)
+                .where(KPIMedicion.kpi_id.in_(kpi_ids[start:start + RECORD_CHUNK]), KPIMedicion.periodo.in_(periodos))
+            ):
+                existing[(chunk.kpi_id, chunk.periodo)] = chunk
+
+        inserts, updates = [], []
+        for (kpi_id, periodo), points in groups.items():
+            points.sort()
+            chunk = existing.get((kpi_id, periodo))
+            if chunk is not None and points[0][0] < chunk.fin:
+                # Carga retroactiva: el bloque se recodifica en orden de tiempo
+                inicio, fin, tiempos, valores = _merge(chunk.inicio, _decode(chunk.tiempos), _decode(chunk.valores), points)
+                updates.append({'inicio': inicio, 'fin': fin, 'tiempos': _encode(tiempos), 'valores': _encode(valores),
+                                'b_id': chunk.id, 'b_cantidad': chunk.cantidad, 'cantidad': chunk.cantidad + len(points)})
+                continue
+            if chunk is None:
+                tiempos, valores = array('q'), array('q')
+                previous_time, previous_value = points[0][0], 0
+            else:
+                tiempos, valores = _decode(chunk.tiempos), _decode(chunk.valores)
+                previous_time, previous_value = chunk.fin, sum(valores)
+            for momento, escalado in points:
+                tiempos.append(_epoch(momento) - _epoch(previous_time))
+                valores.append(escalado - previous_value)
+                previous_time, previous_value = momento, escalado
+            values = {'inicio': points[0][0] if chunk is None else chunk.inicio, 'fin': previous_time,
+                      'tiempos': _encode(tiempos), 'valores': _encode(valores)}
+            if chunk is None:
+                inserts.append(dict(values, kpi_id=kpi_id, periodo=periodo, cantidad=len(points)))
+            else:
+                updates.append(dict(values, b_id=chunk.id, b_cantidad=chunk.cantidad, cantidad=chunk.cantidad + len(points)))
+
+        if inserts:
+            connection.execute(insert(KPIMedicion), inserts)
+        if updates:
+            result = connection.execute(
+                update(KPIMedicion)
+                .where(KPIMedicion.id == bindparam('b_id'), KPIMedicion.cantidad == bindparam('b_cantidad')),
+                updates
+            )
+            if connection.dialect.supports_sane_multi_rowcount and result.rowcount != len(updates):
+                raise RuntimeError('Mediciones de KPIs modificadas por otro proceso durante la carga por lotes')
+        return len(samples)
+
+    @staticmethod
+    def _decode_chunk(inicio, tiempos, valores):
+        """(segundos epoch, valores) de un bloque; usa NumPy si está disponible"""
+        base = _epoch(inicio)
+        if np is not None:
+            segundos = np.cumsum(np.frombuffer(zlib.decompress(tiempos), dtype=np.int64)) + base
+            return segundos, np.cumsum(np.frombuffer(zlib.decompress(valores), dtype=np.int64)) / ESCALA_VALORES
+        segundos = [base + offset for offset in accumulate(_decode(tiempos))]
+        return segundos, [value / ESCALA_VALORES for value in accumulate(_decode(valores))]
+
+    def series(self, kpi_ids, desde, hasta):
+        """Mediciones entre dos instantes por KPI, en columnas: {kpi_id: {'t': [epoch], 'v': [valor]}}"""
+        kpi_ids = list(kpi_ids)
+        lower, upper = _epoch(desde), _epoch(hasta)
+        result = {kpi_id: {'t': [], 'v': []} for kpi_id in kpi_ids}
+        for kpi_id, inicio, tiempos, valores in db.session.execute(
+            select(KPIMedicion.kpi_id, KPIMedicion.inicio, KPIMedicion.tiempos, KPIMedicion.valores)
+            .where(KPIMedicion.kpi_id.in_(kpi_ids), KPIMedicion.periodo.between(_month(desde), hasta.date()))
+            .order_by(KPIMedicion.kpi_id, KPIMedicion.periodo)
+        ):
+            segundos, values = self._decode_chunk(inicio, tiempos, valores)
+            if np is not None:
+                mask = (segundos >= lower) & (segundos <= upper)
+                result[kpi_id]['t'].extend(segundos[mask].tolist())
+                result[kpi_id]['v'].extend(values[mask].tolist())
+            else:
+                for second, value in zip(segundos, values):
+                    if lower <= second <= upper:
+                        result[kpi_id]['t'].append(second)
+                        result[kpi_id]['v'].append(value)
+        return result
+
+    def recent(self, kpi_id, limit=12):
+        """Últimos valores registrados de un KPI, del más antiguo al más reciente"""
+        values = []
+        for inicio, tiempos, valores in db.session.execute(
+            select(KPIMedicion.inicio, KPIMedicion.tiempos, KPIMedicion.valores)
+            .where(KPIMedicion.kpi_id == kpi_id).order_by(KPIMedicion.periodo.desc())
+        ):
+            values[:0] = list(self._decode_chunk(inicio, tiempos, valores)[1])
+            if len(values) >= limit:
+                break
+        return [float(value) for value in values[-limit:]]
+
+    @staticmethod
+    def default_range(days=365):
+        hasta = datetime.utcnow()
+        return hasta - timedelta(days=days), hasta
+
+# Instancia global del servicio
+kpi_history = KPIHistoryService()
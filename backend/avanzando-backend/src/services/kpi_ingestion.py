@@ -0,0 +1,86 @@
+import os
+from datetime import datetime
+from sqlalchemy import func, select, update
+from src.models.user import db
+from src.models.kpi import KPI, EstadoKPI
+from src.models.kpi_medicion import KPIMedicion
+from src.services.kpi_history import kpi_history
+
+try:
+    import numpy as np
+except ImportError:  # NumPy está en requirements.txt; sin él (solo en desarrollo) se evalúa con comprensiones de listas
+    np = None
+
+# Orden de los códigos que devuelve evaluate_states
+ESTADOS = (EstadoKPI.VERDE, EstadoKPI.AMARILLO, EstadoKPI.ROJO)
+
+KPI_BATCH_CHUNK = int(os.environ.get('KPI_BATCH_CHUNK', 500))
+
+def evaluate_states(valores, umbrales_amarillo, umbrales_rojo):
+    """Códigos de estado (0 verde, 1 amarillo, 2 rojo) para todo el lote; mismas reglas que KPI.calcular_estado"""
+    if np is not None:
+        valores = np.asarray(valores, dtype=float)
+        return np.where(valores >= np.asarray(umbrales_rojo, dtype=float), 2,
+                        np.where(valores >= np.asarray(umbrales_amarillo, dtype=float), 1, 0)).tolist()
+    return [2 if valor >= rojo else 1 if valor >= amarillo else 0
+            for valor, amarillo, rojo in zip(valores, umbrales_amarillo, umbrales_rojo)]
+
+class KPIIngestionService:
+    """Carga por lotes de valores de KPIs: una lectura de umbrales, estados vectorizados y un executemany"""
+
+    def thresholds(self, kpi_ids):
+        """{kpi_id: (umbral_amarillo, umbral_rojo, ultima_medicion)} de los KPIs activos, en consultas IN por bloques"""
+        kpi_ids = list(kpi_ids)
+        thresholds = {}
+        for start in range(0, len(kpi_ids), KPI_BATCH_CHUNK):
+            chunk = kpi_ids[start:start + KPI_BATCH_CHUNK]
+            ultima = (
+                select(KPIMedicion.kpi_id, func.max(KPIMedicion.fin).label('fin'))
+                .where(KPIMedicion.kpi_id.in_(chunk))
+                .group_by(KPIMedicion.kpi_id)
+                .subquery()
+            )
+            for kpi_id, amarillo, rojo, fin in db.session.execute(
+                select(KPI.id, KPI.umbral_amarillo, KPI.umbral_rojo, ultima.c.fin)
+                .outerjoin(ultima, ultima.c.kpi_id == KPI.id)
+                .where(KPI.id.in_(chunk), KPI.activo == True)
+            ):
+                thresholds[kpi_id] = (amarillo, rojo, fin)
+        return thresholds
+
+    def ingest(self, samples, thresholds):
+        """Registra todas las mediciones y pasa a valor_actual la más reciente de cada KPI.
+
+        Una medición anterior a la última registrada solo se agrega al histórico. No hace
+        commit. Retorna el conteo por estado de los KPIs actualizados.
+        """
+        latest = {}
+        for kpi_id, valor, momento in samples:
+            if kpi_id not in latest or momento >= latest[kpi_id][1]:
+                latest[kpi_id] = (valor, momento)
+
+        # El histórico guarda los instantes al segundo
+        kpi_ids = [kpi_id for kpi_id, (_, momento) in latest.items()
+                   if thresholds[kpi_id][2] is None or momento.replace(microsecond=0) >= thresholds[kpi_id][2]]
+        valores = [latest[kpi_id][0] for kpi_id in kpi_ids]
+        codes = evaluate_states(valores, [thresholds[kpi_id][0] for kpi_id in kpi_ids],
+                                [thresholds[kpi_id][1] for kpi_id in kpi_ids])
+
+        if kpi_ids:
+            # fecha_actualizacion es la hora de la escritura (versión de ETags y cursores), como en update_kpi;
+            # el instante de la medición queda solo en el histórico
+            now = datetime.utcnow()
+            # UPDATE por clave primaria del ORM: un solo executemany para todo el lote
+            db.session.execute(update(KPI), [
+                {'id': kpi_id, 'valor_actual': valor, 'estado': ESTADOS[code], 'fecha_actualizacion': now}
+                for kpi_id, valor, code in zip(kpi_ids, valores, codes)
+            ])
+        kpi_history.record_many(samples)
+
+        counts = dict.fromkeys((estado.value for estado in ESTADOS), 0)
+        for code in codes:
+            counts[ESTADOS[code].value] += 1
+        return counts
+
+# Instancia global del servicio
+kpi_ingestion = KPIIngestionService()
@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+from werkzeug.security import generate_password_hash, check_password_hash
+
+class HashingOverloadedError(Exception):
+    """Se superó la capacidad del pool de hashing"""
+
+class PasswordHasher:
+    """Pool acotado para el hashing de contraseñas con control de admisión.
+
+    El hilo de la petición espera el resultado; con workers gthread el semáforo
+    limita cuántos hilos del proceso pueden estar ocupados en hashing y el resto
+    responde 503 en lugar de acaparar el worker.
+    """
+
+    def __init__(self, pool_size=None, queue_size=None, queue_timeout=None, method=None, bulk_size=None, bulk_method=None):
+        self.pool_size = pool_size or int(os.environ.get('PASSWORD_HASH_POOL_SIZE', 2))
+        self.queue_size = queue_size if queue_size is not None else int(os.environ.get('PASSWORD_HASH_QUEUE_SIZE', 8))
+        self.queue_timeout = queue_timeout if queue_timeout is not None else float(os.environ.get('PASSWORD_HASH_QUEUE_TIMEOUT', 2))
+        # Método y factor de costo en formato werkzeug, p. ej. scrypt:32768:8:1 o pbkdf2:sha256:600000
+        self.method = self._normalize_method(method or os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1'))
+        # Altas masivas: un hilo por CPU y un costo menor (~2 ms por hash frente a ~90 ms de scrypt:32768:8:1),
+        # ~5.000 usuarios en unos 11 s de CPU; el login los rehashea al método configurado (needs_rehash)
+        self.bulk_size = bulk_size or int(os.environ.get('BULK_HASH_POOL_SIZE', os.cpu_count() or 1))
+        self.bulk_method = bulk_method or os.environ.get('BULK_HASH_METHOD', 'scrypt:1024:8:1')
+        self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix='password-hash')
+        self._admission = threading.BoundedSemaphore(self.pool_size + self.queue_size)
+        # Pool aparte para altas masivas, con un solo lote a la vez por proceso, para no retrasar los logins
+        self._bulk_executor = ThreadPoolExecutor(max_workers=self.bulk_size, thread_name_prefix='password-hash-bulk')
+        self._bulk_admission = threading.BoundedSemaphore(1)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @staticmethod
+    def _normalize_method(method):
+        """Prefijo completo que werkzeug escribe para el método (p. ej. scrypt -> scrypt:32768:8:1)"""
+        return generate_password_hash('', method, salt_length=1).split('$', 1)[0]
+
+    def _run(self, fn, *args):
+        if not self._admission.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.rejected += 1
+            raise HashingOverloadedError('Demasiadas solicitudes de autenticación simultáneas')
+        with self._lock:
+            self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+                self._latencies.append(elapsed_ms)
+            self._admission.release()
+
+    def hash(self, password):
+        """Genera el hash con el método y costo configurados"""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def hash_many(self, passwords):
+        """Genera hashes en lote con bulk_method en el pool compartido de altas masivas.
+
+        scrypt y pbkdf2 de hashlib liberan el GIL, así que los hilos del pool hashean
+        en paralelo sin crear procesos desde el worker. Los hashes de menor costo se
+        reemplazan por el método configurado en el primer login.
+        """
+        if not passwords:
+            return []
+        if not self._bulk_admission.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.rejected += 1
+            raise HashingOverloadedError('Ya hay un alta masiva de usuarios en curso')
+        start = time.perf_counter()
+        try:
+            hashes = list(self._bulk_executor.map(generate_password_hash, passwords, repeat(self.bulk_method)))
+        finally:
+            self._bulk_admission.release()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.completed += len(hashes)
+            self._latencies.append(elapsed_ms / len(hashes))
+        return hashes
+
+    def needs_rehash(self, password_hash):
+        """Indica si el hash fue generado con otro método o costo"""
+        return password_hash.split('$', 1)[0] != self.method
+
+    def set_password(self, user, password):
+        user.password_hash = self.hash(password)
+
+    def check_password(self, user, password):
+        return self.verify(user.password_hash, password)
+
+    def stats(self):
+        """Percentiles de latencia del paso de hashing (ms)"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {
+                'pool_size': self.pool_size,
+                'bulk_pool_size': self.bulk_size,
+                'bulk_method': self.bulk_method.split(':', 1)[0],
+                'queue_size': self.queue_size,
+                'method': self.method.split(':', 1)[0],
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'rejected': self.rejected
+            }
+        for name, pct in (('p50_ms', 50), ('p95_ms', 95), ('p99_ms', 99)):
+            if latencies:
+                index = min(len(latencies) - 1, int(len(latencies) * pct / 100))
+                stats[name] = round(latencies[index], 2)
+            else:
+                stats[name] = None
+        return stats
+
+# Instancia global del servicio
+password_hasher = PasswordHasher()
@@ -0,0 +1,99 @@
+from sqlalchemy import case, func, select
+from src.models.user import db, User
+from src.models.project import Proyecto, EstadoProyecto
+from src.models.kpi import KPI
+from src.models.riesgo import Riesgo, NivelImpacto
+from src.models.recurso import Recurso
+
+# Niveles de impacto que cuentan como riesgo alto
+IMPACTOS_ALTOS = (NivelImpacto.ALTO, NivelImpacto.MUY_ALTO)
+
+# Proyectos simultáneos que equivalen al 100% de utilización de un recurso
+PROYECTOS_POR_RECURSO = 5
+
+class PortfolioAggregates:
+    """Métricas del portafolio calculadas con GROUP BY en la base de datos.
+
+    Cada método ejecuta una sola consulta, así que el número de consultas del
+    dashboard no depende de la cantidad de proyectos.
+    """
+
+    @staticmethod
+    def _project_ids(query):
+        """Subconsulta con los ids de los proyectos filtrados"""
+        return query.with_entities(Proyecto.id).order_by(None).scalar_subquery()
+
+    def totals(self, query):
+        row = query.with_entities(
+            func.count(Proyecto.id),
+            func.coalesce(func.sum(case((Proyecto.estado == EstadoProyecto.ACTIVO, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((Proyecto.estado == EstadoProyecto.COMPLETADO, 1), else_=0)), 0),
+            func.coalesce(func.sum(Proyecto.presupuesto_estimado), 0),
+            func.coalesce(func.sum(Proyecto.presupuesto_real), 0)
+        ).order_by(None).one()
+        return {
+            'totalProjects': row[0],
+            'activeProjects': row[1],
+            'completedProjects': row[2],
+            'totalBudget': float(row[3]),
+            'totalSpent': float(row[4])
+        }
+
+    def kpi_summary(self, query, limit=5):
+        """Promedio de valor_actual de los KPIs activos de los primeros proyectos con KPIs"""
+        rows = db.session.execute(
+            select(Proyecto.nombre, func.avg(KPI.valor_actual), func.count(KPI.id))
+            .join(KPI, KPI.proyecto_id == Proyecto.id)
+            .where(Proyecto.id.in_(self._project_ids(query)), KPI.activo == True)
+            .group_by(Proyecto.id, Proyecto.nombre)
+            .order_by(Proyecto.id)
+            .limit(limit)
+        )
+        return [{
+            'project_name': nombre,
+            'performance': round(avg_performance or 0, 2),
+            'kpi_count': kpi_count
+        } for nombre, avg_performance, kpi_count in rows]
+
+    def risk_summary(self, query):
+        """Proyectos con al menos un riesgo activo de impacto alto"""
+        high_risks = func.sum(case((Riesgo.impacto.in_(IMPACTOS_ALTOS), 1), else_=0))
+        rows = db.session.execute(
+            select(Proyecto.nombre, high_risks, func.count(Riesgo.id))
+            .join(Riesgo, Riesgo.proyecto_id == Proyecto.id)
+            .where(Proyecto.id.in_(self._project_ids(query)), Riesgo.activo == True)
+            .group_by(Proyecto.id, Proyecto.nombre)
+            .having(high_risks > 0)
+            .order_by(Proyecto.id)
+        )
+        return [{
+            'project_name': nombre,
+            'high_risks': high,
+            'total_risks': total
+        } for nombre, high, total in rows]
+
+    def resource_utilization(self, query, limit=10):
+        """Proyectos filtrados en los que participa cada recurso.
+
+        Las personas se agrupan por usuario asignado y el resto por (tipo, nombre), así
+        dos recursos distintos con un nombre genérico ("Desarrollador") no se suman.
+        """
+        sin_usuario = Recurso.usuario_asignado_id.is_(None)
+        projects_assigned = func.count(func.distinct(Recurso.proyecto_id))
+        name = func.max(func.coalesce(User.nombre, Recurso.nombre))
+        rows = db.session.execute(
+            select(name, projects_assigned)
+            .outerjoin(User, Recurso.usuario_asignado_id == User.id)
+            .where(Recurso.proyecto_id.in_(self._project_ids(query)), Recurso.activo == True)
+            .group_by(Recurso.usuario_asignado_id, case((sin_usuario, Recurso.tipo)), case((sin_usuario, Recurso.nombre)))
+            .order_by(projects_assigned.desc(), name)
+            .limit(limit)
+        )
+        return [{
+            'name': nombre,
+            'projects_assigned': assigned,
+            'utilization': min(100, (assigned / PROYECTOS_POR_RECURSO) * 100)
+        } for nombre, assigned in rows]
+
+# Instancia global del servicio
+portfolio_aggregates = PortfolioAggregates()
@@ -0,0 +1,172 @@
+from datetime import date, timedelta
+from sqlalchemy import Date, case, cast, func, insert, select
+from src.models.user import db
+from src.models.project import Proyecto, EstadoProyecto
+from src.models.kpi import KPI, EstadoKPI
+from src.models.riesgo import Riesgo, EstadoRiesgo, NivelProbabilidad, NivelImpacto
+from src.models.recurso import Recurso
+from src.models.portfolio_snapshot import PortfolioSnapshot
+from src.services.portfolio_aggregates import IMPACTOS_ALTOS
+
+# Métricas que se suman al agregar proyectos y las que se promedian
+SUM_METRICS = ('proyectos', 'proyectos_activos', 'presupuesto_estimado', 'presupuesto_real', 'kpis_verde',
+               'kpis_amarillo', 'kpis_rojo', 'riesgos_abiertos', 'riesgos_altos', 'exposicion_riesgo',
+               'costo_riesgo', 'recursos_requeridos', 'recursos_asignados')
+AVG_METRICS = ('progreso', 'duracion_dias')
+
+INTERVALS = ('day', 'week', 'month')
+
+# Riesgos que ya no exponen al proyecto
+RIESGOS_CERRADOS = (EstadoRiesgo.CERRADO, EstadoRiesgo.MITIGADO)
+
+INSERT_CHUNK = 1000
+
+def _level(column, enum_cls):
+    """Valor numérico (1-5) de una columna Enum de probabilidad o impacto"""
+    return case(*[(column == member, member.value) for member in enum_cls], else_=0)
+
+def derived_metrics(values):
+    """Indicadores calculados a partir de los hechos de un día"""
+    requeridos = values.get('recursos_requeridos') or 0
+    presupuesto = values.get('presupuesto_estimado') or 0
+    return {
+        'utilizacion_recursos': round(values['recursos_asignados'] * 100 / requeridos, 2) if requeridos else 0,
+        'eficiencia_presupuesto': round(values['presupuesto_real'] * 100 / presupuesto, 2) if presupuesto else 0
+    }
+
+class PortfolioSnapshotService:
+    """Fotografía diaria del portafolio para gráficos de tendencia.
+
+    take() se ejecuta una vez por noche (flask snapshot-portfolio) y agrega cada
+    tabla con un GROUP BY; las consultas de tendencia leen solo portfolio_snapshots
+    y reducen la serie a semanas o meses en la base de datos.
+    """
+
+    def collect(self, fecha):
+        """Hechos por proyecto a la fecha, con una consulta por tabla"""
+        facts = {}
+        for proyecto_id, cliente_id, estado, estimado, real, progreso, inicio, fin in db.session.execute(select(
+            Proyecto.id, Proyecto.cliente_id, Proyecto.estado, Proyecto.presupuesto_estimado,
+            Proyecto.presupuesto_real, Proyecto.progreso_general, Proyecto.fecha_inicio, Proyecto.fecha_fin
+        )):
+            fin = min(fin, fecha) if fin else fecha
+            facts[proyecto_id] = dict(
+                dict.fromkeys(SUM_METRICS, 0),
+                fecha=fecha, proyecto_id=proyecto_id, cliente_id=cliente_id, proyectos=1,
+                proyectos_activos=int(estado == EstadoProyecto.ACTIVO),
+                presupuesto_estimado=estimado or 0, presupuesto_real=real or 0, progreso=progreso or 0,
+                duracion_dias=max((fin - inicio).days, 0) if inicio else 0
+            )
+
+        for proyecto_id, estado, count in db.session.execute(
+            select(KPI.proyecto_id, KPI.estado, func.count(KPI.id))
+            .where(KPI.activo == True).group_by(KPI.proyecto_id, KPI.estado)
+        ):
+            if proyecto_id in facts and estado:
+                facts[proyecto_id][f'kpis_{estado.value}'] = count
+
+        for proyecto_id, abiertos, altos, exposicion, costo in db.session.execute(
+            select(
+                Riesgo.proyecto_id, func.count(Riesgo.id),
+                func.sum(case((Riesgo.impacto.in_(IMPACTOS_ALTOS), 1), else_=0)),
+                func.sum(_level(Riesgo.probabilidad, NivelProbabilidad) * _level(Riesgo.impacto, NivelImpacto)),
+                func.coalesce(func.sum(Riesgo.costo_estimado), 0)
+            ).where(Riesgo.activo == True, Riesgo.estado.notin_(RIESGOS_CERRADOS)).group_by(Riesgo.proyecto_id)
+        ):
+            if proyecto_id in facts:
+                facts[proyecto_id].update(riesgos_abiertos=abiertos, riesgos_altos=altos,
+                                          exposicion_riesgo=exposicion, costo_riesgo=costo)
+
+        for proyecto_id, requeridos, asignados in db.session.execute(
+            select(Recurso.proyecto_id, func.coalesce(func.sum(Recurso.cantidad_requerida), 0),
+                   func.coalesce(func.sum(Recurso.cantidad_asignada), 0))
+            .where(Recurso.activo == True).group_by(Recurso.proyecto_id)
+        ):
+            if proyecto_id in facts:
+                facts[proyecto_id].update(recursos_requeridos=requeridos, recursos_asignados=asignados)
+        return facts
+
+    @staticmethod
+    def portfolio_row(fecha, rows):
+        """Fila global: suma de las métricas acumulables y promedio del resto"""
+        rows = list(rows)
+        values = {metric: sum(row[metric] for row in rows) for metric in SUM_METRICS}
+        for metric in AVG_METRICS:
+            values[metric] = sum(row[metric] for row in rows) / len(rows) if rows else 0
+        return dict(values, fecha=fecha, proyecto_id=None, cliente_id=None)
+
+    def take(self, fecha=None):
+        """Registra la fotografía del día; es idempotente (no reescribe un día ya registrado)"""
+        fecha = fecha or date.today()
+        exists = db.session.execute(
+            select(PortfolioSnapshot.id).where(PortfolioSnapshot.fecha == fecha, PortfolioSnapshot.proyecto_id.is_(None)).limit(1)
+        ).first()
+        if exists:
+            return 0
+        try:
+            rows = list(self.collect(fecha).values())
+            for start in range(0, len(rows), INSERT_CHUNK):
+                db.session.execute(insert(PortfolioSnapshot), rows[start:start + INSERT_CHUNK])
+            db.session.execute(insert(PortfolioSnapshot).values(**self.portfolio_row(fecha, rows)))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return len(rows)
+
+    def latest(self):
+        """Última fila global registrada, o los hechos de hoy calculados al vuelo si aún no hay fotografías"""
+        row = db.session.execute(
+            select(PortfolioSnapshot).where(PortfolioSnapshot.proyecto_id.is_(None))
+            .order_by(PortfolioSnapshot.fecha.desc()).limit(1)
+        ).scalar()
+        if row is None:
+            today = date.today()
+            return self.portfolio_row(today, self.collect(today).values())
+        return {column: getattr(row, column) for column in ('fecha',) + SUM_METRICS + AVG_METRICS}
+
+    @staticmethod
+    def _bucket(column, interval):
+        """Inicio del período (día, semana desde el lunes o mes) de una fecha"""
+        if db.session.get_bind().dialect.name == 'sqlite':
+            if interval == 'week':
+                return func.date(column, 'weekday 0', '-6 days')
+            if interval == 'month':
+                return func.strftime('%Y-%m-01', column)
+            return func.date(column)
+        return cast(func.date_trunc(interval, column), Date)
+
+    def trend(self, desde, hasta, interval='day', proyecto_id=None, cliente_id=None):
+        """Serie entre dos fechas reducida al intervalo: cada período toma su último día registrado"""
+        if interval not in INTERVALS:
+            raise ValueError(f"Intervalo inválido. Opciones: {', '.join(INTERVALS)}")
+        if proyecto_id is not None:
+            scope = PortfolioSnapshot.proyecto_id == proyecto_id
+        elif cliente_id is not None:
+            scope = (PortfolioSnapshot.cliente_id == cliente_id) & PortfolioSnapshot.proyecto_id.isnot(None)
+        else:
+            scope = PortfolioSnapshot.proyecto_id.is_(None)
+
+        daily = select(
+            PortfolioSnapshot.fecha,
+            *[func.sum(getattr(PortfolioSnapshot, metric)).label(metric) for metric in SUM_METRICS],
+            *[func.avg(getattr(PortfolioSnapshot, metric)).label(metric) for metric in AVG_METRICS]
+        ).where(scope, PortfolioSnapshot.fecha.between(desde, hasta)).group_by(PortfolioSnapshot.fecha).subquery()
+        bucket = self._bucket(daily.c.fecha, interval)
+        closing = select(bucket.label('periodo'), func.max(daily.c.fecha).label('fecha')).group_by(bucket).subquery()
+
+        series = []
+        for row in db.session.execute(
+            select(closing.c.periodo, daily).join(daily, daily.c.fecha == closing.c.fecha).order_by(closing.c.periodo)
+        ).mappings():
+            values = {metric: round(float(row[metric] or 0), 2) for metric in SUM_METRICS + AVG_METRICS}
+            series.append(dict(values, periodo=str(row['periodo'])[:10], fecha=str(row['fecha'])[:10], **derived_metrics(values)))
+        return series
+
+    @staticmethod
+    def default_range(days=90):
+        hasta = date.today()
+        return hasta - timedelta(days=days), hasta
+
+# Instancia global del servicio
+portfolio_snapshots = PortfolioSnapshotService()
@@ -0,0 +1,231 @@
+import threading
+import time
+from datetime import datetime
+from itertools import chain
+from sqlalchemy import bindparam, case, delete, event, func, inspect, or_, select, true, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from src.models.user import db
+from src.models.project import Proyecto, EstadoProyecto
+from src.models.kpi import KPI
+from src.models.riesgo import Riesgo
+from src.models.recurso import Recurso
+from src.models.portfolio_summary import PortfolioSummary
+from src.services.portfolio_aggregates import IMPACTOS_ALTOS
+
+# Atributos que afectan el resumen; otros cambios (p. ej. valor_actual de un KPI) no lo recalculan
+TRACKED_ATTRIBUTES = {
+    Proyecto: ('cliente_id', 'estado', 'presupuesto_estimado', 'presupuesto_real'),
+    KPI: ('proyecto_id', 'activo'),
+    Riesgo: ('proyecto_id', 'activo', 'impacto'),
+    Recurso: ('proyecto_id', 'activo'),
+}
+
+SUMMARY_COLUMNS = ('total_proyectos', 'proyectos_activos', 'proyectos_completados', 'presupuesto_total',
+                   'presupuesto_gastado', 'total_kpis', 'riesgos_altos', 'total_recursos')
+
+class PortfolioSummaryService:
+    """Mantiene la tabla portfolio_summary (una fila por cliente) a partir de los eventos de flush.
+
+    Cada flush que toca proyectos, KPIs, riesgos o recursos recalcula solo las filas de
+    los clientes afectados, bloqueándolas antes de leer las tablas base: dos escrituras
+    del mismo cliente se serializan en su fila y las de clientes distintos no se esperan.
+    El total global se suma al leer. Los UPDATE/DELETE masivos del ORM se recalculan en
+    do_orm_execute; los INSERT masivos llaman a refresh() y flask reconcile-portfolio
+    reconstruye la tabla.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reconciled_at = None
+        self.refreshes = 0
+        self.reconciles = 0
+
+    @staticmethod
+    def _attribute_values(obj, key):
+        """Valor actual y anterior de un atributo sin recargar el objeto"""
+        state = inspect(obj)
+        history = state.attrs[key].history
+        values = set(history.added) | set(history.unchanged) | set(history.deleted)
+        if not values and not state.deleted and not state.was_deleted:
+            values.add(getattr(obj, key))
+        return values
+
+    def after_flush(self, session, flush_context):
+        cliente_ids = set()
+        proyecto_ids = set()
+        for obj in chain(session.new, session.dirty, session.deleted):
+            tracked = TRACKED_ATTRIBUTES.get(type(obj))
+            if tracked is None:
+                continue
+            if obj in session.dirty and not any(inspect(obj).attrs[key].history.has_changes() for key in tracked):
+                continue
+            if isinstance(obj, Proyecto):
+                cliente_ids.update(self._attribute_values(obj, 'cliente_id'))
+            elif isinstance(obj, (KPI, Riesgo, Recurso)):
+                proyecto_ids.update(self._attribute_values(obj, 'proyecto_id'))
+        proyecto_ids.discard(None)
+        if proyecto_ids:
+            cliente_ids.update(session.execute(
+                select(Proyecto.cliente_id).where(Proyecto.id.in_(proyecto_ids))
+            ).scalars())
+        cliente_ids.discard(None)
+        if cliente_ids:
+            self.refresh(cliente_ids, session.connection())
+
+    def _affected_clientes(self, session, model, condition):
+        """Clientes de las filas que cumplen la condición de un UPDATE/DELETE masivo"""
+        statement = select(Proyecto.cliente_id).distinct()
+        if model is not Proyecto:
+            statement = statement.join(model, model.proyecto_id == Proyecto.id)
+        if condition is not None:
+            statement = statement.where(condition)
+        return set(session.execute(statement).scalars())
+
+    def do_orm_execute(self, orm_execute_state):
+        """UPDATE/DELETE masivos del ORM (Query.update, delete(modelo)) no pasan por el flush"""
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete) or orm_execute_state.bind_mapper is None:
+            return None
+        model = orm_execute_state.bind_mapper.class_
+        tracked = TRACKED_ATTRIBUTES.get(model)
+        if tracked is None:
+            return None
+        statement = orm_execute_state.statement
+        parameters = orm_execute_state.parameters
+        if isinstance(parameters, list):
+            # UPDATE por clave primaria (executemany): solo si cambia un atributo que afecta el resumen
+            if not any(key in tracked for row in parameters for key in row):
+                return None
+            condition = model.id.in_([row['id'] for row in parameters])
+        else:
+            condition = statement.whereclause
+
+        session = orm_execute_state.session
+        cliente_ids = self._affected_clientes(session, model, condition)
+        result = orm_execute_state.invoke_statement()
+        if orm_execute_state.is_update:
+            # La condición puede dejar de cumplirse después del UPDATE; también cuentan los clientes de destino
+            cliente_ids |= self._affected_clientes(session, model, condition)
+        cliente_ids.discard(None)
+        if cliente_ids:
+            self.refresh(cliente_ids, session.connection())
+        return result
+
+    def _aggregate(self, connection, condition):
+        """Totales por cliente con una consulta GROUP BY por tabla"""
+        totals = {}
+        for cliente_id, *values in connection.execute(
+            select(
+                Proyecto.cliente_id,
+                func.count(Proyecto.id),
+                func.coalesce(func.sum(case((Proyecto.estado == EstadoProyecto.ACTIVO, 1), else_=0)), 0),
+                func.coalesce(func.sum(case((Proyecto.estado == EstadoProyecto.COMPLETADO, 1), else_=0)), 0),
+                func.coalesce(func.sum(Proyecto.presupuesto_estimado), 0),
+                func.coalesce(func.sum(Proyecto.presupuesto_real), 0)
+            ).where(condition).group_by(Proyecto.cliente_id)
+        ):
+            totals[cliente_id] = dict(zip(SUMMARY_COLUMNS, values), total_kpis=0, riesgos_altos=0, total_recursos=0)
+
+        for column, model, extra in (
+            ('total_kpis', KPI, KPI.activo == True),
+            ('riesgos_altos', Riesgo, (Riesgo.activo == True) & Riesgo.impacto.in_(IMPACTOS_ALTOS)),
+            ('total_recursos', Recurso, Recurso.activo == True),
+        ):
+            for cliente_id, count in connection.execute(
+                select(Proyecto.cliente_id, func.count(model.id))
+                .join(Proyecto, model.proyecto_id == Proyecto.id)
+                .where(condition, extra)
+                .group_by(Proyecto.cliente_id)
+            ):
+                totals[cliente_id][column] = count
+        return totals
+
+    @staticmethod
+    def _lock_rows(connection, cliente_ids):
+        """Crea las filas que falten (INSERT ... ON CONFLICT DO NOTHING) y las bloquea en orden de cliente"""
+        dialect = postgresql if connection.dialect.name == 'postgresql' else sqlite
+        connection.execute(
+            dialect.insert(PortfolioSummary).on_conflict_do_nothing(index_elements=['cliente_id']),
+            [{'cliente_id': cliente_id} for cliente_id in cliente_ids]
+        )
+        connection.execute(
+            select(PortfolioSummary.id).where(PortfolioSummary.cliente_id.in_(cliente_ids))
+            .order_by(PortfolioSummary.cliente_id).with_for_update()
+        ).all()
+
+    def _write(self, connection, cliente_ids, totals):
+        """Actualiza las filas ya bloqueadas de los clientes con un UPDATE executemany"""
+        now = datetime.utcnow()
+        connection.execute(
+            update(PortfolioSummary).where(PortfolioSummary.cliente_id == bindparam('b_cliente_id')),
+            [dict(totals.get(cliente_id) or dict.fromkeys(SUMMARY_COLUMNS, 0),
+                  b_cliente_id=cliente_id, fecha_actualizacion=now)
+             for cliente_id in cliente_ids]
+        )
+
+    def refresh(self, cliente_ids, connection=None):
+        """Recalcula las filas de los clientes indicados dentro de la transacción en curso"""
+        cliente_ids = sorted(cliente_ids)
+        if not cliente_ids:
+            return
+        connection = connection or db.session.connection()
+        self._lock_rows(connection, cliente_ids)
+        totals = self._aggregate(connection, Proyecto.cliente_id.in_(cliente_ids))
+        self._write(connection, cliente_ids, totals)
+        with self._lock:
+            self.refreshes += 1
+
+    def reconcile(self):
+        """Reconstruye la tabla completa desde las tablas base (flask reconcile-portfolio)"""
+        try:
+            connection = db.session.connection()
+            totals = self._aggregate(connection, true())
+            # Clientes sin proyectos y la antigua fila global (cliente_id NULL)
+            connection.execute(delete(PortfolioSummary).where(
+                or_(PortfolioSummary.cliente_id.is_(None), PortfolioSummary.cliente_id.notin_(list(totals)))
+            ))
+            if totals:
+                self._lock_rows(connection, sorted(totals))
+                self._write(connection, sorted(totals), totals)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        with self._lock:
+            self._reconciled_at = time.time()
+            self.reconciles += 1
+        return len(totals)
+
+    def get(self, cliente_id=None):
+        """Totales de un cliente (una fila) o del portafolio global (suma de las filas por cliente)"""
+        if cliente_id is None:
+            row = db.session.execute(
+                select(*[func.coalesce(func.sum(getattr(PortfolioSummary, column)), 0) for column in SUMMARY_COLUMNS])
+                .where(PortfolioSummary.cliente_id.isnot(None))
+            ).first()
+        else:
+            row = db.session.execute(
+                select(*[getattr(PortfolioSummary, column) for column in SUMMARY_COLUMNS])
+                .where(PortfolioSummary.cliente_id == cliente_id)
+            ).first()
+        values = dict(zip(SUMMARY_COLUMNS, row)) if row else dict.fromkeys(SUMMARY_COLUMNS, 0)
+        return PortfolioSummary(**values).to_dict()
+
+    def clear(self):
+        with self._lock:
+            self._reconciled_at = None
+            self.refreshes = 0
+            self.reconciles = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'refreshes': self.refreshes,
+                'reconciles': self.reconciles,
+                'last_reconcile': datetime.utcfromtimestamp(self._reconciled_at).isoformat() if self._reconciled_at else None
+            }
+
+# Instancia global del servicio
+portfolio_summary = PortfolioSummaryService()
+event.listen(Session, 'after_flush', portfolio_summary.after_flush)
+event.listen(Session, 'do_orm_execute', portfolio_summary.do_orm_execute)
@@ -0,0 +1,79 @@
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# Instantánea de solo lectura del usuario autenticado
+Principal = namedtuple('Principal', ['id', 'rol', 'cliente_id', 'activo'])
+
+class PrincipalCache:
+    """Caché LRU por worker de los usuarios autenticados, con expiración"""
+
+    def __init__(self, max_size=None, ttl=None):
+        self.max_size = max_size or int(os.environ.get('PRINCIPAL_CACHE_SIZE', 1024))
+        self.ttl = ttl or int(os.environ.get('PRINCIPAL_CACHE_TTL', 300))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def snapshot(user):
+        """Construye la instantánea a partir de un modelo User"""
+        return Principal(id=user.id, rol=user.rol, cliente_id=user.cliente_id, activo=user.activo)
+
+    def get(self, user_id):
+        """Obtiene el principal en caché o None si no existe o expiró"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, principal, token_exp=None):
+        """Guarda el principal; nunca vive más allá del exp del token"""
+        expires_at = time.time() + self.ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        with self._lock:
+            self._entries[principal.id] = (principal, expires_at)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """Elimina un usuario de la caché tras modificarlo"""
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+
+    def stats(self):
+        """Contadores de aciertos/fallos para monitoreo"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_ratio': round(self.hits / total, 4) if total else 0
+            }
+
+# Instancia global del servicio
+principal_cache = PrincipalCache()
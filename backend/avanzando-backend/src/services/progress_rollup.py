@@ -0,0 +1,67 @@
+import os
+from sqlalchemy import case, func, select, update
+from src.models.user import db
+from src.models.project import Proyecto, Fase, TipoFase
+
+def parse_pesos(raw):
+    """Interpreta pesos por tipo de fase en formato 'inicio:1,ejecucion:3'"""
+    pesos = {tipo: 1.0 for tipo in TipoFase}
+    for item in (raw or '').split(','):
+        if not item.strip():
+            continue
+        nombre, _, valor = item.partition(':')
+        tipo = TipoFase(nombre.strip())
+        peso = float(valor)
+        if peso < 0:
+            raise ValueError(f'Peso negativo para la fase {tipo.value}')
+        pesos[tipo] = peso
+    return pesos
+
+class ProgressRollupService:
+    """Mantiene Proyecto.progreso_general como promedio ponderado del avance de sus fases"""
+
+    def __init__(self, pesos=None):
+        self.pesos = pesos or parse_pesos(os.environ.get('PESOS_FASE'))
+
+    def _peso_expr(self):
+        """Peso de cada fase como expresión SQL según su tipo"""
+        return case(*[(Fase.tipo == tipo, peso) for tipo, peso in self.pesos.items()], else_=1.0)
+
+    def _progreso_expr(self):
+        """Subconsulta correlacionada con el progreso ponderado de un proyecto"""
+        peso = self._peso_expr()
+        return select(
+            func.coalesce(func.sum(peso * func.coalesce(Fase.avance, 0)) / func.nullif(func.sum(peso), 0), 0)
+        ).where(Fase.proyecto_id == Proyecto.id).scalar_subquery()
+
+    def apply_delta(self, fase, avance_anterior):
+        """Aplica en el proyecto el cambio de avance de una fase sin recorrer sus fases.
+
+        Se ejecuta como UPDATE progreso_general = progreso_general + delta, atómico
+        frente a avances concurrentes de otras fases del mismo proyecto.
+        """
+        diferencia = (fase.avance or 0) - (avance_anterior or 0)
+        if not diferencia:
+            return
+        peso_total = db.session.query(func.sum(self._peso_expr())).filter(Fase.proyecto_id == fase.proyecto_id).scalar()
+        if not peso_total:
+            return
+        delta = self.pesos.get(fase.tipo, 1.0) * diferencia / peso_total
+        db.session.execute(
+            update(Proyecto)
+            .where(Proyecto.id == fase.proyecto_id)
+            .values(progreso_general=Proyecto.progreso_general + delta)
+            .execution_options(synchronize_session='fetch')
+        )
+
+    def recompute(self, proyecto_ids=None):
+        """Recalcula el progreso desde las fases con un único UPDATE; retorna las filas afectadas"""
+        stmt = update(Proyecto).values(progreso_general=self._progreso_expr())
+        if proyecto_ids is not None:
+            stmt = stmt.where(Proyecto.id.in_(proyecto_ids))
+        result = db.session.execute(stmt.execution_options(synchronize_session=False))
+        db.session.commit()
+        return result.rowcount
+
+# Instancia global del servicio
+progress_rollup = ProgressRollupService()
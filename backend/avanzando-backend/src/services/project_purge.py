@@ -0,0 +1,220 @@
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import and_, delete, select, or_, update
+from src.models.user import db
+from src.models.purge_job import PurgeJob, EstadoPurga
+from src.models.project import Proyecto, Fase
+from src.models.kpi import KPI
+from src.models.kpi_medicion import KPIMedicion
+from src.models.riesgo import Riesgo
+from src.models.recurso import Recurso
+from src.models.documento import Documento
+from src.models.ai_prediction import AIPrediction
+from src.models.liquidacion import Liquidacion, DetalleGasto, RegistroHoras
+from src.services.portfolio_summary import portfolio_summary
+from src.services.search_index import search_index
+
+class ProjectPurgeService:
+    """Eliminación de proyectos y sus dependientes con DELETE basados en conjuntos.
+
+    Las llaves foráneas declaran ON DELETE CASCADE, pero las sentencias borran
+    explícitamente cada tabla hija para no depender de que el motor las aplique
+    (SQLite sin PRAGMA foreign_keys, esquemas creados antes del cambio).
+    Nunca se cargan filas en la sesión solo para borrarlas.
+    """
+
+    def __init__(self, batch_size=None, max_jobs=None, timeout=None):
+        self.batch_size = batch_size or int(os.environ.get('PURGE_BATCH_SIZE', 1000))
+        self.max_jobs = max_jobs or int(os.environ.get('PURGE_MAX_JOBS', 100))
+        # Segundos tras los cuales un trabajo en ejecución se considera abandonado y se puede reclamar
+        self.timeout = timeout or int(os.environ.get('PURGE_JOB_TIMEOUT', 3600))
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='project-purge')
+        self._futures = OrderedDict()  # Solo de los trabajos lanzados por este proceso (para wait)
+        self._lock = threading.Lock()
+
+    def _targets(self, proyecto_ids):
+        """(modelo, condición) en orden de dependencias: nietos, hijos y por último proyectos"""
+        liquidaciones = select(Liquidacion.id).where(Liquidacion.proyecto_id.in_(proyecto_ids))
+        recursos = select(Recurso.id).where(Recurso.proyecto_id.in_(proyecto_ids))
+        return [
+            (DetalleGasto, DetalleGasto.liquidacion_id.in_(liquidaciones)),
+            (RegistroHoras, or_(RegistroHoras.liquidacion_id.in_(liquidaciones), RegistroHoras.recurso_id.in_(recursos))),
+            (Liquidacion, Liquidacion.proyecto_id.in_(proyecto_ids)),
+            (Documento, Documento.proyecto_id.in_(proyecto_ids)),
+            (AIPrediction, AIPrediction.project_id.in_(proyecto_ids)),
+            (KPIMedicion, KPIMedicion.kpi_id.in_(select(KPI.id).where(KPI.proyecto_id.in_(proyecto_ids)))),
+            (KPI, KPI.proyecto_id.in_(proyecto_ids)),
+            (Riesgo, Riesgo.proyecto_id.in_(proyecto_ids)),
+            (Recurso, Recurso.proyecto_id.in_(proyecto_ids)),
+            (Fase, Fase.proyecto_id.in_(proyecto_ids)),
+            (Proyecto, Proyecto.id.in_(proyecto_ids)),
+        ]
+
+    @staticmethod
+    def _cliente_ids(proyecto_ids):
+        """Clientes afectados, para refrescar portfolio_summary tras los DELETE masivos"""
+        return set(db.session.execute(
+            select(Proyecto.cliente_id).where(Proyecto.id.in_(proyecto_ids)).distinct()
+        ).scalars())
+
+    def purge(self, proyecto_ids):
+        """Elimina los proyectos en una sola transacción; retorna filas borradas por tabla"""
+        proyecto_ids = list(proyecto_ids)
+        deleted = {}
+        try:
+            cliente_ids = self._cliente_ids(proyecto_ids)
+            for model, condition in self._targets(proyecto_ids):
+                result = db.session.execute(
+                    delete(model).where(condition).execution_options(synchronize_session=False)
+                )
+                deleted[model.__tablename__] = result.rowcount
+            portfolio_summary.refresh(cliente_ids)
+            search_index.remove_projects(proyecto_ids)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        db.session.expire_all()
+        return deleted
+
+    def purge_in_batches(self, proyecto_ids, on_progress=None):
+        """Elimina por lotes con commit entre lotes para no retener bloqueos largos"""
+        proyecto_ids = list(proyecto_ids)
+        deleted = {}
+        cliente_ids = self._cliente_ids(proyecto_ids)
+        for model, condition in self._targets(proyecto_ids):
+            total = 0
+            while True:
+                batch = select(model.id).where(condition).limit(self.batch_size)
+                try:
+                    result = db.session.execute(
+                        delete(model).where(model.id.in_(batch)).execution_options(synchronize_session=False)
+                    )
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    raise
+                total += result.rowcount
+                if on_progress:
+                    on_progress(model.__tablename__, total)
+                if result.rowcount < self.batch_size:
+                    break
+            deleted[model.__tablename__] = total
+        try:
+            portfolio_summary.refresh(cliente_ids)
+            search_index.remove_projects(proyecto_ids)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        db.session.expire_all()
+        return deleted
+
+    def submit(self, app, proyecto_ids, user_id=None):
+        """Registra una purga asíncrona en purge_jobs, la lanza en este proceso y retorna el id del trabajo.
+
+        El estado vive en la tabla, así que cualquier worker de gunicorn puede consultarlo,
+        y flask purge-worker retoma los trabajos que quedaron pendientes o abandonados.
+        """
+        job_id = uuid.uuid4().hex
+        db.session.add(PurgeJob(
+            id=job_id, solicitado_por=user_id, proyecto_ids=','.join(str(proyecto_id) for proyecto_id in proyecto_ids),
+            estado=EstadoPurga.PENDIENTE, eliminados={}
+        ))
+        db.session.commit()
+        future = self._executor.submit(self._run, app, job_id)
+        with self._lock:
+            self._futures[job_id] = future
+            while len(self._futures) > self.max_jobs:
+                self._futures.popitem(last=False)
+        return job_id
+
+    def _claimable(self):
+        """Pendientes, o en ejecución desde hace más de timeout segundos (proceso caído)"""
+        stale = datetime.utcnow() - timedelta(seconds=self.timeout)
+        return or_(
+            PurgeJob.estado == EstadoPurga.PENDIENTE,
+            and_(PurgeJob.estado == EstadoPurga.EJECUTANDO, PurgeJob.fecha_inicio < stale)
+        )
+
+    def claim(self, job_id=None):
+        """Reclama el trabajo indicado o el disponible más antiguo; el UPDATE condicional evita que dos procesos lo tomen"""
+        while True:
+            candidate = job_id or db.session.execute(
+                select(PurgeJob.id).where(self._claimable()).order_by(PurgeJob.fecha_creacion).limit(1)
+            ).scalar()
+            if candidate is None:
+                db.session.commit()
+                return None
+            claimed = db.session.execute(
+                update(PurgeJob)
+                .where(PurgeJob.id == candidate, self._claimable())
+                .values(estado=EstadoPurga.EJECUTANDO, fecha_inicio=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                return candidate
+            if job_id is not None:
+                return None
+
+    def _update_job(self, job_id, **values):
+        db.session.execute(
+            update(PurgeJob).where(PurgeJob.id == job_id).values(**values).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    def process(self, job_id):
+        """Ejecuta un trabajo ya reclamado; el progreso se guarda tras cada lote confirmado"""
+        proyecto_ids = [int(proyecto_id) for proyecto_id in db.session.execute(
+            select(PurgeJob.proyecto_ids).where(PurgeJob.id == job_id)
+        ).scalar().split(',')]
+        deleted = {}
+
+        def on_progress(table, total):
+            deleted[table] = total
+            self._update_job(job_id, eliminados=dict(deleted))
+
+        try:
+            self.purge_in_batches(proyecto_ids, on_progress)
+            self._update_job(job_id, estado=EstadoPurga.COMPLETADA, eliminados=deleted, fecha_fin=datetime.utcnow())
+        except Exception as e:
+            db.session.rollback()
+            self._update_job(job_id, estado=EstadoPurga.FALLIDA, error=str(e), fecha_fin=datetime.utcnow())
+
+    def _run(self, app, job_id):
+        with app.app_context():
+            try:
+                if self.claim(job_id):
+                    self.process(job_id)
+            finally:
+                db.session.remove()
+
+    def run_once(self):
+        """Procesa el siguiente trabajo pendiente o abandonado; retorna False si no hay ninguno"""
+        job_id = self.claim()
+        if job_id is None:
+            return False
+        self.process(job_id)
+        return True
+
+    def get_job(self, job_id):
+        """Estado serializable de un trabajo de purga o None si no existe"""
+        job = db.session.execute(
+            select(PurgeJob).where(PurgeJob.id == job_id).execution_options(populate_existing=True)
+        ).scalar_one_or_none()
+        return job.to_dict() if job else None
+
+    def wait(self, job_id, timeout=None):
+        """Espera a que termine un trabajo lanzado por este proceso (usado en pruebas y comandos)"""
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            future.result(timeout)
+
+# Instancia global del servicio
+project_purge = ProjectPurgeService()
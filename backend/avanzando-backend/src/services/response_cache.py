@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from src.models.project import Proyecto
+from src.models.kpi import KPI
+from src.models.riesgo import Riesgo
+from src.models.recurso import Recurso
+
+try:
+    import redis
+except ImportError:  # Dependencia opcional: solo necesaria con el backend redis
+    redis = None
+
+# Modelos cuyo cambio invalida las respuestas del portafolio
+VERSIONED_MODELS = (Proyecto, KPI, Riesgo, Recurso)
+
+# Filtros cuyo valor por defecto equivale a no filtrar; se omiten de la clave
+DEFAULT_FILTERS = {'status': 'all', 'client': 'all', 'budget': 'all'}
+
+# Filtros de texto libre: los espacios repetidos no cambian el resultado
+TEXT_FILTERS = ('search',)
+
+# Errores del backend que degradan a un fallo de caché en lugar de romper la petición
+BACKEND_ERRORS = (redis.RedisError,) if redis else ()
+
+class LRUCacheBackend:
+    """Backend en el proceso: LRU con expiración y contador de versión local al worker"""
+
+    name = 'memory'
+
+    def __init__(self, max_size=None, ttl=None):
+        self.max_size = max_size or int(os.environ.get('PORTFOLIO_CACHE_SIZE', 256))
+        self.ttl = ttl or int(os.environ.get('PORTFOLIO_CACHE_TTL', 60))
+        self._entries = OrderedDict()
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def version(self):
+        with self._lock:
+            return self._version
+
+    def bump(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()  # Las entradas de versiones anteriores ya no se pueden leer
+
+    def size(self):
+        with self._lock:
+            return len(self._entries)
+
+class RedisCacheBackend:
+    """Backend compartido entre workers: el contador de versión es un INCR en Redis"""
+
+    name = 'redis'
+
+    def __init__(self, client=None, url=None, prefix='portfolio-cache', ttl=None):
+        if client is None:
+            if redis is None:
+                raise RuntimeError('El backend redis de la caché requiere el paquete redis')
+            client = redis.Redis.from_url(url or os.environ.get('REDIS_URL', 'redis://localhost:6379/0'))
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl or int(os.environ.get('PORTFOLIO_CACHE_TTL', 60))
+
+    def get(self, key):
+        return self.client.get(f'{self.prefix}:{key}')
+
+    def set(self, key, value):
+        self.client.set(f'{self.prefix}:{key}', value, ex=self.ttl)
+
+    def version(self):
+        return int(self.client.get(f'{self.prefix}:version') or 0)
+
+    def bump(self):
+        self.client.incr(f'{self.prefix}:version')
+
+    def size(self):
+        return None  # Las entradas expiran por TTL en Redis
+
+def create_cache_backend(backend=None):
+    """Crea el backend según PORTFOLIO_CACHE_BACKEND: memory o redis (por defecto si hay REDIS_URL y el paquete redis)"""
+    default = 'redis' if redis is not None and os.environ.get('REDIS_URL') else 'memory'
+    backend = backend or os.environ.get('PORTFOLIO_CACHE_BACKEND', default)
+    if backend == 'memory':
+        return LRUCacheBackend()
+    if backend == 'redis':
+        return RedisCacheBackend()
+    raise ValueError(f'Backend de caché desconocido: {backend}')
+
+class ResponseCache:
+    """Caché de respuestas del portafolio.
+
+    La clave combina la versión de datos, el alcance del usuario y los filtros
+    normalizados. La versión sube al confirmar una transacción que modificó proyectos,
+    KPIs, riesgos o recursos (por flush o por DML masivo del ORM). Con el backend
+    redis la versión es compartida y ningún worker sirve respuestas anteriores al
+    último commit; con el backend memory la versión es local a cada worker, así que
+    un worker puede servir una respuesta anterior a un commit hecho en otro hasta
+    que expire (PORTFOLIO_CACHE_TTL).
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or create_cache_backend()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bumps = 0
+        self.errors = 0
+
+    @staticmethod
+    def normalize(params):
+        """Filtros como tupla ordenada, sin valores vacíos ni por defecto y con el texto libre sin espacios repetidos"""
+        normalized = {}
+        for name, value in params.items():
+            value = str(value)
+            if name in TEXT_FILTERS:
+                value = ' '.join(value.split())
+            if value and value != DEFAULT_FILTERS.get(name):
+                normalized[name] = value
+        return tuple(sorted(normalized.items()))
+
+    def lookup(self, scope, params):
+        """(clave, (cuerpo, etag) o None); la clave fija la versión leída antes de consultar los datos"""
+        try:
+            version = self.backend.version()
+            raw = json.dumps([list(scope), self.normalize(params)])
+            key = f'v{version}:' + hashlib.sha1(raw.encode('utf-8')).hexdigest()
+            cached = self.backend.get(key)
+        except BACKEND_ERRORS:
+            with self._lock:
+                self.errors += 1
+            return None, None
+        with self._lock:
+            if cached is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if cached is None:
+            return key, None
+        if isinstance(cached, bytes):
+            cached = cached.decode('utf-8')
+        etag, body = cached.split('\n', 1)
+        return key, (body, etag)
+
+    def store(self, key, body, etag):
+        if key is None:
+            return
+        try:
+            self.backend.set(key, f'{etag}\n{body}')
+        except BACKEND_ERRORS:
+            with self._lock:
+                self.errors += 1
+
+    def bump(self):
+        try:
+            self.backend.bump()
+        except BACKEND_ERRORS:
+            with self._lock:
+                self.errors += 1
+            return
+        with self._lock:
+            self.bumps += 1
+
+    def after_flush(self, session, flush_context):
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            if isinstance(obj, VERSIONED_MODELS) and (obj not in session.dirty or session.is_modified(obj)):
+                session.info['portfolio_cache_dirty'] = True
+                return
+
+    def do_orm_execute(self, orm_execute_state):
+        """INSERT/UPDATE/DELETE masivos del ORM (p. ej. alta por lotes y purga) no pasan por el flush"""
+        if orm_execute_state.is_select or orm_execute_state.bind_mapper is None:
+            return
+        if issubclass(orm_execute_state.bind_mapper.class_, VERSIONED_MODELS):
+            orm_execute_state.session.info['portfolio_cache_dirty'] = True
+
+    def after_commit(self, session):
+        if session.info.pop('portfolio_cache_dirty', False):
+            self.bump()
+
+    def after_rollback(self, session):
+        session.info.pop('portfolio_cache_dirty', None)
+
+    def clear(self):
+        self.bump()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.bumps = 0
+            self.errors = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'backend': self.backend.name,
+                'size': self.backend.size(),
+                'hits': self.hits,
+                'misses': self.misses,
+                'bumps': self.bumps,
+                'errors': self.errors,
+                'hit_ratio': round(self.hits / total, 4) if total else 0
+            }
+
+# Instancia global del servicio
+portfolio_cache = ResponseCache()
+event.listen(Session, 'after_flush', portfolio_cache.after_flush)
+event.listen(Session, 'do_orm_execute', portfolio_cache.do_orm_execute)
+event.listen(Session, 'after_commit', portfolio_cache.after_commit)
+event.listen(Session, 'after_rollback', portfolio_cache.after_rollback)
@@ -0,0 +1,243 @@
+import logging
+import re
+from itertools import chain
+from sqlalchemy import bindparam, column, event, inspect, select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from src.models.user import db
+from src.models.project import Proyecto
+from src.models.riesgo import Riesgo
+from src.models.documento import Documento
+
+logger = logging.getLogger(__name__)
+
+# entidad -> (código para la clave del índice, modelo)
+ENTIDADES = {
+    'proyectos': (1, Proyecto),
+    'riesgos': (2, Riesgo),
+    'documentos': (3, Documento),
+}
+
+# Atributos indexados; cambios en otros atributos no reindexan la fila
+INDEXED_ATTRIBUTES = {
+    Proyecto: ('nombre', 'descripcion'),
+    Riesgo: ('nombre', 'descripcion', 'plan_mitigacion', 'plan_contingencia', 'activo', 'proyecto_id'),
+    Documento: ('nombre', 'contenido', 'proyecto_id'),
+}
+
+SEARCH_DDL = {
+    'sqlite': [
+        # rowid = clave; las columnas UNINDEXED solo se almacenan
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+        "entidad UNINDEXED, entidad_id UNINDEXED, proyecto_id UNINDEXED, titulo, cuerpo, "
+        "tokenize = 'unicode61 remove_diacritics 2')",
+    ],
+    'postgresql': [
+        "CREATE TABLE IF NOT EXISTS search_index ("
+        "clave BIGINT PRIMARY KEY, entidad VARCHAR(20) NOT NULL, entidad_id INTEGER NOT NULL, "
+        "proyecto_id INTEGER NOT NULL, titulo TEXT, cuerpo TEXT, "
+        "vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('spanish', coalesce(titulo, '')), 'A') || "
+        "setweight(to_tsvector('spanish', coalesce(cuerpo, '')), 'B')) STORED)",
+        "CREATE INDEX IF NOT EXISTS ix_search_index_vector ON search_index USING GIN (vector)",
+        "CREATE INDEX IF NOT EXISTS ix_search_index_proyecto ON search_index (proyecto_id)",
+    ],
+}
+
+SEARCH_QUERY = {
+    'sqlite': (
+        "SELECT search_index.entidad, search_index.entidad_id, search_index.proyecto_id, search_index.titulo, "
+        "snippet(search_index, -1, '<mark>', '</mark>', '…', 16) AS fragmento, "
+        "-bm25(search_index, 0, 0, 0, 10.0, 1.0) AS score "
+        "FROM search_index JOIN proyectos ON proyectos.id = search_index.proyecto_id "
+        "WHERE search_index MATCH :q {filters} ORDER BY score DESC LIMIT :limit"
+    ),
+    'postgresql': (
+        "SELECT s.entidad, s.entidad_id, s.proyecto_id, s.titulo, "
+        "ts_headline('spanish', coalesce(s.cuerpo, s.titulo), query, 'StartSel=<mark>, StopSel=</mark>, MaxWords=16') AS fragmento, "
+        "ts_rank(s.vector, query) AS score "
+        "FROM search_index s CROSS JOIN websearch_to_tsquery('spanish', :q) AS query "
+        "JOIN proyectos ON proyectos.id = s.proyecto_id "
+        "WHERE s.vector @@ query {filters} ORDER BY score DESC LIMIT :limit"
+    ),
+}
+
+MATCH_IDS = {
+    'sqlite': "SELECT entidad_id FROM search_index WHERE search_index MATCH :q AND entidad = :entidad",
+    'postgresql': "SELECT entidad_id FROM search_index WHERE vector @@ websearch_to_tsquery('spanish', :q) AND entidad = :entidad",
+}
+
+def fts5_query(term):
+    """Convierte texto libre en una consulta FTS5 segura: términos entre comillas y prefijo en el último"""
+    tokens = re.findall(r'\w+', term.lower())
+    if not tokens:
+        raise ValueError('La búsqueda debe contener al menos una palabra')
+    return ' '.join(f'"{token}"' for token in tokens) + '*'
+
+class SearchIndexService:
+    """Índice de texto completo de proyectos, riesgos y documentos.
+
+    SQLite usa una tabla virtual FTS5 y PostgreSQL una columna tsvector con índice GIN;
+    ambas se crean junto con el esquema (create_all) y se mantienen en los eventos de flush.
+    Las escrituras masivas que no pasan por la unidad de trabajo llaman a reindex().
+    """
+
+    def __init__(self):
+        self.dialects = set()  # Motores donde el índice se creó correctamente
+
+    def available(self, connection=None):
+        connection = connection or db.session.connection()
+        return connection.dialect.name in self.dialects
+
+    @staticmethod
+    def _key_column(connection):
+        return 'rowid' if connection.dialect.name == 'sqlite' else 'clave'
+
+    def create_schema(self, target, connection, **kw):
+        """after_create del metadata: crea la tabla del índice si el motor lo soporta"""
+        statements = SEARCH_DDL.get(connection.dialect.name)
+        if statements is None:
+            logger.warning('Búsqueda de texto completo no soportada en %s', connection.dialect.name)
+            return
+        try:
+            for statement in statements:
+                connection.exec_driver_sql(statement)
+        except OperationalError as e:  # SQLite compilado sin FTS5
+            logger.warning('No se pudo crear el índice de búsqueda: %s', e)
+            return
+        self.dialects.add(connection.dialect.name)
+
+    def drop_schema(self, target, connection, **kw):
+        """before_drop del metadata: el índice no es una tabla del modelo"""
+        if connection.dialect.name in SEARCH_DDL:
+            connection.exec_driver_sql('DROP TABLE IF EXISTS search_index')
+
+    @staticmethod
+    def _key(obj):
+        """Clave del índice: id del objeto y código de su entidad"""
+        return obj.id * 4 + next(code for code, model in ENTIDADES.values() if isinstance(obj, model))
+
+    def _row(self, obj):
+        """Fila del índice para un objeto, o None si no debe indexarse"""
+        if isinstance(obj, Proyecto):
+            entidad, titulo, cuerpo, proyecto_id = 'proyectos', obj.nombre, obj.descripcion, obj.id
+        elif isinstance(obj, Riesgo):
+            if obj.activo is False:
+                return None
+            cuerpo = ' '.join(filter(None, (obj.descripcion, obj.plan_mitigacion, obj.plan_contingencia)))
+            entidad, titulo, proyecto_id = 'riesgos', obj.nombre, obj.proyecto_id
+        else:
+            entidad, titulo, cuerpo, proyecto_id = 'documentos', obj.nombre, obj.contenido, obj.proyecto_id
+        return {'clave': self._key(obj), 'entidad': entidad, 'entidad_id': obj.id,
+                'proyecto_id': proyecto_id, 'titulo': titulo, 'cuerpo': cuerpo}
+
+    def _write(self, connection, removed, rows):
+        key = self._key_column(connection)
+        if removed:
+            connection.execute(
+                text(f'DELETE FROM search_index WHERE {key} IN :claves').bindparams(bindparam('claves', expanding=True)),
+                {'claves': list(removed)}
+            )
+        if rows:
+            connection.execute(text(
+                f'INSERT INTO search_index ({key}, entidad, entidad_id, proyecto_id, titulo, cuerpo) '
+                'VALUES (:clave, :entidad, :entidad_id, :proyecto_id, :titulo, :cuerpo)'
+            ), rows)
+
+    def remove_projects(self, proyecto_ids, connection=None):
+        """Quita del índice los proyectos y todo lo que cuelga de ellos"""
+        connection = connection or db.session.connection()
+        if proyecto_ids and self.available(connection):
+            connection.execute(
+                text('DELETE FROM search_index WHERE proyecto_id IN :ids').bindparams(bindparam('ids', expanding=True)),
+                {'ids': list(proyecto_ids)}
+            )
+
+    def after_flush(self, session, flush_context):
+        connection = session.connection()
+        if not self.available(connection):
+            return
+        removed, rows, deleted_projects = set(), [], set()
+        for obj in chain(session.new, session.dirty, session.deleted):
+            tracked = INDEXED_ATTRIBUTES.get(type(obj))
+            if tracked is None:
+                continue
+            if obj in session.dirty and not any(inspect(obj).attrs[key].history.has_changes() for key in tracked):
+                continue
+            removed.add(self._key(obj))
+            if obj in session.deleted:
+                if isinstance(obj, Proyecto):
+                    deleted_projects.add(obj.id)
+                continue
+            row = self._row(obj)
+            if row:
+                rows.append(row)
+        self.remove_projects(deleted_projects, connection)
+        self._write(connection, removed, rows)
+
+    def reindex(self, entidad=None, ids=None, connection=None):
+        """Reconstruye el índice de una entidad (o de todas) desde las tablas base; retorna filas indexadas"""
+        connection = connection or db.session.connection()
+        if not self.available(connection):
+            return 0
+        if ids is None:
+            if entidad:
+                connection.execute(text('DELETE FROM search_index WHERE entidad = :entidad'), {'entidad': entidad})
+            else:
+                connection.exec_driver_sql('DELETE FROM search_index')
+        indexed = 0
+        for name in ([entidad] if entidad else ENTIDADES):
+            model = ENTIDADES[name][1]
+            statement = select(model)
+            if ids is not None:
+                statement = statement.where(model.id.in_(ids))
+            for partition in db.session.execute(statement.execution_options(yield_per=1000)).scalars().partitions():
+                rows = [row for row in map(self._row, partition) if row]
+                self._write(connection, [self._key(obj) for obj in partition], rows)
+                indexed += len(rows)
+        return indexed
+
+    def matching_ids(self, entidad, term):
+        """Subconsulta con los ids de la entidad que coinciden con el término (para filtros IN)"""
+        dialect = db.session.connection().dialect.name
+        query = fts5_query(term) if dialect == 'sqlite' else term
+        return text(MATCH_IDS[dialect]).bindparams(q=query, entidad=entidad).columns(column('entidad_id'))
+
+    def project_filter(self, term):
+        """Condición para filtrar proyectos por texto: índice si está disponible, ILIKE sobre el nombre si no"""
+        if self.available() and re.search(r'\w', term):
+            return Proyecto.id.in_(self.matching_ids('proyectos', term))
+        return Proyecto.nombre.ilike(f'%{term}%')
+
+    def search(self, term, entidades=None, proyecto_id=None, cliente_id=None, limit=20):
+        """Resultados ordenados por relevancia con un fragmento resaltado"""
+        connection = db.session.connection()
+        if not self.available(connection):
+            raise RuntimeError('La búsqueda de texto completo no está disponible en este motor de base de datos')
+        dialect = connection.dialect.name
+        alias = 'search_index' if dialect == 'sqlite' else 's'
+        params = {'q': fts5_query(term) if dialect == 'sqlite' else term, 'limit': limit}
+        filters = []
+        if entidades:
+            filters.append(f'AND {alias}.entidad IN :entidades')
+            params['entidades'] = list(entidades)
+        if proyecto_id is not None:
+            filters.append(f'AND {alias}.proyecto_id = :proyecto_id')
+            params['proyecto_id'] = proyecto_id
+        if cliente_id is not None:
+            filters.append('AND proyectos.cliente_id = :cliente_id')
+            params['cliente_id'] = cliente_id
+        statement = text(SEARCH_QUERY[dialect].format(filters=' '.join(filters)))
+        if entidades:
+            statement = statement.bindparams(bindparam('entidades', expanding=True))
+        return [
+            {'entidad': row.entidad, 'id': row.entidad_id, 'proyecto_id': row.proyecto_id, 'titulo': row.titulo,
+             'fragmento': row.fragmento, 'score': round(float(row.score), 4)}
+            for row in connection.execute(statement, params)
+        ]
+
+# Instancia global del servicio
+search_index = SearchIndexService()
+event.listen(db.metadata, 'after_create', search_index.create_schema)
+event.listen(db.metadata, 'before_drop', search_index.drop_schema)
+event.listen(Session, 'after_flush', search_index.after_flush)
@@ -0,0 +1,155 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+import jwt
+from flask import current_app
+from src.models.user import db
+from src.models.revoked_token import RevokedToken
+
+class TokenRevocadoError(jwt.InvalidTokenError):
+    """El token fue revocado (logout o revocación forzada)"""
+
+class RevocationBloomFilter:
+    """Filtro de Bloom compacto con los digests de tokens revocados"""
+
+    def __init__(self, size_bits=65536, hash_count=4):
+        self.size_bits = size_bits
+        self.hash_count = hash_count
+        self.bits = bytearray(size_bits // 8)
+
+    def _positions(self, digest):
+        raw = bytes.fromhex(digest)
+        for i in range(self.hash_count):
+            yield int.from_bytes(raw[i * 4:(i + 1) * 4], 'big') % self.size_bits
+
+    def add(self, digest):
+        for pos in self._positions(digest):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def might_contain(self, digest):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(digest))
+
+class TokenVerifier:
+    """Verificador JWT compartido con memoización de claims y revocación"""
+
+    def __init__(self, max_size=None, bloom_bits=None, refresh_seconds=None):
+        self.max_size = max_size or int(os.environ.get('TOKEN_CACHE_SIZE', 4096))
+        self.bloom_bits = bloom_bits or int(os.environ.get('REVOCATION_BLOOM_BITS', 65536))
+        self.refresh_seconds = refresh_seconds or int(os.environ.get('REVOCATION_REFRESH_SECONDS', 30))
+        self._claims = OrderedDict()
+        self._lock = threading.Lock()
+        self._bloom = RevocationBloomFilter(self.bloom_bits)
+        self._confirmed_revoked = set()
+        self._loaded_at = None
+        self.hits = 0
+        self.misses = 0
+        self.revocation_checks = 0
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def _refresh_if_stale(self):
+        """Reconstruye el filtro desde la tabla de tokens revocados vigentes"""
+        now = time.time()
+        if self._loaded_at is not None and now - self._loaded_at < self.refresh_seconds:
+            return
+        rows = db.session.query(RevokedToken.token_digest).filter(
+            RevokedToken.expires_at > datetime.utcnow()
+        ).all()
+        bloom = RevocationBloomFilter(self.bloom_bits)
+        for (digest,) in rows:
+            bloom.add(digest)
+        with self._lock:
+            self._bloom = bloom
+            self._confirmed_revoked = set()
+            self._loaded_at = now
+
+    def _is_revoked(self, digest):
+        self._refresh_if_stale()
+        if not self._bloom.might_contain(digest):
+            return False
+        if digest in self._confirmed_revoked:
+            return True
+        # Posible falso positivo: confirmar contra la base de datos
+        self.revocation_checks += 1
+        revoked = db.session.query(RevokedToken.id).filter_by(token_digest=digest).first() is not None
+        if revoked:
+            with self._lock:
+                self._confirmed_revoked.add(digest)
+        return revoked
+
+    def verify(self, token):
+        """Verifica el token y retorna sus claims; lanza errores de jwt"""
+        digest = self.digest(token)
+        if self._is_revoked(digest):
+            raise TokenRevocadoError('Token revocado')
+
+        now = time.time()
+        with self._lock:
+            entry = self._claims.get(digest)
+            if entry is not None:
+                if entry['exp'] <= now:
+                    del self._claims[digest]
+                    raise jwt.ExpiredSignatureError('Signature has expired')
+                self._claims.move_to_end(digest)
+                self.hits += 1
+                return dict(entry)
+            self.misses += 1
+
+        claims = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+        if 'exp' in claims:
+            with self._lock:
+                self._claims[digest] = claims
+                while len(self._claims) > self.max_size:
+                    self._claims.popitem(last=False)
+        return dict(claims)
+
+    def revoke(self, token, claims):
+        """Revoca el token hasta su expiración natural"""
+        digest = self.digest(token)
+        if not RevokedToken.query.filter_by(token_digest=digest).first():
+            db.session.add(RevokedToken(
+                token_digest=digest,
+                user_id=claims.get('user_id'),
+                expires_at=datetime.utcfromtimestamp(claims['exp'])
+            ))
+            db.session.commit()
+        with self._lock:
+            self._bloom.add(digest)
+            self._confirmed_revoked.add(digest)
+            self._claims.pop(digest, None)
+
+    def purge_expired(self):
+        """Elimina de la tabla los tokens revocados que ya expiraron"""
+        deleted = RevokedToken.query.filter(RevokedToken.expires_at <= datetime.utcnow()).delete()
+        db.session.commit()
+        self._loaded_at = None
+        return deleted
+
+    def clear(self):
+        with self._lock:
+            self._claims.clear()
+            self._bloom = RevocationBloomFilter(self.bloom_bits)
+            self._confirmed_revoked = set()
+            self._loaded_at = None
+            self.hits = 0
+            self.misses = 0
+            self.revocation_checks = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._claims),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'revocation_db_checks': self.revocation_checks,
+                'bloom_bits': self.bloom_bits
+            }
+
+# Instancia global del servicio
+token_verifier = TokenVerifier()
@@ -0,0 +1,110 @@
+import os
+from sqlalchemy import insert
+from src.models.user import db, User, UserRole
+from src.services.password_hasher import password_hasher
+from src.services.principal_cache import principal_cache
+
+DEFAULT_PASSWORD = 'defaultpassword123'
+
+class UserProvisioningService:
+    """Alta masiva de usuarios con hashing paralelo e inserciones por lotes"""
+
+    def __init__(self, chunk_size=None, max_rows=None):
+        self.chunk_size = chunk_size or int(os.environ.get('BULK_INSERT_CHUNK', 500))
+        self.max_rows = max_rows or int(os.environ.get('BULK_MAX_ROWS', 10000))
+
+    def _validate(self, rows):
+        """Valida cada fila y retorna (filas válidas, reporte de errores)"""
+        valid = []
+        results = {}
+        seen_emails = set()
+        for index, row in enumerate(rows):
+            if not isinstance(row, dict):
+                results[index] = {'row': index, 'email': None, 'status': 'error', 'error': 'Fila inválida'}
+                continue
+            email = (row.get('email') or '').strip()
+            if not row.get('nombre'):
+                results[index] = {'row': index, 'email': email, 'status': 'error', 'error': 'Nombre es requerido'}
+                continue
+            if not email:
+                results[index] = {'row': index, 'email': email, 'status': 'error', 'error': 'Email es requerido'}
+                continue
+            try:
+                rol = UserRole(row.get('rol') or 'recurso')
+            except ValueError:
+                results[index] = {'row': index, 'email': email, 'status': 'error', 'error': 'Rol inválido'}
+                continue
+            try:
+                cliente_id = int(row['cliente_id']) if row.get('cliente_id') else None
+            except (TypeError, ValueError):
+                results[index] = {'row': index, 'email': email, 'status': 'error', 'error': 'cliente_id inválido'}
+                continue
+            if email in seen_emails:
+                results[index] = {'row': index, 'email': email, 'status': 'error', 'error': 'Email duplicado en el lote'}
+                continue
+            seen_emails.add(email)
+            valid.append((index, {
+                'nombre': row['nombre'],
+                'email': email,
+                'rol': rol,
+                'cliente_id': cliente_id,
+                'password': row.get('password') or DEFAULT_PASSWORD
+            }))
+        return valid, results
+
+    def _existing_emails(self, emails):
+        """Consulta de unicidad basada en conjuntos"""
+        existing = set()
+        for start in range(0, len(emails), self.chunk_size):
+            chunk = emails[start:start + self.chunk_size]
+            existing.update(email for (email,) in db.session.query(User.email).filter(User.email.in_(chunk)))
+        return existing
+
+    def provision(self, rows):
+        """Crea los usuarios y retorna el reporte por fila"""
+        if len(rows) > self.max_rows:
+            raise ValueError(f'El lote excede el máximo de {self.max_rows} filas')
+
+        valid, results = self._validate(rows)
+
+        existing = self._existing_emails([data['email'] for _, data in valid])
+        pending = []
+        for index, data in valid:
+            if data['email'] in existing:
+                results[index] = {'row': index, 'email': data['email'], 'status': 'error', 'error': 'El email ya está registrado'}
+            else:
+                pending.append((index, data))
+
+        hashes = password_hasher.hash_many([data.pop('password') for _, data in pending])
+        for (_, data), password_hash in zip(pending, hashes):
+            data['password_hash'] = password_hash
+
+        try:
+            for start in range(0, len(pending), self.chunk_size):
+                chunk = pending[start:start + self.chunk_size]
+                created = db.session.execute(
+                    insert(User).returning(User.id, User.email),
+                    [data for _, data in chunk]
+                )
+                ids_by_email = {email: user_id for user_id, email in created}
+                for index, data in chunk:
+                    results[index] = {'row': index, 'email': data['email'], 'status': 'created', 'id': ids_by_email[data['email']]}
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        for result in results.values():
+            if result['status'] == 'created':
+                principal_cache.invalidate(result['id'])
+
+        report = [results[index] for index in sorted(results)]
+        return {
+            'total': len(rows),
+            'created': len([r for r in report if r['status'] == 'created']),
+            'failed': len([r for r in report if r['status'] == 'error']),
+            'results': report
+        }
+
+# Instancia global del servicio
+user_provisioning = UserProvisioningService()
@@ -0,0 +1,167 @@
+import os
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+# Caracteres de control no permitidos en XML 1.0
+_ILLEGAL_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+MAX_SHEET_NAME = 31
+
+def column_letter(index):
+    """0 -> A, 25 -> Z, 26 -> AA"""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+def _xml_text(value):
+    return escape(_ILLEGAL_XML.sub('', str(value)))
+
+class _ChunkSink:
+    """Destino de escritura no posicionable: acumula los bytes comprimidos hasta que se drenan"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        if self._chunks:
+            data = b''.join(self._chunks)
+            self._chunks = []
+            yield data
+
+class XlsxStreamWriter:
+    """Escritor Office Open XML (XLSX) en streaming, sin modelo de libro en memoria.
+
+    Cada hoja se escribe fila a fila dentro del zip. Los textos se deduplican en
+    sharedStrings.xml hasta max_shared_strings valores distintos; a partir de ahí se
+    escriben como inlineStr para que la memoria tenga un techo fijo.
+    """
+
+    def __init__(self, fileobj, max_shared_strings=None):
+        self.max_shared_strings = max_shared_strings or int(os.environ.get('XLSX_MAX_SHARED_STRINGS', 100000))
+        self._zip = zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_DEFLATED)
+        self._sheets = []
+        self._shared = {}
+        self._shared_count = 0
+
+    def _cell(self, ref, value):
+        if value is None or value == '':
+            return ''
+        if isinstance(value, bool):
+            return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+        if isinstance(value, (int, float)):
+            return f'<c r="{ref}"><v>{value!r}</v></c>'
+        text = str(value)
+        self._shared_count += 1
+        index = self._shared.get(text)
+        if index is None and len(self._shared) < self.max_shared_strings:
+            index = self._shared[text] = len(self._shared)
+        if index is not None:
+            return f'<c r="{ref}" t="s"><v>{index}</v></c>'
+        return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{_xml_text(text)}</t></is></c>'
+
+    def _row(self, number, values):
+        cells = ''.join(self._cell(f'{column_letter(i)}{number}', value) for i, value in enumerate(values))
+        return f'<row r="{number}">{cells}</row>'
+
+    def write_sheet(self, title, headers, batches):
+        """Escribe una hoja; batches es un iterable de listas de filas. Genera después de cada lote."""
+        index = len(self._sheets) + 1
+        name = _ILLEGAL_XML.sub('', title)[:MAX_SHEET_NAME]
+        self._sheets.append(name)
+        with self._zip.open(f'xl/worksheets/sheet{index}.xml', 'w', force_zip64=True) as part:
+            part.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                       b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            part.write(self._row(1, headers).encode('utf-8'))
+            number = 1
+            for batch in batches:
+                rows = []
+                for values in batch:
+                    number += 1
+                    rows.append(self._row(number, values))
+                part.write(''.join(rows).encode('utf-8'))
+                yield number - 1
+            part.write(b'</sheetData></worksheet>')
+
+    def close(self):
+        """Escribe las partes del libro (incluida la tabla de textos compartidos) y cierra el zip"""
+        sheets = ''.join(
+            f'<sheet name="{_xml_text(name)}" sheetId="{i}" r:id="rId{i}"/>' for i, name in enumerate(self._sheets, 1)
+        )
+        sheet_rels = ''.join(
+            f'<Relationship Id="rId{i}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{i}.xml"/>' for i in range(1, len(self._sheets) + 1)
+        )
+        extra = len(self._sheets)
+        sheet_types = ''.join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+            f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for i in range(1, len(self._sheets) + 1)
+        )
+
+        with self._zip.open('xl/sharedStrings.xml', 'w', force_zip64=True) as part:
+            part.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                       f'<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+                       f'count="{self._shared_count}" uniqueCount="{len(self._shared)}">'.encode('utf-8'))
+            for text in self._shared:
+                part.write(f'<si><t xml:space="preserve">{_xml_text(text)}</t></si>'.encode('utf-8'))
+            part.write(b'</sst>')
+        self._shared = {}
+
+        self._zip.writestr('xl/workbook.xml',
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets>{sheets}</sheets></workbook>')
+        self._zip.writestr('xl/_rels/workbook.xml.rels',
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'{sheet_rels}'
+            f'<Relationship Id="rId{extra + 1}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" Target="sharedStrings.xml"/>'
+            f'<Relationship Id="rId{extra + 2}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+            '</Relationships>')
+        self._zip.writestr('xl/styles.xml',
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+            '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+            '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+            '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+            '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+            '</styleSheet>')
+        self._zip.writestr('_rels/.rels',
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>')
+        self._zip.writestr('[Content_Types].xml',
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+            '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            f'{sheet_types}</Types>')
+        self._zip.close()
+
+def iter_xlsx(sheets, max_shared_strings=None):
+    """Genera los bytes de un XLSX a medida que se escriben; sheets: [(título, encabezados, lotes)]"""
+    sink = _ChunkSink()
+    writer = XlsxStreamWriter(sink, max_shared_strings)
+    for title, headers, batches in sheets:
+        for _ in writer.write_sheet(title, headers, batches):
+            yield from sink.drain()
+        yield from sink.drain()
+    writer.close()
+    yield from sink.drain()
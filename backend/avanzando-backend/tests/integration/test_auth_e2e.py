@@ -154,3 +154,35 @@ class TestAuthE2E:
         
         assert response.status_code == 400
 
+    
+    def test_logout_revokes_token(self, client):
+        """Prueba que el token deja de ser válido tras el logout"""
+        register_data = {
+            'nombre': 'Usuario Logout',
+            'email': 'logout@example.com',
+            'password': 'password123',
+            'rol': 'pm'
+        }
+        client.post('/api/auth/register',
+                   data=json.dumps(register_data),
+                   content_type='application/json')
+        
+        response = client.post('/api/auth/login',
+                             data=json.dumps({'email': 'logout@example.com', 'password': 'password123'}),
+                             content_type='application/json')
+        headers = {'Authorization': f"Bearer {response.get_json()['token']}"}
+        
+        # El token es válido (y queda memoizado)
+        response = client.get('/api/auth/profile', headers=headers)
+        assert response.status_code == 200
+        
+        response = client.post('/api/auth/logout', headers=headers)
+        assert response.status_code == 200
+        
+        # El token revocado se rechaza en todas las rutas protegidas
+        response = client.get('/api/auth/profile', headers=headers)
+        assert response.status_code == 401
+        assert response.get_json()['error'] == 'Token revocado'
+        
+        response = client.get('/api/projects', headers=headers)
+        assert response.status_code == 401
@@ -0,0 +1,303 @@
+import csv
+import io
+import os
+from datetime import date
+from src.models.user import User, UserRole, Cliente, db
+from src.models.project import Proyecto
+from src.models.kpi import KPI, TipoKPI
+from src.models.riesgo import Riesgo, TipoRiesgo, NivelProbabilidad, NivelImpacto
+from src.models.recurso import Recurso, TipoRecurso
+from src.models.liquidacion import Liquidacion, RegistroHoras
+
+class TestExportsE2E:
+    """Pruebas End-to-End de las exportaciones en streaming"""
+    
+    def seed(self, rows=3):
+        cliente = Cliente(nombre='Cliente Export')
+        usuario = User(nombre='Responsable Export', email='export@example.com', rol=UserRole.RECURSO, password_hash='x')
+        db.session.add_all([cliente, usuario])
+        db.session.flush()
+        for i in range(rows):
+            proyecto = Proyecto(nombre=f'Proyecto {i}', cliente_id=cliente.id, fecha_inicio=date(2024, 1, 1),
+                                presupuesto_estimado=1000 * (i + 1))
+            db.session.add(proyecto)
+            db.session.flush()
+            db.session.add(KPI(proyecto_id=proyecto.id, nombre=f'KPI {i}', tipo=TipoKPI.COSTO, valor_objetivo=10,
+                               unidad_medida='%', umbral_amarillo=5, umbral_rojo=8))
+            db.session.add(Riesgo(proyecto_id=proyecto.id, codigo=f'R-{i}', nombre='Riesgo', descripcion='d',
+                                  tipo=TipoRiesgo.TECNICO, probabilidad=NivelProbabilidad.MEDIA,
+                                  impacto=NivelImpacto.ALTO, responsable_id=usuario.id))
+            recurso = Recurso(proyecto_id=proyecto.id, nombre='Analista', tipo=TipoRecurso.HUMANO,
+                              cantidad_requerida=1, unidad_medida='h', usuario_asignado_id=usuario.id)
+            liquidacion = Liquidacion(proyecto_id=proyecto.id, periodo_inicio=date(2024, 1, 1),
+                                      periodo_fin=date(2024, 1, 31), creado_por=usuario.id)
+            db.session.add_all([recurso, liquidacion])
+            db.session.flush()
+            db.session.add(RegistroHoras(liquidacion_id=liquidacion.id, recurso_id=recurso.id, fecha=date(2024, 1, 15),
+                                         horas_trabajadas=8, tarifa_hora=50, total=400))
+        db.session.commit()
+    
+    def read_csv(self, response):
+        assert response.status_code == 200
+        assert response.is_streamed
+        return list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    
+    def test_streaming_csv_entities(self, client, auth_headers):
+        """Cada entidad se exporta como CSV en streaming con encabezados y una fila por registro"""
+        self.seed(3)
+        
+        rows = self.read_csv(client.get('/api/portfolio/export?format=csv', headers=auth_headers))
+        assert rows[0][:3] == ['ID', 'Nombre', 'Estado']
+        assert len(rows) == 4
+        assert rows[1][1:4] == ['Proyecto 0', 'activo', 'Cliente Export']
+        assert rows[1][6] == '0%'
+        
+        for entity in ('kpis', 'riesgos', 'recursos', 'horas'):
+            rows = self.read_csv(client.get(f'/api/portfolio/export?format=csv&entity={entity}', headers=auth_headers))
+            assert len(rows) == 4, entity
+        
+        rows = self.read_csv(client.get('/api/portfolio/export?format=csv&entity=horas&proyecto_id=1', headers=auth_headers))
+        assert len(rows) == 2
+        assert rows[1][3] == 'Analista'
+        assert float(rows[1][5]) == 8
+        
+        response = client.get('/api/portfolio/export?format=csv&entity=otra', headers=auth_headers)
+        assert response.status_code == 400
+    
+    def test_streaming_csv_batches(self, client, auth_headers):
+        """El CSV se emite en varios fragmentos, uno por lote del cursor"""
+        from src.services.export_streams import streaming_exporter
+        self.seed(5)
+        batch_size = streaming_exporter.batch_size
+        streaming_exporter.batch_size = 2
+        try:
+            chunks = list(streaming_exporter.iter_csv('proyectos'))
+        finally:
+            streaming_exporter.batch_size = batch_size
+        assert len(chunks) == 3
+        assert sum(chunk.count('\n') for chunk in chunks) == 6
+    
+    def test_streaming_json_and_ndjson(self, client, auth_headers):
+        """JSON se codifica por lotes y NDJSON se negocia con el header Accept"""
+        import json
+        self.seed(3)
+        
+        response = client.get('/api/portfolio/export?format=json&entity=kpis', headers=auth_headers)
+        assert response.is_streamed
+        data = json.loads(response.get_data(as_text=True))
+        assert data['total_kpis'] == 3
+        assert [kpi['nombre'] for kpi in data['kpis']] == ['KPI 0', 'KPI 1', 'KPI 2']
+        assert data['kpis'][0]['tipo'] == 'costo'
+        
+        # Los proyectos conservan la forma de Proyecto.to_dict()
+        data = json.loads(client.get('/api/portfolio/export?format=json', headers=auth_headers).get_data(as_text=True))
+        assert data['projects'] == [p.to_dict() for p in Proyecto.query.order_by(Proyecto.id)]
+        
+        headers = dict(auth_headers, Accept='application/x-ndjson')
+        response = client.get('/api/portfolio/export?format=json', headers=headers)
+        assert response.mimetype == 'application/x-ndjson'
+        lines = response.get_data(as_text=True).splitlines()
+        assert [json.loads(line)['nombre'] for line in lines] == ['Proyecto 0', 'Proyecto 1', 'Proyecto 2']
+    
+    def test_export_scope(self, client, auth_headers, tmp_path, monkeypatch):
+        """Un cliente solo exporta filas de sus proyectos y no accede a recursos ni horas"""
+        import json
+        from src.services.export_queue import export_jobs
+        monkeypatch.setattr(export_jobs, 'export_dir', str(tmp_path))
+        self.seed(3)
+        otro = Cliente(nombre='Otro Cliente')
+        db.session.add(otro)
+        db.session.flush()
+        proyecto = Proyecto(nombre='Proyecto Otro', cliente_id=otro.id, fecha_inicio=date(2024, 1, 1))
+        db.session.add(proyecto)
+        db.session.flush()
+        db.session.add(KPI(proyecto_id=proyecto.id, nombre='KPI Otro', tipo=TipoKPI.COSTO, valor_objetivo=10,
+                           unidad_medida='%', umbral_amarillo=5, umbral_rojo=8))
+        db.session.commit()
+        
+        client.post('/api/auth/register', json={'nombre': 'Usuario Otro', 'email': 'otro@example.com',
+                                                'password': 'password123', 'rol': 'cliente', 'cliente_id': otro.id})
+        token = client.post('/api/auth/login', json={'email': 'otro@example.com', 'password': 'password123'}).get_json()['token']
+        headers = {'Authorization': f'Bearer {token}'}
+        
+        rows = self.read_csv(client.get('/api/portfolio/export?format=csv&entity=kpis', headers=headers))
+        assert [row[3] for row in rows[1:]] == ['KPI Otro']
+        data = json.loads(client.get('/api/portfolio/export?format=json', headers=headers).get_data(as_text=True))
+        assert data['total_projects'] == 1 and [p['nombre'] for p in data['projects']] == ['Proyecto Otro']
+        for entity in ('recursos', 'horas'):
+            assert client.get(f'/api/portfolio/export?format=csv&entity={entity}', headers=headers).status_code == 403
+            assert client.post('/api/exports', json={'entities': [entity]}, headers=headers).status_code == 403
+        
+        # PM y administradores siguen exportando todo
+        rows = self.read_csv(client.get('/api/portfolio/export?format=csv&entity=kpis', headers=auth_headers))
+        assert len(rows) == 5
+        
+        # El worker aplica el alcance del solicitante
+        response = client.post('/api/exports', json={'format': 'csv', 'entities': ['riesgos']}, headers=headers)
+        assert response.status_code == 202
+        job_id = response.get_json()['job']['id']
+        assert export_jobs.run_once() is True
+        assert client.get(f'/api/exports/{job_id}', headers=headers).get_json()['job']['total_filas'] == 0
+    
+    def test_list_endpoints_stream(self, client, auth_headers):
+        """Los listados completos se transmiten como arreglo JSON o NDJSON; las páginas siguen igual"""
+        import json
+        self.seed(3)
+        
+        response = client.get('/api/kpis', headers=auth_headers)
+        assert response.is_streamed
+        assert len(response.get_json()) == 3
+        
+        response = client.get('/api/projects', headers=auth_headers)
+        data = response.get_json()
+        assert len(data['projects']) == 3 and data['next_cursor'] is None
+        
+        headers = dict(auth_headers, Accept='application/x-ndjson')
+        response = client.get('/api/riesgos', headers=headers)
+        assert response.mimetype == 'application/x-ndjson'
+        assert len([json.loads(line) for line in response.get_data(as_text=True).splitlines()]) == 3
+        
+        response = client.get('/api/recursos?limit=2', headers=headers)
+        assert len(response.get_data(as_text=True).splitlines()) == 2
+        assert response.headers.get('X-Next-Cursor')
+    
+    def test_streaming_xlsx(self, client, auth_headers):
+        """El XLSX es un zip Office Open XML válido con una hoja por entidad y textos compartidos"""
+        import zipfile
+        from src.models.subscription import Subscription, PlanType
+        self.seed(3)
+        
+        response = client.get('/api/portfolio/export?format=xlsx', headers=auth_headers)
+        assert response.status_code == 403
+        
+        user = User.query.filter_by(email='test@example.com').first()
+        db.session.add(Subscription(user_id=user.id, plan_type=PlanType.PRO))
+        db.session.commit()
+        
+        response = client.get('/api/portfolio/export?format=xlsx', headers=auth_headers)
+        assert response.status_code == 200
+        assert response.is_streamed
+        workbook = zipfile.ZipFile(io.BytesIO(response.get_data()))
+        assert workbook.testzip() is None
+        names = workbook.namelist()
+        assert '[Content_Types].xml' in names and 'xl/sharedStrings.xml' in names
+        assert len([name for name in names if name.startswith('xl/worksheets/')]) == 4
+        assert b'Riesgos' in workbook.read('xl/workbook.xml')
+        
+        sheet = workbook.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        assert sheet.count('<row ') == 4
+        shared = workbook.read('xl/sharedStrings.xml').decode('utf-8')
+        assert shared.count('<si>') == len(set(shared.split('<si>')[1:]))  # Sin duplicados
+        assert 'Cliente Export' in shared
+    
+    def test_xlsx_shared_strings_ceiling(self):
+        """Superado el máximo de textos compartidos, el resto se escribe como inlineStr"""
+        import zipfile
+        from src.services.xlsx_writer import iter_xlsx, column_letter
+        assert column_letter(0) == 'A' and column_letter(27) == 'AB'
+        
+        rows = [[[f'texto {i}', i] for i in range(10)]]
+        data = b''.join(iter_xlsx([('Hoja', ['Texto', 'N'], rows)], max_shared_strings=4))
+        workbook = zipfile.ZipFile(io.BytesIO(data))
+        assert workbook.read('xl/sharedStrings.xml').count(b'<si>') == 4
+        assert workbook.read('xl/worksheets/sheet1.xml').count(b'inlineStr') == 8  # Los encabezados ocupan dos entradas
+    
+    def test_background_export_job(self, client, auth_headers, tmp_path, monkeypatch):
+        """POST /api/exports encola, el worker escribe el archivo y la descarga admite Range"""
+        from src.services.export_queue import export_jobs, MemoryExportQueue
+        monkeypatch.setattr(export_jobs, 'export_dir', str(tmp_path))
+        self.seed(3)
+        
+        response = client.post('/api/exports', json={'format': 'csv', 'entities': ['kpis', 'riesgos']}, headers=auth_headers)
+        assert response.status_code == 400
+        
+        response = client.post('/api/exports', json={'format': 'csv', 'entities': ['kpis']}, headers=auth_headers)
+        assert response.status_code == 202
+        job_id = response.get_json()['job']['id']
+        assert response.headers['Location'].endswith(f'/api/exports/{job_id}')
+        
+        status = client.get(f'/api/exports/{job_id}', headers=auth_headers).get_json()['job']
+        assert status['estado'] == 'pendiente'
+        assert client.get(f'/api/exports/{job_id}/download', headers=auth_headers).status_code == 409
+        
+        assert export_jobs.run_once() is True
+        assert export_jobs.run_once() is False
+        
+        status = client.get(f'/api/exports/{job_id}', headers=auth_headers).get_json()['job']
+        assert status['estado'] == 'completada'
+        assert status['filas_procesadas'] == status['total_filas'] == 3
+        assert status['progreso'] == 100 and 'archivo' not in status
+        
+        response = client.get(status['download_url'], headers=auth_headers)
+        full = response.get_data()
+        assert response.status_code == 200 and full.startswith(b'ID,Proyecto ID')
+        assert len(full) == status['tamano']
+        
+        response = client.get(status['download_url'], headers=dict(auth_headers, Range='bytes=0-9'))
+        assert response.status_code == 206
+        assert response.get_data() == full[:10]
+        assert response.headers['Content-Range'] == f'bytes 0-9/{len(full)}'
+        
+        # La cola en memoria entrega cada trabajo a un solo worker
+        queue = MemoryExportQueue()
+        queue.enqueue({'id': 'a', 'estado': 'pendiente'})
+        assert queue.claim()['estado'] == 'procesando'
+        assert queue.claim() is None
+    
+    def test_background_export_job_file_db(self, tmp_path, monkeypatch):
+        """Sobre un archivo SQLite, el progreso por lote no choca con la lectura y los trabajos abandonados se reclaman"""
+        from datetime import datetime, timedelta
+        from flask import Flask
+        from src.models.export_job import ExportJob, EstadoExportacion
+        from src.services import export_streams
+        from src.services.export_queue import export_jobs, SQLExportQueue
+        file_app = Flask(__name__)
+        file_app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'exports.db'}"
+        db.init_app(file_app)
+        monkeypatch.setattr(export_jobs, 'queue', SQLExportQueue())
+        monkeypatch.setattr(export_jobs, 'export_dir', str(tmp_path))
+        monkeypatch.setattr(export_streams.streaming_exporter, 'batch_size', 2)
+        
+        with file_app.app_context():
+            db.create_all()
+            usuario = User(nombre='Worker', email='worker@example.com', rol=UserRole.ADMINISTRADOR, password_hash='x')
+            cliente = Cliente(nombre='Cliente Archivo')
+            db.session.add_all([usuario, cliente])
+            db.session.flush()
+            db.session.add_all([Proyecto(nombre=f'Proyecto {i}', cliente_id=cliente.id, fecha_inicio=date(2024, 1, 1))
+                                for i in range(11)])
+            db.session.commit()
+            
+            job = export_jobs.submit(usuario.id, 'csv', ['proyectos'])
+            assert export_jobs.run_once() is True
+            status = export_jobs.get(job['id'])
+            assert status['estado'] == 'completada'
+            assert status['filas_procesadas'] == status['total_filas'] == 11
+            with open(status['archivo']) as output:
+                assert len(output.read().splitlines()) == 12
+            
+            # Un trabajo que quedó en procesamiento (worker caído) se reclama después del timeout
+            stale = export_jobs.submit(usuario.id, 'csv', ['proyectos'])
+            db.session.query(ExportJob).filter_by(id=stale['id']).update({
+                'estado': EstadoExportacion.PROCESANDO, 'fecha_inicio': datetime.utcnow() - timedelta(hours=2)
+            })
+            db.session.commit()
+            assert export_jobs.run_once() is True
+            assert export_jobs.get(stale['id'])['estado'] == 'completada'
+            
+            # Un fallo a mitad de la lectura queda registrado en lugar de dejar el trabajo en procesamiento
+            calls = []
+            export_value = export_streams.export_value
+            def failing_value(value):
+                calls.append(value)
+                if len(calls) > 30:
+                    raise RuntimeError('fallo de lectura')
+                return export_value(value)
+            monkeypatch.setattr(export_streams, 'export_value', failing_value)
+            failed = export_jobs.submit(usuario.id, 'csv', ['proyectos'])
+            assert export_jobs.run_once() is True
+            status = export_jobs.get(failed['id'])
+            assert status['estado'] == 'fallida' and status['error'] == 'fallo de lectura'
+            assert not [name for name in os.listdir(tmp_path) if name.endswith('.part')]
+            db.session.remove()
+            db.drop_all()
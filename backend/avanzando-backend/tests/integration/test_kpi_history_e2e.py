@@ -0,0 +1,169 @@
+from datetime import date, datetime, timedelta
+from src.models.user import Cliente, db
+from src.models.project import Proyecto
+from src.models.kpi_medicion import KPIMedicion
+
+class TestKPIHistoryE2E:
+    """Pruebas End-to-End de la serie histórica de mediciones de KPIs"""
+    
+    def create_kpi(self, client):
+        cliente = Cliente(nombre='Cliente KPI')
+        db.session.add(cliente)
+        db.session.flush()
+        proyecto = Proyecto(nombre='Proyecto KPI', cliente_id=cliente.id, fecha_inicio=date(2024, 1, 1))
+        db.session.add(proyecto)
+        db.session.commit()
+        response = client.post('/api/kpis', json={
+            'proyecto_id': proyecto.id, 'nombre': 'Costo', 'tipo': 'costo', 'valor_objetivo': 100,
+            'valor_actual': 10, 'unidad_medida': '%', 'umbral_amarillo': 80, 'umbral_rojo': 90
+        })
+        assert response.status_code == 201
+        return response.get_json()['kpi']['id']
+    
+    def test_update_kpi_appends_measurement(self, client):
+        """Cada update_kpi con valor_actual agrega una medición que se lee por rango"""
+        kpi_id = self.create_kpi(client)
+        for valor in (12.5, 15.25):
+            assert client.put(f'/api/kpis/{kpi_id}', json={'valor_actual': valor}).status_code == 200
+        assert client.put(f'/api/kpis/{kpi_id}', json={'nombre': 'Costo total'}).status_code == 200
+        
+        data = client.get(f'/api/kpis/{kpi_id}/mediciones').get_json()
+        assert data['v'] == [10, 12.5, 15.25]
+        assert data['t'] == sorted(data['t'])
+        assert KPIMedicion.query.filter_by(kpi_id=kpi_id).count() == 1
+        
+        assert client.get(f'/api/kpis/{kpi_id}/mediciones?from=ayer').status_code == 400
+        assert client.get('/api/kpis/mediciones').status_code == 400
+    
+    def test_monthly_chunks_and_range(self, client, monkeypatch):
+        """Un año de mediciones diarias se guarda en doce bloques compactos y se decodifica igual sin NumPy"""
+        from src.services import kpi_history as module
+        kpi_id = self.create_kpi(client)
+        KPIMedicion.query.filter_by(kpi_id=kpi_id).delete()
+        start = datetime(2023, 1, 1, 8, 30)
+        expected = [round(50 + (day % 7) * 1.5 - day * 0.01, 4) for day in range(365)]
+        for day, valor in enumerate(expected):
+            module.kpi_history.record(kpi_id, valor, start + timedelta(days=day))
+        db.session.commit()
+        
+        chunks = KPIMedicion.query.filter_by(kpi_id=kpi_id).all()
+        assert len(chunks) == 12
+        assert sum(chunk.cantidad for chunk in chunks) == 365
+        assert sum(len(chunk.valores) + len(chunk.tiempos) for chunk in chunks) < 365 * 16  # Menos que dos float64 por medición
+        
+        data = client.get(f'/api/kpis/mediciones?kpi_ids={kpi_id}&from=2023-01-01&to=2023-12-31').get_json()
+        series = data['series'][0]
+        assert series['v'] == expected
+        assert series['t'][1] - series['t'][0] == 86400
+        
+        march = module.kpi_history.series([kpi_id], datetime(2023, 3, 10), datetime(2023, 3, 20))[kpi_id]
+        assert march['v'] == expected[68:78]
+        
+        monkeypatch.setattr(module, 'np', None)
+        assert module.kpi_history.series([kpi_id], datetime(2023, 1, 1), datetime(2024, 1, 1))[kpi_id]['v'] == expected
+        assert module.kpi_history.recent(kpi_id, limit=3) == expected[-3:]
+    
+    def test_record_backfill_keeps_order(self, client):
+        """Una medición anterior al fin del bloque se intercala en orden de tiempo"""
+        from src.services.kpi_history import kpi_history
+        kpi_id = self.create_kpi(client)
+        KPIMedicion.query.filter_by(kpi_id=kpi_id).delete()
+        for valor, dia in ((10, 20), (5, 5), (7, 10)):
+            kpi_history.record(kpi_id, valor, datetime(2024, 1, dia))
+        db.session.commit()
+        
+        series = kpi_history.series([kpi_id], datetime(2024, 1, 1), datetime(2024, 1, 31))[kpi_id]
+        assert [datetime.utcfromtimestamp(t).day for t in series['t']] == [5, 10, 20]
+        assert series['v'] == [5, 7, 10]
+        assert kpi_history.recent(kpi_id, limit=1) == [10.0]
+        chunk = KPIMedicion.query.filter_by(kpi_id=kpi_id).one()
+        assert (chunk.inicio, chunk.fin, chunk.cantidad) == (datetime(2024, 1, 5), datetime(2024, 1, 20), 3)
+    
+    def test_batch_values(self, client, auth_headers, monkeypatch):
+        """La carga por lotes actualiza estado con el último valor y agrega todas las mediciones"""
+        from src.models.kpi import KPI
+        from src.services import kpi_ingestion as module
+        kpi_id = self.create_kpi(client)
+        other_id = self.create_kpi(client)
+        # Sin la medición de creación (de hoy), las mediciones de 2024 son las más recientes
+        KPIMedicion.query.filter(KPIMedicion.kpi_id.in_([kpi_id, other_id])).delete()
+        db.session.commit()
+        
+        values = [{'kpi_id': kpi_id, 'valor': 85, 'timestamp': '2024-05-02T10:00:00Z'},
+                  [other_id, 95.5, '2024-05-01T10:00:00'],
+                  [kpi_id, 20, '2024-05-01T10:00:00']]
+        assert client.post('/api/kpis/values:batch', json={'values': values}).status_code == 401
+        response = client.post('/api/kpis/values:batch', json={'values': values}, headers=auth_headers)
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['mediciones'] == 3
+        assert data['estados'] == {'verde': 0, 'amarillo': 1, 'rojo': 1}
+        
+        db.session.expire_all()
+        assert (db.session.get(KPI, kpi_id).valor_actual, db.session.get(KPI, kpi_id).estado.value) == (85, 'amarillo')
+        assert db.session.get(KPI, kpi_id).fecha_actualizacion > datetime(2024, 5, 2, 10)  # Hora de la escritura
+        assert db.session.get(KPI, other_id).estado.value == 'rojo'
+        series = client.get(f'/api/kpis/{kpi_id}/mediciones?from=2024-05-01&to=2024-05-02').get_json()
+        assert series['v'] == [20, 85]
+        
+        # Un segundo lote se agrega al bloque existente; sin NumPy los estados son los mismos
+        monkeypatch.setattr(module, 'np', None)
+        response = client.post('/api/kpis/values:batch', json=[[kpi_id, 5, '2024-05-03T10:00:00']], headers=auth_headers)
+        assert response.get_json()['estados'] == {'verde': 1, 'amarillo': 0, 'rojo': 0}
+        series = client.get(f'/api/kpis/{kpi_id}/mediciones?from=2024-05-01&to=2024-05-03').get_json()
+        assert series['v'] == [20, 85, 5]
+        assert KPIMedicion.query.filter_by(kpi_id=kpi_id, periodo=date(2024, 5, 1)).one().cantidad == 3
+        
+        response = client.post('/api/kpis/values:batch', json=[[kpi_id, 1], [999999, 1], {'valor': 2}], headers=auth_headers)
+        assert response.status_code == 400
+        assert [error['row'] for error in response.get_json()['errors']] == [2, 1]
+        
+        # Valores no finitos se rechazan por fila en lugar de llegar al histórico
+        response = client.post('/api/kpis/values:batch', json=[[kpi_id, 'nan'], [kpi_id, '1e400'], [kpi_id, 3]],
+                               headers=auth_headers)
+        assert response.status_code == 400
+        assert [error['row'] for error in response.get_json()['errors']] == [0, 1]
+    
+    def test_batch_values_backfill(self, client, auth_headers):
+        """Una medición anterior a la última registrada entra al histórico sin reemplazar valor_actual"""
+        from src.models.kpi import KPI
+        from src.services.kpi_history import kpi_history
+        kpi_id = self.create_kpi(client)
+        
+        response = client.post('/api/kpis/values:batch', json=[[kpi_id, 95, '2099-10-20T00:00:00']], headers=auth_headers)
+        assert response.get_json()['estados'] == {'verde': 0, 'amarillo': 0, 'rojo': 1}
+        response = client.post('/api/kpis/values:batch', json=[[kpi_id, 1, '2025-01-01T00:00:00']], headers=auth_headers)
+        assert response.status_code == 200
+        assert response.get_json()['updated'] == 0
+        
+        db.session.expire_all()
+        kpi = db.session.get(KPI, kpi_id)
+        assert (kpi.valor_actual, kpi.estado.value) == (95, 'rojo')
+        series = client.get(f'/api/kpis/{kpi_id}/mediciones?from=2025-01-01&to=2025-01-02').get_json()
+        assert series['v'] == [1]
+        
+        # Mediciones anteriores al fin del bloque del mes se intercalan en orden
+        response = client.post('/api/kpis/values:batch', json=[[kpi_id, 60, '2099-10-10T00:00:00'], [kpi_id, 40, '2099-10-05T00:00:00']],
+                               headers=auth_headers)
+        assert response.get_json()['updated'] == 0
+        series = client.get(f'/api/kpis/{kpi_id}/mediciones?from=2099-10-01&to=2099-10-31').get_json()
+        assert series['v'] == [40, 60, 95]
+        assert series['t'] == sorted(series['t'])
+        assert kpi_history.recent(kpi_id, limit=1) == [95.0]
+    
+    def test_batch_values_invalidate_dashboard_etag(self, client, auth_headers):
+        """Un lote con mediciones antiguas que cambia el estado invalida el ETag de los dashboards"""
+        kpi_id = self.create_kpi(client)
+        KPIMedicion.query.filter_by(kpi_id=kpi_id).delete()
+        db.session.commit()
+        proyecto_id = client.get(f'/api/kpis/{kpi_id}').get_json()['proyecto_id']
+        
+        urls = (f'/api/kpis/dashboard/{proyecto_id}', f'/api/kpis/dashboard?proyecto_ids={proyecto_id}')
+        etags = [client.get(url).headers['ETag'] for url in urls]
+        response = client.post('/api/kpis/values:batch', json=[[kpi_id, 95, '2024-05-01T00:00:00']], headers=auth_headers)
+        assert response.get_json()['estados']['rojo'] == 1
+        
+        for url, etag in zip(urls, etags):
+            response = client.get(url, headers={'If-None-Match': etag})
+            assert response.status_code == 200, url
+        assert client.get(urls[0]).get_json()['resumen']['kpis_rojos'] == 1
@@ -0,0 +1,63 @@
+from datetime import date, datetime
+from src.models.user import Cliente, db
+from src.models.project import Proyecto
+from src.models.kpi import KPI, TipoKPI
+
+class TestPaginationE2E:
+    """Pruebas End-to-End para la paginación por cursor"""
+    
+    def seed_projects(self, count):
+        cliente = Cliente(nombre='Cliente Paginación')
+        db.session.add(cliente)
+        db.session.flush()
+        # Misma fecha de actualización para forzar el desempate por id
+        mismo_momento = datetime(2024, 6, 1, 12, 0, 0)
+        for i in range(count):
+            db.session.add(Proyecto(nombre=f'Proyecto {i}', cliente_id=cliente.id,
+                                    fecha_inicio=date(2024, 1, 1),
+                                    fecha_actualizacion=mismo_momento if i % 2 else datetime(2024, 1, i + 1)))
+        db.session.commit()
+    
+    def test_projects_keyset_pages(self, client, auth_headers):
+        """Recorre todas las páginas sin duplicados ni omisiones"""
+        self.seed_projects(7)
+        
+        seen = []
+        cursor = None
+        pages = 0
+        while True:
+            url = '/api/projects?limit=3' + (f'&cursor={cursor}' if cursor else '')
+            response = client.get(url, headers=auth_headers)
+            assert response.status_code == 200
+            data = response.get_json()
+            seen.extend(p['id'] for p in data['projects'])
+            pages += 1
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        
+        assert pages == 3
+        assert sorted(seen) == sorted(set(seen))
+        assert len(seen) == 7
+    
+    def test_array_endpoint_uses_header(self, client, auth_headers):
+        """Los listados en arreglo entregan el cursor en X-Next-Cursor"""
+        self.seed_projects(1)
+        proyecto = Proyecto.query.first()
+        for i in range(3):
+            db.session.add(KPI(proyecto_id=proyecto.id, nombre=f'KPI {i}', tipo=TipoKPI.TIEMPO,
+                               valor_objetivo=100, unidad_medida='%', umbral_amarillo=50, umbral_rojo=80))
+        db.session.commit()
+        
+        response = client.get('/api/kpis?limit=2')
+        assert len(response.get_json()) == 2
+        cursor = response.headers['X-Next-Cursor']
+        
+        response = client.get(f'/api/kpis?limit=2&cursor={cursor}')
+        assert len(response.get_json()) == 1
+        assert 'X-Next-Cursor' not in response.headers
+    
+    def test_invalid_cursor(self, client, auth_headers):
+        """Un cursor corrupto retorna 400"""
+        response = client.get('/api/projects?cursor=no-es-un-cursor', headers=auth_headers)
+        assert response.status_code == 400
@@ -213,3 +213,237 @@ class TestProjectsE2E:
         assert data['message'] == 'Fase actualizada exitosamente'
         assert data['fase']['avance'] == 50
 
+    
+    def test_conditional_get_projects(self, client):
+        """Prueba GET condicional con ETag e If-None-Match"""
+        token, cliente_id = self.setup_user_and_token(client, "conditional_get")
+        headers = {'Authorization': f'Bearer {token}'}
+        
+        response = client.post('/api/projects',
+                             data=json.dumps({'nombre': 'Proyecto ETag', 'cliente_id': cliente_id}),
+                             content_type='application/json',
+                             headers=headers)
+        project_id = response.get_json()['project']['id']
+        
+        for url in ['/api/projects', f'/api/projects/{project_id}']:
+            response = client.get(url, headers=headers)
+            assert response.status_code == 200
+            assert response.get_json()
+            etag = response.headers['ETag']
+            assert etag.startswith('W/')
+            
+            # Sin cambios: 304 sin cuerpo
+            response = client.get(url, headers={**headers, 'If-None-Match': etag})
+            assert response.status_code == 304
+            assert response.data == b''
+        
+        # Avanzar una fase cambia la versión del detalle
+        fase_id = client.get(f'/api/projects/{project_id}', headers=headers).get_json()['project']['fases'][0]['id']
+        client.post(f'/api/projects/{project_id}/phases/{fase_id}/advance',
+                   data=json.dumps({'avance': 30}),
+                   content_type='application/json',
+                   headers=headers)
+        
+        response = client.get(f'/api/projects/{project_id}', headers={**headers, 'If-None-Match': etag})
+        assert response.status_code == 200
+    
+    def test_bulk_create_projects(self, client):
+        """Prueba la creación masiva de proyectos con sus fases"""
+        from src.models.user import Cliente
+        from src.models.project import Fase
+        token, _ = self.setup_user_and_token(client, "bulk_projects")
+        headers = {'Authorization': f'Bearer {token}'}
+        
+        cliente = Cliente(nombre='Cliente Masivo')
+        db.session.add(cliente)
+        db.session.commit()
+        
+        projects = [{'nombre': f'Proyecto {i}', 'cliente_id': cliente.id, 'fecha_inicio': '2024-01-01'} for i in range(20)]
+        response = client.post('/api/projects/bulk',
+                             data=json.dumps(projects),
+                             content_type='application/json',
+                             headers=headers)
+        
+        assert response.status_code == 201
+        ids = response.get_json()['ids']
+        assert len(ids) == 20
+        assert Fase.query.filter(Fase.proyecto_id.in_(ids)).count() == 100
+        
+        # Un cliente inexistente invalida todo el lote; los errores usan el índice original de la fila
+        response = client.post('/api/projects/bulk',
+                             data=json.dumps([{'nombre': 'Sin cliente'}, {'nombre': 'Otro', 'cliente_id': 9999}]),
+                             content_type='application/json',
+                             headers=headers)
+        assert response.status_code == 400
+        assert [error['row'] for error in response.get_json()['errors']] == [0, 1]
+    
+    def test_get_project_with_include(self, client, count_queries):
+        """Prueba la expansión de colecciones con ?include= en un número fijo de consultas"""
+        from src.models.kpi import KPI, TipoKPI
+        from src.models.riesgo import Riesgo, TipoRiesgo, NivelProbabilidad, NivelImpacto
+        token, cliente_id = self.setup_user_and_token(client, "include")
+        headers = {'Authorization': f'Bearer {token}'}
+        
+        response = client.post('/api/projects',
+                             data=json.dumps({'nombre': 'Proyecto Compuesto', 'cliente_id': cliente_id}),
+                             content_type='application/json',
+                             headers=headers)
+        project_id = response.get_json()['project']['id']
+        
+        def measure():
+            with count_queries() as statements:
+                response = client.get(f'/api/projects/{project_id}?include=fases,kpis,riesgos,recursos', headers=headers)
+            assert response.status_code == 200
+            return response.get_json()['project'], len(statements)
+        
+        project, baseline = measure()
+        assert project['kpis'] == [] and project['riesgos'] == [] and project['recursos'] == []
+        
+        for i in range(3):
+            db.session.add(KPI(proyecto_id=project_id, nombre=f'KPI {i}', tipo=TipoKPI.COSTO, valor_objetivo=10,
+                               unidad_medida='%', umbral_amarillo=5, umbral_rojo=8))
+            db.session.add(Riesgo(proyecto_id=project_id, codigo=f'R-{i}', nombre='Riesgo', descripcion='d',
+                                  tipo=TipoRiesgo.EXTERNO, probabilidad=NivelProbabilidad.BAJA,
+                                  impacto=NivelImpacto.BAJO, responsable_id=1))
+        db.session.commit()
+        
+        project, count = measure()
+        assert len(project['kpis']) == 3
+        assert project['riesgos'][0]['responsable_nombre'] is not None
+        assert len(project['fases']) == 5
+        assert count == baseline
+        
+        # Predicciones sin plan con IA: se omiten con aviso
+        response = client.get(f'/api/projects/{project_id}?include=predicciones', headers=headers)
+        assert 'predicciones' not in response.get_json()['project']
+        assert response.get_json()['warnings']
+        
+        response = client.get(f'/api/projects/{project_id}?include=desconocido', headers=headers)
+        assert response.status_code == 400
+    
+    def test_progreso_general_rollup(self, client):
+        """Prueba que el avance de fases actualiza progreso_general y coincide con el recálculo"""
+        from src.services.progress_rollup import progress_rollup
+        from src.models.project import Proyecto
+        token, cliente_id = self.setup_user_and_token(client, "progreso")
+        headers = {'Authorization': f'Bearer {token}'}
+        
+        response = client.post('/api/projects',
+                             data=json.dumps({'nombre': 'Proyecto Progreso', 'cliente_id': cliente_id}),
+                             content_type='application/json',
+                             headers=headers)
+        project = response.get_json()['project']
+        assert project['progreso_general'] == 0
+        
+        fases = client.get(f"/api/projects/{project['id']}", headers=headers).get_json()['project']['fases']
+        for fase, avance in ((fases[0], 100), (fases[1], 50), (fases[1], 25)):
+            response = client.post(f"/api/projects/{project['id']}/phases/{fase['id']}/advance",
+                                 data=json.dumps({'avance': avance}),
+                                 content_type='application/json',
+                                 headers=headers)
+            assert response.status_code == 200
+        
+        response = client.get(f"/api/projects/{project['id']}", headers=headers)
+        assert response.get_json()['project']['progreso_general'] == 25.0  # (100 + 25) / 5 fases
+        
+        # El recálculo completo coincide con el valor incremental
+        db.session.query(Proyecto).update({'progreso_general': 0})
+        db.session.commit()
+        assert progress_rollup.recompute() == 1
+        assert db.session.get(Proyecto, project['id']).progreso_general == 25.0
+        
+        # La exportación lee la columna persistida
+        response = client.get('/api/portfolio/export?format=csv', headers=headers)
+        assert response.status_code == 200
+        assert '25.0%' in response.get_data(as_text=True)
+    
+    def test_delete_projects_set_based(self, client, count_queries):
+        """Prueba el borrado por conjuntos de proyectos y sus dependientes, síncrono y asíncrono"""
+        from src.models.project import Proyecto, Fase
+        from src.models.kpi import KPI, TipoKPI
+        from src.models.user import Cliente
+        from src.services.project_purge import project_purge
+        token, _ = self.setup_user_and_token(client, "purge")
+        headers = {'Authorization': f'Bearer {token}'}
+        
+        cliente = Cliente(nombre='Cliente Purga')
+        db.session.add(cliente)
+        db.session.commit()
+        
+        response = client.post('/api/projects/bulk',
+                             data=json.dumps([{'nombre': f'Proyecto {i}', 'cliente_id': cliente.id} for i in range(3)]),
+                             content_type='application/json',
+                             headers=headers)
+        ids = response.get_json()['ids']
+        for project_id in ids:
+            for i in range(10):
+                db.session.add(KPI(proyecto_id=project_id, nombre=f'KPI {i}', tipo=TipoKPI.COSTO, valor_objetivo=10,
+                                   unidad_medida='%', umbral_amarillo=5, umbral_rojo=8))
+        db.session.commit()
+        
+        # Borrado múltiple: un DELETE por tabla, sin SELECT de las filas hijas
+        with count_queries() as statements:
+            response = client.delete('/api/projects/bulk',
+                                   data=json.dumps({'ids': ids[:2] + [999999]}),
+                                   content_type='application/json',
+                                   headers=headers)
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['deleted']['kpis'] == 20
+        assert data['deleted']['fases'] == 10
+        assert data['deleted']['proyectos'] == 2
+        assert data['not_found'] == [999999]
+        assert not any(s.lstrip().upper().startswith('SELECT') and 'kpis.nombre' in s for s in statements)
+        assert KPI.query.count() == 10
+        
+        # Modo asíncrono por lotes
+        response = client.delete(f'/api/projects/{ids[2]}?mode=async', headers=headers)
+        assert response.status_code == 202
+        job_id = response.get_json()['job']['id']
+        project_purge.wait(job_id, timeout=10)
+        
+        response = client.get(f'/api/projects/purges/{job_id}', headers=headers)
+        job = response.get_json()['job']
+        assert job['status'] == 'completed'
+        assert job['deleted']['kpis'] == 10
+        assert Proyecto.query.count() == 0
+        assert Fase.query.count() == 0
+    
+    def test_purge_jobs_persisted(self, client):
+        """Prueba que el estado de las purgas vive en purge_jobs y que los trabajos abandonados se retoman"""
+        from datetime import date, datetime, timedelta
+        from src.models.project import Proyecto
+        from src.models.purge_job import PurgeJob, EstadoPurga
+        from src.models.user import Cliente
+        from src.services.project_purge import project_purge
+        token, _ = self.setup_user_and_token(client, "purge_jobs")
+        headers = {'Authorization': f'Bearer {token}'}
+        
+        cliente = Cliente(nombre='Cliente Purga Persistente')
+        db.session.add(cliente)
+        db.session.flush()
+        proyectos = [Proyecto(nombre=f'Proyecto {i}', cliente_id=cliente.id, fecha_inicio=date(2024, 1, 1)) for i in range(2)]
+        db.session.add_all(proyectos)
+        db.session.flush()
+        ids = [proyecto.id for proyecto in proyectos]
+        
+        # Trabajo que otro proceso dejó en ejecución antes de caer
+        db.session.add(PurgeJob(id='abandonado', proyecto_ids=f'{ids[0]},{ids[1]}',
+                                estado=EstadoPurga.EJECUTANDO, fecha_inicio=datetime.utcnow() - timedelta(hours=2)))
+        db.session.add(PurgeJob(id='activo', proyecto_ids=str(ids[0]),
+                                estado=EstadoPurga.EJECUTANDO, fecha_inicio=datetime.utcnow()))
+        db.session.commit()
+        
+        assert project_purge.run_once() is True
+        assert project_purge.run_once() is False  # El trabajo en curso no se reclama antes del timeout
+        
+        # Cualquier proceso lee el estado desde la tabla
+        project_purge._futures.clear()
+        response = client.get('/api/projects/purges/abandonado', headers=headers)
+        job = response.get_json()['job']
+        assert job['status'] == 'completed'
+        assert job['deleted']['proyectos'] == 2
+        assert job['proyecto_ids'] == ids
+        assert Proyecto.query.filter_by(cliente_id=cliente.id).count() == 0
+        assert client.get('/api/projects/purges/activo', headers=headers).get_json()['job']['status'] == 'running'
+        assert client.get('/api/projects/purges/inexistente', headers=headers).status_code == 404
@@ -0,0 +1,303 @@
+from datetime import date
+from src.models.user import User, UserRole, Cliente, db
+from src.models.project import Proyecto
+from src.models.riesgo import Riesgo, TipoRiesgo, NivelProbabilidad, NivelImpacto
+from src.models.recurso import Recurso, TipoRecurso
+from src.models.kpi import KPI, TipoKPI
+
+class TestQueryCountsE2E:
+    """Verifica que los listados ejecutan un número constante de consultas"""
+    
+    def seed(self, rows):
+        """Crea proyectos, riesgos y recursos, cada uno con su propia relación"""
+        for i in range(rows):
+            cliente = Cliente(nombre=f'Cliente {i}')
+            usuario = User(nombre=f'Responsable {i}', email=f'resp{i}_{rows}@example.com', rol=UserRole.RECURSO, password_hash='x')
+            db.session.add_all([cliente, usuario])
+            db.session.flush()
+            
+            proyecto = Proyecto(nombre=f'Proyecto {i}', cliente_id=cliente.id, fecha_inicio=date(2024, 1, 1))
+            db.session.add(proyecto)
+            db.session.flush()
+            
+            db.session.add(Riesgo(proyecto_id=proyecto.id, codigo=f'R-{i}', nombre='Riesgo', descripcion='d',
+                                  tipo=TipoRiesgo.TECNICO, probabilidad=NivelProbabilidad.MEDIA,
+                                  impacto=NivelImpacto.ALTO, responsable_id=usuario.id))
+            db.session.add(Recurso(proyecto_id=proyecto.id, nombre='Recurso', tipo=TipoRecurso.HUMANO,
+                                   cantidad_requerida=1, unidad_medida='h', usuario_asignado_id=usuario.id))
+        db.session.commit()
+        db.session.expire_all()
+    
+    def measure(self, client, count_queries, url, headers):
+        client.get(url, headers=headers)  # Calentar cachés de autenticación
+        with count_queries() as statements:
+            response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        return len(statements)
+    
+    def test_list_endpoints_constant_queries(self, client, auth_headers, count_queries):
+        """El número de consultas no depende del número de filas"""
+        urls = ['/api/projects', '/api/riesgos', '/api/recursos', '/api/portfolio']
+        
+        self.seed(1)
+        baseline = {url: self.measure(client, count_queries, url, auth_headers) for url in urls}
+        
+        self.seed(5)
+        for url in urls:
+            assert self.measure(client, count_queries, url, auth_headers) == baseline[url], url
+    
+    def test_kpi_dashboard_grouped_summary(self, client, count_queries):
+        """El dashboard de KPIs se resume con una consulta agrupada y solo lista KPIs con ?include=kpis"""
+        self.seed(1)
+        proyecto = Proyecto.query.first()
+        for i, tipo in enumerate([TipoKPI.COSTO, TipoKPI.COSTO, TipoKPI.TIEMPO, TipoKPI.CALIDAD] * 5):
+            kpi = KPI(proyecto_id=proyecto.id, nombre=f'KPI {i}', tipo=tipo, valor_objetivo=(i % 3) * 40,
+                      valor_actual=i * 7.5, unidad_medida='%', umbral_amarillo=50, umbral_rojo=100, activo=i != 19)
+            kpi.calcular_estado()
+            db.session.add(kpi)
+        db.session.commit()
+        kpis = KPI.query.filter_by(proyecto_id=proyecto.id, activo=True).all()
+        
+        url = f'/api/kpis/dashboard/{proyecto.id}'
+        with count_queries() as statements:
+            data = client.get(url).get_json()
+        assert len(statements) == 2  # Versión para el ETag y resumen agrupado
+        assert 'kpis' not in data
+        
+        resumen = data['resumen']
+        assert resumen['total_kpis'] == len(kpis) == 19
+        assert resumen['kpis_verdes'] == len([k for k in kpis if k.estado.value == 'verde'])
+        assert resumen['kpis_rojos'] == len([k for k in kpis if k.estado.value == 'rojo'])
+        assert resumen['porcentaje_verde'] == resumen['kpis_verdes'] / 19 * 100
+        for tipo in TipoKPI:
+            kpis_tipo = [k for k in kpis if k.tipo == tipo]
+            expected = sum(k.porcentaje_cumplimiento() for k in kpis_tipo) / len(kpis_tipo) if kpis_tipo else 0
+            assert data['kpis_por_tipo'][tipo.value]['total'] == len(kpis_tipo)
+            assert abs(data['kpis_por_tipo'][tipo.value]['promedio_cumplimiento'] - expected) < 1e-9
+        
+        full = client.get(f'{url}?include=kpis').get_json()
+        assert len(full['kpis']) == 19 and full['resumen'] == resumen
+        assert client.get('/api/kpis/dashboard/999999').get_json()['resumen']['total_kpis'] == 0
+    
+    def test_kpi_dashboard_batch(self, client, count_queries, monkeypatch):
+        """Los resúmenes de varios proyectos salen de una consulta agrupada, en JSON o en streaming"""
+        import json
+        from src.routes import kpis as routes
+        self.seed(3)
+        proyectos = [proyecto.id for proyecto in Proyecto.query.order_by(Proyecto.id)]
+        for i, tipo in enumerate([TipoKPI.COSTO, TipoKPI.TIEMPO, TipoKPI.ALCANCE] * 4):
+            kpi = KPI(proyecto_id=proyectos[i % 2], nombre=f'KPI {i}', tipo=tipo, valor_objetivo=100,
+                      valor_actual=i * 9, unidad_medida='%', umbral_amarillo=50, umbral_rojo=90)
+            kpi.calcular_estado()
+            db.session.add(kpi)
+        db.session.commit()
+        expected = {str(proyecto_id): client.get(f'/api/kpis/dashboard/{proyecto_id}').get_json() for proyecto_id in proyectos}
+        
+        url = '/api/kpis/dashboard?proyecto_ids=' + ','.join(map(str, reversed(proyectos)))
+        with count_queries() as statements:
+            data = client.get(url).get_json()
+        assert len(statements) == 2  # Versión para el ETag y un GROUP BY para todos los proyectos
+        assert data['dashboards'] == expected
+        assert data['dashboards'][str(proyectos[2])]['resumen']['total_kpis'] == 0
+        
+        monkeypatch.setattr(routes, 'KPI_DASHBOARD_STREAM_MIN', 1)
+        response = client.get(url)
+        assert response.is_streamed
+        assert json.loads(response.get_data(as_text=True)) == data
+        
+        response = client.get(url, headers={'Accept': 'application/x-ndjson'})
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert [line.pop('proyecto_id') for line in lines] == proyectos
+        assert lines == [expected[str(proyecto_id)] for proyecto_id in proyectos]
+        
+        ndjson_etag = response.headers['ETag']
+        assert client.get(url, headers={'Accept': 'application/x-ndjson', 'If-None-Match': ndjson_etag}).status_code == 304
+        assert client.get(url, headers={'If-None-Match': ndjson_etag}).status_code == 200
+        assert client.get('/api/kpis/dashboard?proyecto_ids=1,x').status_code == 400
+        assert client.get('/api/kpis/dashboard').status_code == 400
+    
+    def test_portfolio_aggregates(self, client, auth_headers):
+        """Las métricas del portafolio se calculan en SQL sobre los proyectos filtrados"""
+        self.seed(3)
+        Proyecto.query.filter_by(nombre='Proyecto 0').update({'presupuesto_estimado': 1000, 'presupuesto_real': 250})
+        db.session.commit()
+        
+        response = client.get('/api/portfolio', headers=auth_headers)
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['totalProjects'] == 3
+        assert data['activeProjects'] == 3
+        assert data['totalBudget'] == 1000
+        assert data['totalSpent'] == 250
+        assert len(data['riskSummary']) == 3
+        assert data['riskSummary'][0]['high_risks'] == 1
+        # Cada persona es un recurso distinto aunque los recursos compartan el nombre 'Recurso'
+        assert data['resourceUtilization'] == [
+            {'name': f'Responsable {i}', 'projects_assigned': 1, 'utilization': 20.0} for i in range(3)
+        ]
+        
+        # Sin usuario asignado se agrupan por (tipo, nombre)
+        proyectos = Proyecto.query.order_by(Proyecto.id).all()
+        persona = User.query.filter_by(nombre='Responsable 0').one()
+        db.session.add_all([Recurso(proyecto_id=proyectos[1].id, nombre='Analista', tipo=TipoRecurso.HUMANO,
+                                    cantidad_requerida=1, unidad_medida='h', usuario_asignado_id=persona.id)] + [
+            Recurso(proyecto_id=proyecto.id, nombre='Servidor', tipo=tipo, cantidad_requerida=1, unidad_medida='u')
+            for proyecto, tipo in ((proyectos[0], TipoRecurso.MATERIAL), (proyectos[1], TipoRecurso.MATERIAL),
+                                   (proyectos[2], TipoRecurso.TECNOLOGICO))
+        ])
+        db.session.commit()
+        data = client.get('/api/portfolio', headers=auth_headers).get_json()
+        assert [(r['name'], r['projects_assigned']) for r in data['resourceUtilization']] == [
+            ('Responsable 0', 2), ('Servidor', 2), ('Responsable 1', 1), ('Responsable 2', 1), ('Servidor', 1)
+        ]
+        
+        response = client.get('/api/portfolio?status=completado', headers=auth_headers)
+        assert response.get_json()['totalProjects'] == 0
+        
+        response = client.get('/api/portfolio?status=desconocido', headers=auth_headers)
+        assert response.status_code == 400
+    
+    def test_portfolio_summary_maintained_by_flush(self, client, auth_headers, count_queries):
+        """portfolio_summary se actualiza en cada flush y coincide con la reconciliación completa"""
+        from src.services.portfolio_summary import portfolio_summary
+        self.seed(2)
+        assert portfolio_summary.get()['totalProjects'] == 2
+        
+        proyecto = Proyecto.query.filter_by(nombre='Proyecto 0').first()
+        proyecto.presupuesto_estimado = 500
+        db.session.add(Riesgo(proyecto_id=proyecto.id, codigo='R-X', nombre='Riesgo', descripcion='d',
+                              tipo=TipoRiesgo.LEGAL, probabilidad=NivelProbabilidad.ALTA,
+                              impacto=NivelImpacto.MUY_ALTO))
+        db.session.commit()
+        
+        global_summary = portfolio_summary.get()
+        assert global_summary['totalBudget'] == 500
+        assert global_summary['highRisks'] == 3
+        assert portfolio_summary.get(proyecto.cliente_id)['highRisks'] == 2
+        
+        db.session.delete(proyecto)
+        db.session.commit()
+        assert portfolio_summary.get()['totalProjects'] == 1
+        
+        incremental = portfolio_summary.get()
+        portfolio_summary.reconcile()
+        assert portfolio_summary.get() == incremental
+        
+        # La lectura global suma las filas por cliente en una sola consulta, sin reconciliar
+        with count_queries() as statements:
+            summary = portfolio_summary.get()
+        assert len(statements) == 1
+        assert summary['totalProjects'] == 1
+    
+    def test_portfolio_snapshots_and_trends(self, client, auth_headers):
+        """Las fotografías diarias alimentan las tendencias reducidas por semana y mes y las métricas"""
+        from src.services.portfolio_snapshots import portfolio_snapshots
+        self.seed(3)
+        
+        assert portfolio_snapshots.take(date(2024, 1, 1)) == 3
+        assert portfolio_snapshots.take(date(2024, 1, 1)) == 0  # Un día ya registrado no se reescribe
+        proyecto = Proyecto.query.filter_by(nombre='Proyecto 0').first()
+        proyecto.presupuesto_real = 500
+        db.session.commit()
+        portfolio_snapshots.take(date(2024, 1, 2))
+        portfolio_snapshots.take(date(2024, 1, 8))
+        Recurso.query.filter_by(proyecto_id=proyecto.id).update({'cantidad_asignada': 1})
+        db.session.commit()
+        portfolio_snapshots.take(date(2024, 2, 1))
+        
+        def trend(query):
+            response = client.get(f'/api/portfolio/trends?from=2024-01-01&to=2024-12-31&{query}', headers=auth_headers)
+            assert response.status_code == 200
+            return response.get_json()['series']
+        
+        daily = trend('interval=day')
+        assert [point['fecha'] for point in daily] == ['2024-01-01', '2024-01-02', '2024-01-08', '2024-02-01']
+        assert daily[0]['proyectos'] == 3 and daily[0]['riesgos_altos'] == 3
+        assert daily[0]['exposicion_riesgo'] == 36  # 3 riesgos de probabilidad media (3) e impacto alto (4)
+        assert daily[0]['presupuesto_real'] == 0
+        
+        weekly = trend('interval=week')
+        assert [(point['periodo'], point['fecha']) for point in weekly] == [
+            ('2024-01-01', '2024-01-02'), ('2024-01-08', '2024-01-08'), ('2024-01-29', '2024-02-01')]
+        assert weekly[0]['presupuesto_real'] == 500  # Cada período toma su último día
+        
+        monthly = trend('interval=month')
+        assert [point['periodo'] for point in monthly] == ['2024-01-01', '2024-02-01']
+        assert monthly[1]['utilizacion_recursos'] == 33.33
+        
+        assert trend(f'interval=month&client={proyecto.cliente_id}')[0]['proyectos'] == 1
+        assert trend(f'proyecto_id={proyecto.id}')[-1]['recursos_asignados'] == 1
+        
+        response = client.get('/api/portfolio/trends?interval=hour', headers=auth_headers)
+        assert response.status_code == 400
+        
+        # Alcance por rol: cliente con cliente_id ve solo lo suyo; sin cliente_id o con rol recurso, 403
+        def login(email, **extra):
+            client.post('/api/auth/register', json=dict({'nombre': email, 'email': email, 'password': 'password123'}, **extra))
+            token = client.post('/api/auth/login', json={'email': email, 'password': 'password123'}).get_json()['token']
+            return {'Authorization': f'Bearer {token}'}
+        url = '/api/portfolio/trends?from=2024-01-01&to=2024-12-31&interval=month'
+        response = client.get(url, headers=login('cliente0@example.com', rol='cliente', cliente_id=proyecto.cliente_id))
+        assert response.status_code == 200 and response.get_json()['series'][0]['proyectos'] == 1
+        assert client.get(url, headers=login('sincliente@example.com', rol='cliente')).status_code == 403
+        assert client.get(url, headers=login('recurso@example.com', rol='recurso')).status_code == 403
+        
+        data = client.get('/api/portfolio/metrics', headers=auth_headers).get_json()
+        assert data['snapshot_date'] == '2024-02-01'
+        assert data['average_project_duration'] == 31
+        assert data['resource_utilization_avg'] == 33.33
+    
+    def test_portfolio_response_cache(self, client, auth_headers, count_queries, monkeypatch):
+        """Las respuestas del portafolio se sirven de caché hasta que un commit cambia los datos"""
+        from src.services.response_cache import portfolio_cache, RedisCacheBackend
+        
+        class FakeRedis:
+            """Sustituto mínimo de redis.Redis para las operaciones que usa la caché"""
+            def __init__(self):
+                self.data = {}
+            def get(self, key):
+                return self.data.get(key)
+            def set(self, key, value, ex=None):
+                self.data[key] = value.encode('utf-8')
+            def incr(self, key):
+                self.data[key] = str(int(self.data.get(key, 0)) + 1).encode('utf-8')
+        
+        self.seed(2)
+        for backend in (portfolio_cache.backend, RedisCacheBackend(client=FakeRedis())):
+            monkeypatch.setattr(portfolio_cache, 'backend', backend)
+            first = client.get('/api/portfolio?status=all', headers=auth_headers)
+            assert first.get_json()['totalProjects'] == 2
+            
+            # Misma tupla de filtros normalizada: ninguna consulta a la base de datos
+            with count_queries() as statements:
+                second = client.get('/api/portfolio', headers=auth_headers)
+            assert statements == []
+            assert second.get_data() == first.get_data() and second.headers['ETag'] == first.headers['ETag']
+            
+            # 'all' solo es el valor por defecto de status, client y budget: una búsqueda de "all" no comparte la clave
+            with count_queries() as statements:
+                searched = client.get('/api/portfolio?search=all', headers=auth_headers)
+            assert searched.status_code == 200 and statements
+            assert searched.get_json()['totalProjects'] == 0
+            
+            response = client.get('/api/portfolio', headers=dict(auth_headers, **{'If-None-Match': first.headers['ETag']}))
+            assert response.status_code == 304
+            
+            # Un flush sobre los modelos versionados invalida al confirmar
+            proyecto = Proyecto.query.filter_by(nombre='Proyecto 0').first()
+            proyecto.presupuesto_estimado = (proyecto.presupuesto_estimado or 0) + 100
+            db.session.commit()
+            data = client.get('/api/portfolio', headers=auth_headers).get_json()
+            assert data['totalBudget'] == proyecto.presupuesto_estimado
+            
+            # También los UPDATE masivos del ORM
+            bumps = portfolio_cache.bumps
+            Proyecto.query.update({'presupuesto_real': 40})
+            db.session.commit()
+            assert portfolio_cache.bumps == bumps + 1
+            with count_queries() as statements:
+                client.get('/api/portfolio', headers=auth_headers)
+            assert statements
+        
+        stats = portfolio_cache.stats()
+        assert stats['backend'] == 'redis' and stats['hits'] >= 4
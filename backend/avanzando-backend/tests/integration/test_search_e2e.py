@@ -0,0 +1,88 @@
+from datetime import date
+from src.models.user import User, UserRole, Cliente, db
+from src.models.project import Proyecto
+from src.models.riesgo import Riesgo, TipoRiesgo, NivelProbabilidad, NivelImpacto
+from src.models.documento import Documento, TipoDocumento
+
+class TestSearchE2E:
+    """Pruebas End-to-End de la búsqueda de texto completo"""
+    
+    def seed(self):
+        norte = Cliente(nombre='Cliente Norte')
+        sur = Cliente(nombre='Cliente Sur')
+        autor = User(nombre='Autor', email='autor@example.com', rol=UserRole.PM, password_hash='x')
+        db.session.add_all([norte, sur, autor])
+        db.session.flush()
+        puente = Proyecto(nombre='Puente Norte', descripcion='Construcción del puente peatonal sobre el río',
+                          cliente_id=norte.id, fecha_inicio=date(2024, 1, 1))
+        portal = Proyecto(nombre='Portal Web', descripcion='Migración del portal de clientes',
+                          cliente_id=sur.id, fecha_inicio=date(2024, 1, 1))
+        db.session.add_all([puente, portal])
+        db.session.flush()
+        riesgo = Riesgo(proyecto_id=puente.id, codigo='R-1', nombre='Crecida del río', descripcion='Lluvias intensas',
+                        plan_mitigacion='Ataguías temporales', tipo=TipoRiesgo.EXTERNO,
+                        probabilidad=NivelProbabilidad.MEDIA, impacto=NivelImpacto.ALTO)
+        documento = Documento(proyecto_id=portal.id, nombre='Acta de inicio', tipo=TipoDocumento.ACTA,
+                              contenido='La migración del portal incluye el río de datos históricos', creado_por=autor.id)
+        db.session.add_all([riesgo, documento])
+        db.session.commit()
+        return norte, sur, puente, portal, riesgo
+    
+    def test_search_ranked_and_maintained(self, client, auth_headers):
+        """El índice se mantiene con los flush y /api/search ordena por relevancia"""
+        norte, sur, puente, portal, riesgo = self.seed()
+        
+        data = client.get('/api/search?q=rio', headers=auth_headers).get_json()
+        assert data['total'] == 3  # Sin acentos: "rio" coincide con "río"
+        assert data['results'][0]['entidad'] == 'riesgos'  # Coincidencia en el título pesa más
+        assert '<mark>' in data['results'][0]['fragmento']
+        
+        data = client.get('/api/search?q=ataguia&type=riesgos', headers=auth_headers).get_json()
+        assert [r['id'] for r in data['results']] == [riesgo.id]
+        
+        data = client.get('/api/search?q=migr&type=documentos,proyectos', headers=auth_headers).get_json()
+        assert {r['entidad'] for r in data['results']} == {'documentos', 'proyectos'}  # Prefijo en el último término
+        
+        assert client.get('/api/search?q=rio&type=tareas', headers=auth_headers).status_code == 400
+        # limit se acota a [1, MAX_SEARCH_LIMIT]; LIMIT -1 no debe quitar el tope
+        for limit in (-1, 0, 1):
+            assert client.get(f'/api/search?q=rio&limit={limit}', headers=auth_headers).get_json()['total'] == 1
+        assert client.get('/api/search?q=%20', headers=auth_headers).status_code == 400
+        
+        # Cambios en el ORM reindexan; la baja lógica de un riesgo lo quita del índice
+        puente.nombre = 'Viaducto Norte'
+        riesgo.activo = False
+        db.session.commit()
+        data = client.get('/api/search?q=viaducto', headers=auth_headers).get_json()
+        assert [r['id'] for r in data['results']] == [puente.id]
+        assert client.get('/api/search?q=ataguias', headers=auth_headers).get_json()['total'] == 0
+        
+        # El filtro search del portafolio usa el índice (incluye la descripción)
+        data = client.get('/api/portfolio?search=peatonal', headers=auth_headers).get_json()
+        assert [p['id'] for p in data['projects']] == [puente.id]
+        
+        # Alcance de cliente: solo ve resultados de sus proyectos
+        client.post('/api/auth/register', json={'nombre': 'Usuario Sur', 'email': 'sur@example.com',
+                                                'password': 'password123', 'rol': 'cliente', 'cliente_id': sur.id})
+        token = client.post('/api/auth/login', json={'email': 'sur@example.com', 'password': 'password123'}).get_json()['token']
+        data = client.get('/api/search?q=rio', headers={'Authorization': f'Bearer {token}'}).get_json()
+        assert [(r['entidad'], r['proyecto_id']) for r in data['results']] == [('documentos', portal.id)]
+        
+        # Un cliente sin cliente asociado no ve resultados de todos los clientes
+        client.post('/api/auth/register', json={'nombre': 'Sin Cliente', 'email': 'sincliente@example.com',
+                                                'password': 'password123', 'rol': 'cliente'})
+        token = client.post('/api/auth/login', json={'email': 'sincliente@example.com', 'password': 'password123'}).get_json()['token']
+        assert client.get('/api/search?q=rio', headers={'Authorization': f'Bearer {token}'}).status_code == 403
+    
+    def test_search_index_follows_purge(self, client, auth_headers):
+        """La eliminación masiva de proyectos también limpia el índice"""
+        from src.services.project_purge import project_purge
+        from src.services.search_index import search_index
+        norte, sur, puente, portal, riesgo = self.seed()
+        
+        project_purge.purge([puente.id])
+        assert client.get('/api/search?q=rio', headers=auth_headers).get_json()['total'] == 1
+        
+        assert search_index.reindex() == 2  # Portal y su documento
+        db.session.commit()
+        assert client.get('/api/search?q=migracion', headers=auth_headers).get_json()['total'] == 2
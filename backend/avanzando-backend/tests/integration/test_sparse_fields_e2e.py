@@ -0,0 +1,54 @@
+from datetime import date
+from src.models.user import Cliente, db
+from src.models.project import Proyecto
+from src.models.riesgo import Riesgo, TipoRiesgo, NivelProbabilidad, NivelImpacto
+
+class TestSparseFieldsE2E:
+    """Pruebas End-to-End para ?fields= y la carga diferida de columnas"""
+    
+    def seed(self):
+        cliente = Cliente(nombre='Cliente Campos')
+        db.session.add(cliente)
+        db.session.flush()
+        proyecto = Proyecto(nombre='Proyecto Campos', descripcion='x' * 5000,
+                            cliente_id=cliente.id, fecha_inicio=date(2024, 1, 1))
+        db.session.add(proyecto)
+        db.session.flush()
+        db.session.add(Riesgo(proyecto_id=proyecto.id, codigo='R-1', nombre='Riesgo', descripcion='d',
+                              tipo=TipoRiesgo.LEGAL, probabilidad=NivelProbabilidad.ALTA,
+                              impacto=NivelImpacto.MUY_ALTO, plan_mitigacion='plan largo'))
+        db.session.commit()
+        db.session.expire_all()
+    
+    def test_projects_fields_trim_payload_and_sql(self, client, auth_headers, count_queries):
+        """Solo se serializan y se leen las columnas solicitadas"""
+        self.seed()
+        client.get('/api/projects', headers=auth_headers)
+        
+        with count_queries() as statements:
+            response = client.get('/api/projects?fields=id,nombre,cliente_nombre', headers=auth_headers)
+        
+        assert response.status_code == 200
+        proyecto = response.get_json()['projects'][0]
+        assert proyecto == {'id': proyecto['id'], 'nombre': 'Proyecto Campos', 'cliente_nombre': 'Cliente Campos'}
+        assert not any('proyectos.descripcion' in s for s in statements)
+    
+    def test_riesgos_derived_fields(self, client, auth_headers):
+        """Los campos derivados cargan sus columnas de origen"""
+        self.seed()
+        
+        response = client.get('/api/riesgos?fields=codigo,nivel_riesgo')
+        
+        assert response.status_code == 200
+        assert response.get_json() == [{'codigo': 'R-1', 'nivel_riesgo': 'CRITICO'}]
+    
+    def test_project_detail_without_phases(self, client, auth_headers):
+        """El detalle solo incluye las fases si se solicitan"""
+        self.seed()
+        proyecto_id = Proyecto.query.first().id
+        
+        response = client.get(f'/api/projects/{proyecto_id}?fields=nombre', headers=auth_headers)
+        assert response.get_json()['project'] == {'nombre': 'Proyecto Campos'}
+        
+        response = client.get(f'/api/projects/{proyecto_id}?fields=nombre,fases', headers=auth_headers)
+        assert 'fases' in response.get_json()['project']
@@ -0,0 +1,64 @@
+import json
+from src.models.user import User
+
+class TestUsersBulkE2E:
+    """Pruebas End-to-End para el alta masiva de usuarios"""
+    
+    def test_bulk_create_json(self, client, auth_headers):
+        """Prueba el alta masiva desde un arreglo JSON con reporte por fila"""
+        users = [
+            {'nombre': 'Ana', 'email': 'ana@cliente.com', 'password': 'clave123', 'rol': 'pm'},
+            {'nombre': 'Luis', 'email': 'luis@cliente.com'},
+            {'nombre': 'Ana bis', 'email': 'ana@cliente.com'},
+            {'nombre': 'Existente', 'email': 'test@example.com'},
+            {'email': 'sin.nombre@cliente.com'},
+            {'nombre': 'Rol', 'email': 'rol@cliente.com', 'rol': 'invalido'}
+        ]
+        
+        response = client.post('/api/users/bulk',
+                             data=json.dumps(users),
+                             content_type='application/json',
+                             headers=auth_headers)
+        
+        assert response.status_code == 201
+        data = response.get_json()
+        assert data['total'] == 6
+        assert data['created'] == 2
+        assert data['failed'] == 4
+        assert [r['status'] for r in data['results']] == ['created', 'created', 'error', 'error', 'error', 'error']
+        
+        # Las contraseñas se pueden usar para iniciar sesión
+        response = client.post('/api/auth/login',
+                             data=json.dumps({'email': 'ana@cliente.com', 'password': 'clave123'}),
+                             content_type='application/json')
+        assert response.status_code == 200
+        assert response.get_json()['user']['rol'] == 'pm'
+    
+    def test_bulk_create_csv(self, client, auth_headers):
+        """Prueba el alta masiva desde CSV"""
+        content = 'nombre,email,rol\nMaria,maria@cliente.com,cliente\nPedro,pedro@cliente.com,recurso\n'
+        
+        response = client.post('/api/users/bulk',
+                             data=content,
+                             content_type='text/csv',
+                             headers=auth_headers)
+        
+        assert response.status_code == 201
+        assert response.get_json()['created'] == 2
+        assert User.query.filter_by(email='maria@cliente.com').first().rol.value == 'cliente'
+    
+    def test_bulk_create_overloaded(self, client, auth_headers):
+        """Prueba que un segundo lote simultáneo recibe 503 en JSON"""
+        from src.services.password_hasher import password_hasher
+        password_hasher._bulk_admission.acquire()
+        try:
+            response = client.post('/api/users/bulk',
+                                 data=json.dumps([{'nombre': 'Eva', 'email': 'eva@cliente.com'}]),
+                                 content_type='application/json',
+                                 headers=auth_headers)
+        finally:
+            password_hasher._bulk_admission.release()
+        
+        assert response.status_code == 503
+        assert 'error' in response.get_json()
+        assert User.query.filter_by(email='eva@cliente.com').first() is None
@@ -0,0 +1,51 @@
+import pytest
+from src.services.password_hasher import PasswordHasher, HashingOverloadedError
+
+class TestPasswordHasher:
+    """Pruebas unitarias para el pool de hashing de contraseñas"""
+    
+    def test_hash_and_verify(self):
+        """Prueba el hash y la verificación a través del pool"""
+        hasher = PasswordHasher(pool_size=1, method='pbkdf2:sha256:1000')
+        password_hash = hasher.hash('secreto123')
+        
+        assert password_hash.startswith('pbkdf2:sha256:1000$')
+        assert hasher.verify(password_hash, 'secreto123')
+        assert not hasher.verify(password_hash, 'otra')
+        assert hasher.stats()['completed'] == 3
+        assert hasher.stats()['p50_ms'] is not None
+    
+    def test_needs_rehash(self):
+        """Prueba la detección de hashes con otro costo"""
+        hasher = PasswordHasher(pool_size=1, method='pbkdf2:sha256:2000')
+        
+        assert hasher.needs_rehash(PasswordHasher(pool_size=1, method='pbkdf2:sha256:1000').hash('x'))
+        assert not hasher.needs_rehash(hasher.hash('x'))
+        
+        # Métodos sin parámetros se comparan con los valores por defecto de werkzeug
+        for method in ('scrypt', 'pbkdf2:sha256'):
+            hasher = PasswordHasher(pool_size=1, method=method)
+            assert not hasher.needs_rehash(hasher.hash('x')), method
+    
+    def test_admission_control_rejects(self):
+        """Prueba que se rechazan solicitudes cuando el pool está saturado"""
+        hasher = PasswordHasher(pool_size=1, queue_size=0, queue_timeout=0, method='pbkdf2:sha256:1000')
+        hasher._admission.acquire()
+        
+        with pytest.raises(HashingOverloadedError):
+            hasher.hash('secreto123')
+        assert hasher.stats()['rejected'] == 1
+    
+    def test_hash_many_shared_pool(self):
+        """Prueba que el alta masiva usa el pool compartido y admite un lote a la vez"""
+        hasher = PasswordHasher(pool_size=1, queue_timeout=0, method='pbkdf2:sha256:1000', bulk_size=2,
+                                bulk_method='pbkdf2:sha256:500')
+        hashes = hasher.hash_many(['a', 'b', 'c'])
+        
+        assert [hasher.verify(h, p) for h, p in zip(hashes, 'abc')] == [True, True, True]
+        # Costo menor para el lote; el primer login los rehashea
+        assert all(h.startswith('pbkdf2:sha256:500$') and hasher.needs_rehash(h) for h in hashes)
+        hasher._bulk_admission.acquire()
+        with pytest.raises(HashingOverloadedError):
+            hasher.hash_many(['d'])
+        assert hasher.stats()['rejected'] == 1
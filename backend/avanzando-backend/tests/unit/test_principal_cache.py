@@ -0,0 +1,49 @@
+import time
+from src.models.user import UserRole
+from src.services.principal_cache import PrincipalCache, Principal
+
+class TestPrincipalCache:
+    """Pruebas unitarias para la caché de usuarios autenticados"""
+    
+    def make_principal(self, user_id):
+        return Principal(id=user_id, rol=UserRole.PM, cliente_id=None, activo=True)
+    
+    def test_hit_and_miss_counters(self):
+        """Prueba los contadores de aciertos y fallos"""
+        cache = PrincipalCache(max_size=10, ttl=60)
+        
+        assert cache.get(1) is None
+        cache.put(self.make_principal(1))
+        assert cache.get(1).rol == UserRole.PM
+        
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+    
+    def test_lru_eviction(self):
+        """Prueba que se descarta el usuario menos usado"""
+        cache = PrincipalCache(max_size=2, ttl=60)
+        cache.put(self.make_principal(1))
+        cache.put(self.make_principal(2))
+        cache.get(1)
+        cache.put(self.make_principal(3))
+        
+        assert cache.get(2) is None
+        assert cache.get(1) is not None
+        assert cache.get(3) is not None
+    
+    def test_ttl_bounded_by_token_exp(self):
+        """Prueba que la entrada no sobrevive al exp del token"""
+        cache = PrincipalCache(max_size=10, ttl=3600)
+        cache.put(self.make_principal(1), token_exp=time.time() - 1)
+        
+        assert cache.get(1) is None
+    
+    def test_invalidate(self):
+        """Prueba la invalidación explícita"""
+        cache = PrincipalCache(max_size=10, ttl=60)
+        cache.put(self.make_principal(1))
+        cache.invalidate(1)
+        
+        assert cache.get(1) is None
+        assert cache.stats()['invalidations'] == 1